@@ -0,0 +1,112 @@
+"""asyncio counterpart of :mod:`storage` for scripts and services.
+
+Every function in ``storage.READ_API`` and ``storage.WRITE_API`` has a
+coroutine of the same name here, so ``await async_storage.search_products("vela")``
+works like the blocking call without stalling the event loop.  Reads run on a bounded pool
+of threads, each with its own SQLite connection; writes run on a single
+writer thread, since SQLite only lets one transaction write at a time.
+Large result sets are streamed page by page by the ``iter_*`` async
+generators.
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable
+
+try:  # Allow use from both source and frozen builds
+    from . import storage
+    from .models import Product, SubDepartment
+except ImportError:  # pragma: no cover - fallback when package name changes
+    import storage  # type: ignore[import-not-found]
+    from models import Product, SubDepartment  # type: ignore[import-not-found]
+
+MAX_READERS = 4
+PAGE_SIZE = 500
+
+_lock = threading.Lock()
+_max_readers = MAX_READERS
+_readers: ThreadPoolExecutor | None = None
+_writer: ThreadPoolExecutor | None = None
+
+
+def configure(max_readers: int | None = None) -> None:
+    """Set the size of the read pool; takes effect after :func:`shutdown`."""
+    global _max_readers
+    if max_readers is not None:
+        _max_readers = max(1, int(max_readers))
+
+
+def _pool(write: bool) -> ThreadPoolExecutor:
+    global _readers, _writer
+    with _lock:
+        if write:
+            if _writer is None:
+                _writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="async-storage-write")
+            return _writer
+        if _readers is None:
+            _readers = ThreadPoolExecutor(max_workers=_max_readers, thread_name_prefix="async-storage-read")
+        return _readers
+
+
+def shutdown(wait: bool = True) -> None:
+    """Stop the worker threads; they are started again on the next call."""
+    global _readers, _writer
+    with _lock:
+        pools, _readers, _writer = (_readers, _writer), None, None
+    for pool in pools:
+        if pool is not None:
+            pool.shutdown(wait=wait)
+
+
+async def run(func: Callable[..., Any], *args: Any, write: bool = False, **kwargs: Any) -> Any:
+    """Await ``func(*args, **kwargs)`` on the read pool, or on the writer thread."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_pool(write), functools.partial(func, *args, **kwargs))
+
+
+def _wrap(name: str, write: bool):
+    @functools.wraps(getattr(storage, name))
+    async def call(*args: Any, **kwargs: Any) -> Any:
+        # Looked up per call so a replaced storage function is picked up.
+        return await run(getattr(storage, name), *args, write=write, **kwargs)
+    return call
+
+
+for _name in storage.READ_API:
+    globals()[_name] = _wrap(_name, write=False)
+for _name in storage.WRITE_API:
+    globals()[_name] = _wrap(_name, write=True)
+del _name
+
+
+async def _paged(fetch: Callable[[Any], Any]) -> AsyncIterator[Any]:
+    """Yield the items of ``fetch(cursor) -> (items, next cursor)`` pages.
+
+    The next page is read while the caller is still consuming the current one.
+    """
+    pending = asyncio.ensure_future(run(fetch, None))
+    try:
+        while pending is not None:
+            items, cursor = await pending
+            pending = asyncio.ensure_future(run(fetch, cursor)) if cursor is not None else None
+            for item in items:
+                yield item
+    finally:
+        if pending is not None:
+            pending.cancel()
+
+
+def iter_products(sub: SubDepartment, page_size: int = PAGE_SIZE) -> AsyncIterator[Product]:
+    """Stream *sub*'s products in name order."""
+    return _paged(lambda after: storage.list_products_page(sub, page_size, after))
+
+
+def iter_sold_products(page_size: int = PAGE_SIZE, **filters: Any) -> AsyncIterator[dict]:
+    """Stream sales newest first; *filters* are those of ``list_sold_products_page``."""
+    return _paged(lambda after: storage.list_sold_products_page(page_size, after, **filters))
+
+
+__all__ = ["configure", "shutdown", "run", "iter_products", "iter_sold_products", *storage.READ_API, *storage.WRITE_API]
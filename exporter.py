@@ -0,0 +1,529 @@
+"""Streaming exports to Excel workbooks, PDF, CSV and Parquet.
+
+Rows are pulled from an iterator and written as they arrive, so neither the
+rows nor the file are ever held in memory as a whole: a full sales history
+exports in flat memory.  Workbooks use openpyxl's write-only mode and PDFs
+are painted page by page with QPainter; both size their columns from the
+first rows instead of a second pass.  Every file is written next to the
+target and moved into place only once it is complete.
+
+The sales history can also be exported from the command line, for
+reporting tools::
+
+    python exporter.py sales-2026.csv --from 2026-01-01 --to 2026-12-31
+    python exporter.py sales.parquet --department 3 --db inventory.sqlite3
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import importlib
+import os
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from itertools import chain, islice
+from typing import Callable, Iterable, Iterator, Optional, Sequence
+
+if __name__ == "__main__" and __package__ in (None, ""):
+    # Started as "python exporter.py": load the app as a package so the
+    # relative imports inside storage resolve.
+    package_root = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, os.path.dirname(package_root))
+    __package__ = os.path.basename(package_root)
+    importlib.import_module(__package__)
+
+try:  # Allow use from both source and frozen builds
+    from . import pricing, storage
+except ImportError:  # pragma: no cover - fallback when package name changes
+    import pricing  # type: ignore[import-not-found]
+    import storage  # type: ignore[import-not-found]
+
+CHUNK_SIZE = 1000
+BATCH_SIZE = 10000
+WIDTH_SAMPLE = 200
+MIN_WIDTH, MAX_WIDTH = 12, 60
+PDF_FONT, PDF_FONT_SIZE = "Arial", 8
+
+SALES_HEADERS = (
+    "Date", "Id", "Name", "Department", "Subdepartment", "Location", "Client",
+    "Qty", "Price $", "Price C$", "Total C$",
+)
+PRODUCT_HEADERS = ("Id", "Name", "Price $", "Price C$", "Quantity", "Subtotal $", "Subtotal C$")
+
+
+# Parquet types of storage.SALES_REPORT_COLUMNS.
+SALES_REPORT_TYPES = (
+    "string", "date", "timestamp", "string", "string", "string", "string",
+    "string", "string", "string", "int", "float", "float",
+)
+
+
+@dataclass(slots=True)
+class ExportResult:
+    rows: int = 0
+    cancelled: bool = False
+
+
+class _Cancelled(Exception):
+    pass
+
+
+@contextmanager
+def _replacing(path, suffix: str) -> Iterator[str]:
+    """Yield a temporary file next to *path* that replaces it if the block succeeds."""
+    directory = os.path.dirname(os.path.abspath(path))
+    while True:
+        # Not mkstemp: its files are 0600.  Created 0666, the umask applies as
+        # for any open(), and os.replace keeps that mode.
+        tmp_path = os.path.join(directory, f"tmp{uuid.uuid4().hex}{suffix}")
+        try:
+            os.close(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666))
+            break
+        except FileExistsError:
+            continue
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def location_text(location_type: str | None, local_name: str | None) -> str:
+    location_type = (location_type or "").strip().lower()
+    if location_type == "local":
+        return local_name or "Local"
+    if location_type == "online":
+        return "Online"
+    return location_type.capitalize() if location_type else ""
+
+
+def column_widths(headers: Sequence[str], sample: Iterable[Sequence]) -> list[int]:
+    """Column widths fitting the headers and a sample of rows."""
+    widths = [len(str(h)) for h in headers]
+    for row in sample:
+        for idx, value in enumerate(row[:len(widths)]):
+            widths[idx] = max(widths[idx], len(str(value if value is not None else "")))
+    return [min(MAX_WIDTH, max(MIN_WIDTH, w + 2)) for w in widths]
+
+
+def write_xlsx(
+    path,
+    headers: Sequence[str],
+    rows: Iterable[Sequence],
+    *,
+    title: str = "Export",
+    total: Optional[int] = None,
+    progress: Optional[Callable[[int, Optional[int]], object]] = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> ExportResult:
+    """Stream *rows* under *headers* into a new workbook at *path*.
+
+    *progress* is called every *chunk_size* rows with ``(rows written,
+    total)``; returning ``False`` cancels the export and leaves *path*
+    untouched.
+    """
+    from openpyxl import Workbook  # optional dependency, needed for .xlsx only
+    from openpyxl.utils import get_column_letter
+
+    result = ExportResult()
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=title[:31] or "Export")
+    rows = iter(rows)
+    sample = list(islice(rows, WIDTH_SAMPLE))
+    for idx, width in enumerate(column_widths(headers, sample), start=1):
+        sheet.column_dimensions[get_column_letter(idx)].width = width
+    sheet.freeze_panes = "A2"
+    sheet.append(list(headers))
+    for row in chain(sample, rows):
+        sheet.append(list(row))
+        result.rows += 1
+        if progress is not None and result.rows % chunk_size == 0 and progress(result.rows, total) is False:
+            result.cancelled = True
+            if hasattr(rows, "close"):
+                rows.close()  # release the database cursor now rather than at GC
+            sheet.close()  # finish the half-written sheet stream; nothing is saved
+            return result
+
+    with _replacing(path, ".xlsx") as tmp_path:
+        workbook.save(tmp_path)
+    if progress is not None:
+        progress(result.rows, total)
+    return result
+
+
+def _write_batches(path, suffix: str, open_writer, batches: Iterable[Sequence[Sequence]], total, progress) -> ExportResult:
+    # open_writer(tmp_path) is a context manager yielding write(batch).
+    result = ExportResult()
+    batches = iter(batches)
+    try:
+        with _replacing(path, suffix) as tmp_path, open_writer(tmp_path) as write:
+            for batch in batches:
+                write(batch)
+                result.rows += len(batch)
+                if progress is not None and progress(result.rows, total) is False:
+                    raise _Cancelled
+    except _Cancelled:
+        result.cancelled = True
+    finally:
+        if hasattr(batches, "close"):
+            batches.close()  # release the database cursor now rather than at GC
+    return result
+
+
+def write_csv(
+    path,
+    headers: Sequence[str],
+    batches: Iterable[Sequence[Sequence]],
+    *,
+    total: Optional[int] = None,
+    progress: Optional[Callable[[int, Optional[int]], object]] = None,
+) -> ExportResult:
+    """Write *batches* of rows under *headers* to a UTF-8 CSV file at *path*.
+
+    *progress* is called after each batch with ``(rows written, total)``;
+    returning ``False`` cancels the export and leaves *path* untouched.
+    """
+    @contextmanager
+    def open_writer(tmp_path):
+        # The BOM lets Excel read accented names correctly.
+        with open(tmp_path, "w", newline="", encoding="utf-8-sig") as fh:
+            writer = csv.writer(fh)
+            writer.writerow(headers)
+            yield writer.writerows
+
+    return _write_batches(path, ".csv", open_writer, batches, total, progress)
+
+
+def write_parquet(
+    path,
+    headers: Sequence[str],
+    types: Sequence[str],
+    batches: Iterable[Sequence[Sequence]],
+    *,
+    total: Optional[int] = None,
+    progress: Optional[Callable[[int, Optional[int]], object]] = None,
+) -> ExportResult:
+    """Write *batches* of rows to a Parquet file at *path*, one row group per batch.
+
+    *types* gives each column's type: ``string``, ``int``, ``float``, or
+    ``date``/``timestamp`` for ISO text.  Needs pyarrow; *progress* works as
+    in :func:`write_csv`.
+    """
+    import pyarrow as pa  # optional dependency, needed for .parquet only
+    import pyarrow.parquet as pq
+
+    kinds = {
+        "string": pa.string(), "int": pa.int64(), "float": pa.float64(),
+        "date": pa.date32(), "timestamp": pa.timestamp("s"),
+    }
+    schema = pa.schema([(name, kinds[kind]) for name, kind in zip(headers, types)])
+    parsed = [kind in ("date", "timestamp") for kind in types]
+
+    def arrays(batch):
+        for column, field, parse in zip(zip(*batch), schema, parsed):
+            yield pa.array(column, pa.string()).cast(field.type) if parse else pa.array(column, field.type)
+
+    @contextmanager
+    def open_writer(tmp_path):
+        with pq.ParquetWriter(tmp_path, schema) as writer:
+            yield lambda batch: writer.write_batch(pa.RecordBatch.from_arrays(list(arrays(batch)), schema=schema))
+
+    return _write_batches(path, ".parquet", open_writer, batches, total, progress)
+
+
+def _batched(rows: Iterable[Sequence], size: int) -> Iterator[list]:
+    rows = iter(rows)
+    try:
+        while batch := list(islice(rows, size)):
+            yield batch
+    finally:
+        if hasattr(rows, "close"):
+            rows.close()
+
+
+def _is_number(value) -> bool:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return True
+    try:
+        float(str(value).replace(",", ""))
+    except ValueError:
+        return False
+    return True
+
+
+def _cell_text(value) -> str:
+    if value is None:
+        return ""
+    return f"{value:.2f}" if isinstance(value, float) else str(value)
+
+
+class _PdfTable:
+    """Paints table rows onto PDF pages, repeating the header row on every page."""
+
+    def __init__(self, path: str, headers: Sequence[str], title: str, totals: Sequence[int]) -> None:
+        from PyQt6.QtCore import QMarginsF
+        from PyQt6.QtGui import QColor, QFont, QFontMetricsF, QPageLayout, QPageSize, QPainter, QPdfWriter, QPen
+
+        self.headers = [str(h) for h in headers]
+        self.title = title
+        self.totals = {idx: 0 for idx in totals}
+        self.whole = {idx: True for idx in totals}  # sums stay integers while every value is one
+        self.writer = QPdfWriter(path)
+        self.writer.setTitle(title)
+        self.writer.setResolution(300)
+        self.writer.setPageSize(QPageSize(QPageSize.PageSizeId.A4))
+        wide = len(self.headers) > 6
+        self.writer.setPageOrientation(QPageLayout.Orientation.Landscape if wide else QPageLayout.Orientation.Portrait)
+        self.writer.setPageMargins(QMarginsF(12, 12, 12, 12), QPageLayout.Unit.Millimeter)
+        self.painter = QPainter()
+        if not self.painter.begin(self.writer):
+            raise OSError(f"Could not write PDF to {path}")
+        self.font = QFont(PDF_FONT, PDF_FONT_SIZE)
+        self.bold = QFont(self.font)
+        self.bold.setBold(True)
+        self.metrics = QFontMetricsF(self.font, self.writer)
+        self.bold_metrics = QFontMetricsF(self.bold, self.writer)
+        self.page_width, self.page_height = self.writer.width(), self.writer.height()
+        self.row_height = self.metrics.height() * 1.6
+        self.pad = self.metrics.averageCharWidth()
+        self.header_fill, self.shade = QColor("#e8e8e8"), QColor("#f6f6f6")
+        self.grid = QPen(QColor("#c8c8c8"))
+        self.rule = QPen(QColor("#444444"))
+        self.columns: list[tuple[float, float, bool]] | None = None  # (x, width, right-aligned)
+        self.page = 0
+        self.rows = 0
+        self.y = 0.0
+
+    def _layout(self, sample: Sequence[Sequence]) -> None:
+        count = len(self.headers)
+        widths = [self.bold_metrics.horizontalAdvance(h) for h in self.headers]
+        right = [bool(sample)] * count
+        for row in sample:
+            for idx in range(min(count, len(row))):
+                value = row[idx]
+                widths[idx] = max(widths[idx], self.metrics.horizontalAdvance(_cell_text(value)))
+                if value not in (None, "") and not _is_number(value):
+                    right[idx] = False
+        widths = [w + 2 * self.pad for w in widths]
+        scale = self.page_width / (sum(widths) or 1)
+        x, self.columns = 0.0, []
+        for width, align in zip(widths, right):
+            self.columns.append((x, width * scale, align))
+            x += width * scale
+
+    def _start_page(self) -> None:
+        from PyQt6.QtCore import QRectF, Qt
+
+        if self.page:
+            self.writer.newPage()
+        self.page += 1
+        painter = self.painter
+        painter.setFont(self.bold)
+        band = QRectF(0, 0, self.page_width, self.row_height)
+        painter.drawText(band, Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter, self.title)
+        painter.setFont(self.font)
+        painter.drawText(band, Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter, f"Page {self.page}")
+        self.y = self.row_height * 1.25
+        self._paint_row(self.headers, self.bold, self.header_fill, self.rule)
+
+    def _paint_row(self, cells: Sequence[str], font, fill=None, line=None) -> None:
+        from PyQt6.QtCore import QLineF, QPointF, QRectF, Qt
+
+        painter, y, height = self.painter, self.y, self.row_height
+        if fill is not None:
+            painter.fillRect(QRectF(0, y, self.page_width, height), fill)
+        painter.setFont(font)
+        metrics = self.bold_metrics if font is self.bold else self.metrics
+        # Drawing at a baseline point skips the text layout a rect needs.
+        baseline = y + (height + metrics.ascent() - metrics.descent()) / 2
+        for text, (x, width, right) in zip(cells, self.columns):
+            inner = width - 2 * self.pad
+            advance = metrics.horizontalAdvance(text)
+            if advance > inner:
+                text = metrics.elidedText(text, Qt.TextElideMode.ElideRight, inner)
+                advance = metrics.horizontalAdvance(text)
+            painter.drawText(QPointF(x + self.pad + (inner - advance if right else 0), baseline), text)
+        painter.setPen(line or self.grid)
+        painter.drawLine(QLineF(0, y + height, self.page_width, y + height))
+        painter.setPen(self.rule)
+        self.y = y + height
+
+    def _ensure_room(self) -> None:
+        if not self.page or self.y + self.row_height > self.page_height:
+            self._start_page()
+
+    def add_rows(self, batch: Sequence[Sequence]) -> None:
+        if self.columns is None:
+            self._layout(batch[:WIDTH_SAMPLE])
+        for row in batch:
+            self._ensure_room()
+            self._paint_row([_cell_text(v) for v in row], self.font, self.shade if self.rows % 2 else None)
+            for idx in self.totals:
+                value = row[idx] if idx < len(row) else None
+                if isinstance(value, (int, float)):
+                    self.whole[idx] = self.whole[idx] and isinstance(value, int)
+                    self.totals[idx] += value
+                elif value not in (None, "") and _is_number(value):
+                    self.whole[idx] = False
+                    self.totals[idx] += float(str(value).replace(",", ""))
+            self.rows += 1
+
+    def finish(self) -> None:
+        """Paint the totals footer after the last row."""
+        from PyQt6.QtCore import QLineF, QRectF, Qt
+
+        if self.columns is None:
+            self._layout(())
+        if not self.rows:
+            self._ensure_room()
+            self._paint_row(["No data available"], self.font)
+        self._ensure_room()
+        cells = [""] * len(self.headers)
+        for idx, value in self.totals.items():
+            if idx < len(cells):
+                cells[idx] = str(value) if self.whole[idx] else f"{value:.2f}"
+        y = self.y
+        self.painter.drawLine(QLineF(0, y, self.page_width, y))
+        self._paint_row(cells, self.bold, None, self.rule)
+        # The label may run across the columns left of the first total.
+        end = min((self.columns[idx][0] for idx in self.totals if idx < len(self.columns)), default=self.page_width)
+        if end > 0:
+            label = self.bold_metrics.elidedText(f"Total ({self.rows:,} rows)", Qt.TextElideMode.ElideRight, end - 2 * self.pad)
+            self.painter.drawText(QRectF(self.pad, y, end - 2 * self.pad, self.row_height), Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter, label)
+
+    def end(self) -> None:
+        self.painter.end()
+
+
+def write_pdf(
+    path,
+    headers: Sequence[str],
+    rows: Iterable[Sequence],
+    *,
+    title: str = "",
+    totals: Sequence[int] = (),
+    total: Optional[int] = None,
+    progress: Optional[Callable[[int, Optional[int]], object]] = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> ExportResult:
+    """Paint *rows* under *headers* into a paginated PDF table at *path*.
+
+    Every page repeats the title and the header row, and the last one ends
+    with a footer holding the row count and the sums of the *totals*
+    columns.  Pages are painted as rows arrive, so any number of rows renders
+    in flat memory, and the painting may run on a worker thread.  Needs a
+    ``QGuiApplication`` for fonts; *progress* works as in :func:`write_xlsx`.
+    """
+    @contextmanager
+    def open_writer(tmp_path):
+        table = _PdfTable(tmp_path, headers, title, totals)
+        try:
+            yield table.add_rows
+            table.finish()
+        finally:
+            table.end()
+
+    return _write_batches(path, ".pdf", open_writer, _batched(rows, chunk_size), total, progress)
+
+
+def product_rows(products: Iterable, rate: float, markup_pct: float = 0.0) -> Iterator[tuple]:
+    """Products as ``PRODUCT_HEADERS`` rows, priced like the product tables."""
+    factor = pricing.markup_factor(markup_pct)
+    for product in products:
+        usd, qty = float(product.price) * factor, int(product.quantity)
+        yield (product.prod_id, product.name, usd, usd * rate, qty, usd * qty, usd * rate * qty)
+
+
+def iter_products(sub, page_size: int = 500) -> Iterator:
+    """*sub*'s products in name order, read a page at a time."""
+    after = None
+    while True:
+        products, after = storage.list_products_page(sub, page_size, after)
+        yield from products
+        if after is None:
+            return
+
+
+def export_products_pdf(path, sub, progress=None, rate: Optional[float] = None) -> ExportResult:
+    """Export every product of *sub* with quantity and subtotal totals."""
+    rate = storage.get_conversion_rate() if rate is None else float(rate)
+    return write_pdf(
+        path, PRODUCT_HEADERS, product_rows(iter_products(sub), rate),
+        title=f"{sub.name} - Products", totals=(4, 5, 6), total=storage.count_products(sub), progress=progress,
+    )
+
+
+def sales_rows(rate: float, **filters) -> Iterator[tuple]:
+    """Sales matching *filters* (see ``storage.list_sold_products``) as export rows."""
+    for sale in storage.iter_sold_products(**filters):
+        qty, price = sale["qty"], sale["price"]
+        yield (
+            sale["sold_on"], sale["prod_id"], sale["name"],
+            sale["department_name"], sale["subdepartment_name"],
+            location_text(sale["location_type"], sale["local_name"]), sale["client"] or "",
+            qty, round(price, 2), round(price * rate, 2), round(price * rate * qty, 2),
+        )
+
+
+def export_sales_xlsx(path, progress=None, rate: Optional[float] = None, **filters) -> ExportResult:
+    """Export every sale matching *filters*, not just the rows a window has loaded."""
+    rate = storage.get_conversion_rate() if rate is None else float(rate)
+    total = storage.count_sold_products(**filters)
+    return write_xlsx(path, SALES_HEADERS, sales_rows(rate, **filters), title="Sales", total=total, progress=progress)
+
+
+def export_sales_pdf(path, progress=None, rate: Optional[float] = None, **filters) -> ExportResult:
+    """Export every sale matching *filters* as a PDF report with quantity and C$ totals."""
+    rate = storage.get_conversion_rate() if rate is None else float(rate)
+    total = storage.count_sold_products(**filters)
+    return write_pdf(path, SALES_HEADERS, sales_rows(rate, **filters), title="Sales", totals=(7, 10), total=total, progress=progress)
+
+
+def export_sales(path, fmt: Optional[str] = None, progress=None, batch_size: int = BATCH_SIZE, **filters) -> ExportResult:
+    """Export the sales history matching *filters* to CSV or Parquet, oldest first.
+
+    The format follows *fmt* or the file extension (``.parquet``, anything
+    else is CSV).  Columns are ``storage.SALES_REPORT_COLUMNS``; *filters*
+    are those of ``storage.iter_sales_report``, which reads the local
+    database.
+    """
+    if fmt is None:
+        fmt = "parquet" if str(path).lower().endswith((".parquet", ".pq")) else "csv"
+    total = storage.count_sold_products(**filters)
+    batches = storage.iter_sales_report(batch_size=batch_size, **filters)
+    if fmt == "parquet":
+        return write_parquet(path, storage.SALES_REPORT_COLUMNS, SALES_REPORT_TYPES, batches, total=total, progress=progress)
+    if fmt == "csv":
+        return write_csv(path, storage.SALES_REPORT_COLUMNS, batches, total=total, progress=progress)
+    raise ValueError(f"Unknown export format: {fmt!r}")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Export the sales history to CSV or Parquet.")
+    parser.add_argument("output", help="file to write (.csv or .parquet)")
+    parser.add_argument("--format", choices=("csv", "parquet"), help="defaults to the output's extension")
+    parser.add_argument("--db", help="database file (defaults to the app's own)")
+    parser.add_argument("--from", dest="sold_from", metavar="YYYY-MM-DD", help="first sale date to include")
+    parser.add_argument("--to", dest="sold_to", metavar="YYYY-MM-DD", help="last sale date to include")
+    parser.add_argument("--department", type=int, dest="department_id", metavar="ID")
+    parser.add_argument("--subdepartment", type=int, dest="subdepartment_id", metavar="ID")
+    parser.add_argument("--location", choices=("local", "online"), dest="location_type")
+    parser.add_argument("--local", type=int, dest="local_id", metavar="ID", help="only sales made at this local")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="rows read and written at a time")
+    options = vars(parser.parse_args(argv))
+    output, fmt, db, batch_size = (options.pop(key) for key in ("output", "format", "db", "batch_size"))
+    if db:
+        storage.DB_PATH = os.path.abspath(db)
+    storage.init_db()
+    started = time.perf_counter()
+    result = export_sales(output, fmt, batch_size=max(1, batch_size), **options)
+    elapsed = time.perf_counter() - started
+    print(f"Exported {result.rows:,} sales to {output} in {elapsed:.1f} s ({result.rows / max(elapsed, 1e-9):,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
 from PyQt6.QtWidgets import (
     QDialog, QFormLayout, QLineEdit, QPushButton, QHBoxLayout, QPlainTextEdit,
     QFileDialog, QFrame, QLabel, QVBoxLayout, QScrollArea, QWidget, QComboBox, QMessageBox,
-    QDateEdit,
+    QDateEdit, QTableWidget, QTableWidgetItem, QHeaderView,
 )
 from PyQt6.QtCore import Qt, pyqtSignal, QDate, QMarginsF
 from PyQt6.QtGui import QPixmap, QIntValidator, QTextDocument, QPageLayout
@@ -9,10 +9,11 @@ from PyQt6.QtPrintSupport import QPrinter
 from sqlite3 import IntegrityError
 try:  # Allow use from both source and frozen builds
     from .models import Department, Product, SubDepartment, Local
-    from . import storage
+    from . import storage, thumbnails
 except ImportError:  # pragma: no cover - fallback when package name changes
     from models import Department, Product, SubDepartment, Local  # type: ignore[import-not-found]
     import storage  # type: ignore[import-not-found]
+    import thumbnails  # type: ignore[import-not-found]
 from pathlib import Path
 
 class ImageDropArea(QFrame):
@@ -56,11 +57,9 @@ class ImageViewerDialog(QDialog):
         if not pix.isNull(): self.img_label.setPixmap(pix)
 
 class ThumbCard(QWidget):
-    def __init__(self, image_id: str, abs_path: str, on_delete, on_open, parent=None):
+    def __init__(self, image_id: str, abs_path: str, thumb: QPixmap, on_delete, on_open, parent=None):
         super().__init__(parent)
         v = QVBoxLayout(self); v.setContentsMargins(0,0,0,0); v.setSpacing(6)
-        pix = QPixmap(abs_path)
-        thumb = pix.scaled(240,240, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
         lbl = ClickableThumbLabel(abs_path); lbl.setPixmap(thumb); lbl.setFixedSize(250,250)
         lbl.setAlignment(Qt.AlignmentFlag.AlignCenter)
         lbl.setStyleSheet("QLabel { background: #fafafa; border: 1px solid #ddd; border-radius: 8px; }")
@@ -120,9 +119,10 @@ class AddProductForm(QDialog):
         self.input_price = QLineEdit(); self.input_qty = QLineEdit()
         form.addRow("Name:", self.input_name); form.addRow("Description:", self.input_desc)
         form.addRow("Price:", self.input_price); form.addRow("Quantity:", self.input_qty)
-        drop_row = QVBoxLayout(); self.drop = ImageDropArea(self._add_images); drop_row.addWidget(self.drop)
-        browse_btn = QPushButton("Browse images…"); browse_btn.clicked.connect(self._browse_images); drop_row.addWidget(browse_btn)
-        container = QWidget(); container.setLayout(drop_row); form.addRow("Pictures:", container)
+        if storage.IMAGES_ENABLED:  # off on terminals using another PC's database
+            drop_row = QVBoxLayout(); self.drop = ImageDropArea(self._add_images); drop_row.addWidget(self.drop)
+            browse_btn = QPushButton("Browse images…"); browse_btn.clicked.connect(self._browse_images); drop_row.addWidget(browse_btn)
+            container = QWidget(); container.setLayout(drop_row); form.addRow("Pictures:", container)
         self.create_btn = QPushButton("Create Product"); self.create_btn.clicked.connect(self.create_product); form.addRow(self.create_btn)
     def _add_images(self, paths): self._image_paths.extend(paths); self.drop.label.setText(f"{len(self._image_paths)} image(s) queued")
     def _browse_images(self):
@@ -136,25 +136,20 @@ class AddProductForm(QDialog):
         if not isinstance(sub, SubDepartment) or getattr(sub, "sub_id", None) is None:
             QMessageBox.warning(self, "Missing sub department", "Please select a sub department before adding a product.")
             return
-        try:
-            prod_id = storage.generate_next_product_id(sub)
-        except ValueError:
-            QMessageBox.warning(self, "Missing sub department", "The selected sub department could not be found in storage.")
-            return
         try:
             price_val = float(price); qty_val = int(qty)
         except ValueError:
             QMessageBox.warning(self, "Invalid values", "Price must be a number and Quantity must be a whole number.")
             return
-        product = Product(prod_id, sub, name, desc, price_val, qty_val)
         self.parent.subdepartment = sub
         try:
-            self.parent.add_product(product)
-        except IntegrityError:
-            QMessageBox.warning(self, "Duplicate", "A product with the generated ID already exists. Please try again.")
+            product = self.parent.create_product(name, desc, price_val, qty_val)
+        except ValueError:
+            QMessageBox.warning(self, "Missing sub department", "The selected sub department could not be found in storage.")
             return
-        try: storage.add_product_images(product, self._image_paths)
-        except Exception: pass
+        if self._image_paths:
+            try: storage.add_product_images(product, self._image_paths, thumbnails.make_thumbnails)
+            except Exception: pass
         self.close()
 
 class EditSubDepartmentNameDialog(QDialog):
@@ -207,37 +202,84 @@ class LocalPickerDialog(QDialog):
         idx = self.combo.currentIndex(); local = self.locals[idx]; storage.add_product_to_local(local, self.product, qty); self.accept()
 
 class RegisterSaleDialog(QDialog):
+    """Registers a ticket: scan or type each product, then register all lines at once.
+
+    Codes are looked up together when the ticket is registered: one
+    ``get_products_by_ids`` call (one round trip to a remote server) per ticket.
+    """
     def __init__(self, parent=None):
-        super().__init__(parent); self.setWindowTitle("Register Sale"); self.setFixedSize(420,260)
+        super().__init__(parent); self.setWindowTitle("Register Sale"); self.setMinimumSize(480,460)
         form = QFormLayout(self); self.input_code = QLineEdit(); self.input_code.setPlaceholderText("e.g., COVE1")
         self.input_qty = QLineEdit(); self.input_qty.setValidator(QIntValidator(1, 1_000_000, self)); self.loc_combo = QComboBox()
         self.loc_combo.addItem("Online", {"type":"online", "id": None})
-        for loc in storage.list_locals(): self.loc_combo.addItem(loc.name, {"type":"local", "id": loc.local_id})
+        self.locals = storage.list_locals()
+        for loc in self.locals: self.loc_combo.addItem(loc.name, {"type":"local", "id": loc.local_id})
         self.input_client = QLineEdit(); self.input_client.setPlaceholderText("Optional")
         self.date_edit = QDateEdit(); self.date_edit.setCalendarPopup(True); self.date_edit.setDisplayFormat("yyyy-MM-dd"); self.date_edit.setDate(QDate.currentDate())
-        form.addRow("Product ID:", self.input_code); form.addRow("Quantity:", self.input_qty); form.addRow("Location:", self.loc_combo)
+        line_row = QHBoxLayout(); self.add_line_btn = QPushButton("Add to ticket"); self.remove_line_btn = QPushButton("Remove line")
+        line_row.addWidget(self.add_line_btn); line_row.addWidget(self.remove_line_btn); line_row.addStretch(1)
+        self.lines_table = QTableWidget(0, 3); self.lines_table.setHorizontalHeaderLabels(["Id", "Name", "Qty"])
+        self.lines_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.lines_table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+        self.lines_table.verticalHeader().setVisible(False)
+        header = self.lines_table.horizontalHeader()
+        header.setSectionResizeMode(0, QHeaderView.ResizeMode.ResizeToContents); header.setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
+        header.setSectionResizeMode(2, QHeaderView.ResizeMode.ResizeToContents)
+        form.addRow("Product ID:", self.input_code); form.addRow("Quantity:", self.input_qty); form.addRow(line_row)
+        form.addRow(self.lines_table); form.addRow("Location:", self.loc_combo)
         form.addRow("Client:", self.input_client); form.addRow("Sale date:", self.date_edit)
         row = QHBoxLayout(); self.ok_btn = QPushButton("Register"); self.cancel_btn = QPushButton("Cancel")
         row.addStretch(1); row.addWidget(self.ok_btn); row.addWidget(self.cancel_btn); form.addRow(row)
+        self._lines: list[tuple[str, int]] = []  # (typed code, qty)
+        self.input_code.returnPressed.connect(self.input_qty.setFocus); self.input_qty.returnPressed.connect(self.add_line)
+        self.add_line_btn.clicked.connect(self.add_line); self.remove_line_btn.clicked.connect(self.remove_line)
         self.ok_btn.clicked.connect(self.register); self.cancel_btn.clicked.connect(self.reject)
-    def register(self):
-        code = self.input_code.text().strip(); qty_txt = self.input_qty.text().strip()
-        if not code or not qty_txt: return
+        self.ok_btn.setAutoDefault(False); self.add_line_btn.setAutoDefault(False)
+
+    def add_line(self) -> bool:
+        code = self.input_code.text().strip(); qty_txt = self.input_qty.text().strip() or "1"
+        if not code: return False
         try: qty = int(qty_txt)
-        except: return
-        prod = storage.get_product_by_id(code)
-        if not prod: QMessageBox.information(self, "Not found", "Product isn't listed"); return
-        data = self.loc_combo.currentData(); loc = None
-        if data["type"] == "local":
-            for l in storage.list_locals():
-                if l.local_id == data["id"]: loc = l; break
+        except: return False
+        self._lines.append((code, qty))
+        row = self.lines_table.rowCount(); self.lines_table.insertRow(row)
+        qty_item = QTableWidgetItem(str(qty)); qty_item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+        self.lines_table.setItem(row, 0, QTableWidgetItem(code)); self.lines_table.setItem(row, 1, QTableWidgetItem(""))
+        self.lines_table.setItem(row, 2, qty_item)
+        self.input_code.clear(); self.input_qty.clear(); self.input_code.setFocus()
+        return True
+
+    def remove_line(self):
+        row = self.lines_table.currentRow()
+        if 0 <= row < len(self._lines):
+            del self._lines[row]; self.lines_table.removeRow(row)
+
+    def register(self):
+        if self.input_code.text().strip() and not self.add_line(): return
+        if not self._lines: return
+        products = storage.get_products_by_ids([code for code, _ in self._lines])
+        for row, prod in enumerate(products):
+            self.lines_table.setItem(row, 0, QTableWidgetItem(prod.prod_id if prod else self._lines[row][0]))
+            self.lines_table.setItem(row, 1, QTableWidgetItem(prod.name if prod else "Not found"))
+        missing = [code for (code, _), prod in zip(self._lines, products) if prod is None]
+        if missing:
+            QMessageBox.information(self, "Not found", "These products aren't listed; remove them to register the ticket:\n\n" + "\n".join(missing))
+            return
+        lines = [(prod, qty) for prod, (_, qty) in zip(products, self._lines)]
+        data = self.loc_combo.currentData()
+        loc = next((l for l in self.locals if l.local_id == data["id"]), None) if data["type"] == "local" else None
         client = self.input_client.text().strip()
         sale_date = self.date_edit.date().toString("yyyy-MM-dd")
-        ok = storage.register_sale(prod, qty, data["type"], loc, client if client else None, sale_date)
-        if not ok:
-            QMessageBox.warning(self, "Not enough quantity", "Requested quantity is not available (or not allocated in the chosen local).")
+        failures = storage.register_sale_ticket(lines, data["type"], loc, client if client else None, sale_date)
+        if not failures:
+            QMessageBox.information(self, "Sale registered", "Sale recorded successfully."); self.accept(); return
+        details = "\n".join(f"{lines[idx][0].prod_id}: {reason}" for idx, reason in failures)
+        if len(failures) == len(self._lines):
+            QMessageBox.warning(self, "Not enough quantity", f"No line could be registered:\n\n{details}")
             return
-        QMessageBox.information(self, "Sale registered", "Sale recorded successfully."); self.accept()
+        QMessageBox.warning(self, "Sale partly registered",
+                            f"{len(self._lines) - len(failures)} line(s) recorded. These were not:\n\n{details}")
+        self.accept()
 
 class EditProductDialog(QDialog):
     def __init__(self, product: Product, parent=None, readonly: bool = False):
@@ -259,7 +301,7 @@ class EditProductDialog(QDialog):
         self.gallery_container = QWidget(); self.gallery_layout = QHBoxLayout(self.gallery_container)
         self.gallery_layout.setContentsMargins(6,6,6,6); self.gallery_layout.setSpacing(12)
         self.gallery_scroll.setWidget(self.gallery_container); pics_layout.addWidget(self.gallery_scroll, 1)
-        if not self.readonly:
+        if not self.readonly and storage.IMAGES_ENABLED:
             self.side_panel = QWidget(); side_layout = QVBoxLayout(self.side_panel); side_layout.setContentsMargins(0,0,0,0); side_layout.setSpacing(8)
             self.drop_more = ImageDropArea(self._add_more_images); self.drop_more.setMinimumWidth(260); self.drop_more.setMinimumHeight(220)
             self.browse_more_btn = QPushButton("Browse images…"); self.browse_more_btn.clicked.connect(self._browse_more_images)
@@ -276,22 +318,24 @@ class EditProductDialog(QDialog):
         while self.gallery_layout.count():
             item = self.gallery_layout.takeAt(0); w = item.widget()
             if w: w.deleteLater()
+        if not storage.IMAGES_ENABLED:
+            lbl = QLabel("Pictures are only available on the PC that holds the database."); lbl.setAlignment(Qt.AlignmentFlag.AlignCenter)
+            self.gallery_layout.addWidget(lbl); return
         imgs = storage.list_product_images(self.product)
         if not imgs:
             lbl = QLabel("No pictures for this product."); lbl.setAlignment(Qt.AlignmentFlag.AlignCenter); self.gallery_layout.addWidget(lbl); return
         for rec in imgs:
             abs_path = str(storage.get_image_abspath(rec["rel_path"]))
+            thumb = thumbnails.load_thumbnail(self.product.prod_id, rec)  # cached, not the full-size photo
             if self.readonly:
-                pix = QPixmap(abs_path)
-                if pix.isNull(): continue
-                thumb = pix.scaled(240,240, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
+                if thumb.isNull(): continue
                 img_lbl = ClickableThumbLabel(abs_path); img_lbl.setPixmap(thumb); img_lbl.setFixedSize(250,250)
                 img_lbl.setAlignment(Qt.AlignmentFlag.AlignCenter)
                 img_lbl.setStyleSheet("QLabel { background: #fafafa; border: 1px solid #ddd; border-radius: 8px; }")
                 img_lbl.doubleClicked.connect(self._open_big_viewer); self.gallery_layout.addWidget(img_lbl)
             else:
                 from .forms import ThumbCard as _TC  # avoid circular name clash during type checking
-                card = _TC(rec["image_id"], abs_path, self._delete_image, self._open_big_viewer); self.gallery_layout.addWidget(card)
+                card = _TC(rec["image_id"], abs_path, thumb, self._delete_image, self._open_big_viewer); self.gallery_layout.addWidget(card)
 
     def _open_big_viewer(self, abs_path: str):
         dlg = ImageViewerDialog(abs_path, self); dlg.exec()
@@ -300,7 +344,7 @@ class EditProductDialog(QDialog):
         storage.delete_product_image(image_id); self._load_gallery()
 
     def _add_more_images(self, paths: list[str]):
-        storage.add_product_images(self.product, paths); self.drop_more.label.setText(f"Added {len(paths)} image(s)."); self._load_gallery()
+        storage.add_product_images(self.product, paths, thumbnails.make_thumbnails); self.drop_more.label.setText(f"Added {len(paths)} image(s)."); self._load_gallery()
 
     def _browse_more_images(self):
         files, _ = QFileDialog.getOpenFileNames(self, "Select images", "", "Images (*.png *.jpg *.jpeg *.webp *.bmp *.gif)")
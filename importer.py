@@ -0,0 +1,214 @@
+"""Bulk product import from CSV or XLSX files.
+
+The first row names the columns (matched loosely, e.g. ``Dept``/``Department``,
+``Qty``/``Quantity``).  Department and subdepartment are given by their
+abbreviations; ``Id`` is optional and new ids are allocated when it is empty.
+Rows are streamed from the file, validated, and inserted in chunks, each in
+its own transaction, so memory stays flat for large files.
+"""
+from __future__ import annotations
+
+import csv
+import math
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+try:  # Allow use from both source and frozen builds
+    from . import storage
+    from .models import SubDepartment
+except ImportError:  # pragma: no cover - fallback when package name changes
+    import storage  # type: ignore[import-not-found]
+    from models import SubDepartment  # type: ignore[import-not-found]
+
+CHUNK_SIZE = 5000
+
+_COLUMN_ALIASES = {
+    "department": ("department", "dept", "departmentabbreviation", "deptabbrev"),
+    "subdepartment": ("subdepartment", "sub", "subdept", "subdepartmentabbreviation", "subabbrev"),
+    "prod_id": ("id", "prodid", "productid", "code"),
+    "name": ("name", "productname", "product"),
+    "description": ("description", "desc"),
+    "price": ("price", "priceusd", "usd"),
+    "quantity": ("quantity", "qty", "stock"),
+}
+_REQUIRED = ("department", "subdepartment", "name", "price", "quantity")
+
+
+@dataclass(slots=True)
+class RejectedRow:
+    line: int
+    reason: str
+    values: tuple
+
+
+@dataclass(slots=True)
+class ImportResult:
+    read: int = 0
+    imported: int = 0
+    rejected: list[RejectedRow] = field(default_factory=list)
+    cancelled: bool = False
+
+
+def _normalize(header) -> str:
+    return "".join(ch for ch in str(header or "").casefold() if ch.isalnum())
+
+
+def _column_map(headers) -> dict[str, int]:
+    positions = {_normalize(h): idx for idx, h in reversed(list(enumerate(headers)))}
+    columns = {}
+    for key, aliases in _COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in positions:
+                columns[key] = positions[alias]
+                break
+    missing = [key for key in _REQUIRED if key not in columns]
+    if missing:
+        raise ValueError(f"Missing column(s): {', '.join(missing)}")
+    return columns
+
+
+def _iter_csv(path: Path) -> Iterator[tuple]:
+    with open(path, newline="", encoding="utf-8-sig") as fh:
+        sample = fh.read(64 * 1024)
+        fh.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        for row in csv.reader(fh, dialect):
+            yield tuple(row)
+
+
+def _iter_xlsx(path: Path) -> Iterator[tuple]:
+    from openpyxl import load_workbook  # optional dependency, needed for .xlsx only
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def iter_rows(path) -> Iterator[tuple]:
+    """Yield the raw rows (header first) of a .csv or .xlsx file."""
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix == ".csv":
+        return _iter_csv(path)
+    if suffix in (".xlsx", ".xlsm"):
+        return _iter_xlsx(path)
+    raise ValueError(f"Unsupported file type: {path.suffix}")
+
+
+def _text(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)  # spreadsheet cells hold numbers as floats
+    return str(value).strip()
+
+
+def _number(value, label: str) -> float:
+    if isinstance(value, (int, float)):
+        number = float(value)
+    else:
+        text = _text(value).replace(" ", "")
+        if "," in text and "." not in text:
+            text = text.replace(",", ".")  # decimal comma
+        try:
+            number = float(text)
+        except ValueError:
+            raise ValueError(f"{label} is not a number: {value!r}") from None
+    if not math.isfinite(number):  # float() also accepts "nan" and "inf"
+        raise ValueError(f"{label} is not a finite number: {value!r}")
+    return number
+
+
+def _subdepartment_map() -> dict[tuple[str, str], SubDepartment]:
+    subs = {}
+    for dept in storage.list_departments():
+        for sub in storage.list_subdepartments(dept):
+            subs[(dept.abbreviation.casefold(), sub.abbreviation.casefold())] = sub
+    return subs
+
+
+def _parse_row(row: tuple, columns: dict[str, int], subs: dict) -> tuple:
+    def cell(key):
+        idx = columns.get(key)
+        return row[idx] if idx is not None and idx < len(row) else None
+
+    dept, sub_abbr = _text(cell("department")), _text(cell("subdepartment"))
+    sub = subs.get((dept.casefold(), sub_abbr.casefold()))
+    if sub is None:
+        raise ValueError(f"unknown subdepartment {dept}/{sub_abbr}")
+    name = _text(cell("name"))
+    if not name:
+        raise ValueError("name is empty")
+    price = _number(cell("price"), "price")
+    if price < 0:
+        raise ValueError("price is negative")
+    qty = _number(cell("quantity"), "quantity")
+    if qty < 0 or not qty.is_integer():
+        raise ValueError("quantity must be a whole number >= 0")
+    prod_id = _text(cell("prod_id")) or None
+    return (sub, prod_id, name, _text(cell("description")), price, int(qty))
+
+
+def import_products(
+    path,
+    progress: Optional[Callable[[int, int, int], object]] = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> ImportResult:
+    """Import products from *path* (.csv or .xlsx).
+
+    *progress* is called after every chunk with ``(rows read, imported,
+    rejected)``; returning ``False`` stops the import after that chunk.
+    Chunks already written stay committed.
+    """
+    result = ImportResult()
+    rows = iter_rows(path)
+    header = next(rows, None)
+    if header is None:
+        return result
+    columns = _column_map(header)
+    subs = _subdepartment_map()
+    pending: list[tuple] = []
+    pending_lines: list[tuple[int, tuple]] = []
+
+    def flush() -> bool:
+        if pending:
+            inserted, rejected = storage.add_products(pending)
+            result.imported += len(inserted)
+            for idx, reason in rejected:
+                line, values = pending_lines[idx]
+                result.rejected.append(RejectedRow(line, reason, values))
+            pending.clear(); pending_lines.clear()
+        if progress is not None and progress(result.read, result.imported, len(result.rejected)) is False:
+            result.cancelled = True
+            return False
+        return True
+
+    for line, row in enumerate(rows, start=2):
+        if not any(_text(v) for v in row):
+            continue
+        result.read += 1
+        try:
+            pending.append(_parse_row(row, columns, subs))
+        except ValueError as exc:
+            result.rejected.append(RejectedRow(line, str(exc), tuple(row)))
+            continue
+        pending_lines.append((line, tuple(row)))
+        if len(pending) >= chunk_size and not flush():
+            return result
+    flush()
+    return result
+
+
+def write_rejected_report(result: ImportResult, path) -> None:
+    """Write the rejected rows to a CSV file: line, reason, then the original cells."""
+    with open(path, "w", newline="", encoding="utf-8") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(["Line", "Reason", "Values"])
+        for rejected in result.rejected:
+            writer.writerow([rejected.line, rejected.reason, *("" if v is None else v for v in rejected.values)])
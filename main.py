@@ -8,13 +8,17 @@ if __package__ in (None, ""):
         sys.path.insert(0, package_root)
     from windows.departments import DepartmentsWindow
     import storage
+    import remote_storage
     from windows.base import APP_NAME, APP_ICON
 else:
     from .windows.departments import DepartmentsWindow
     from .windows.base import APP_NAME, APP_ICON
-    from . import storage
+    from . import remote_storage, storage
 
 def main():
+    server_url = os.environ.get("INVENTORY_SERVER")
+    if server_url:  # a terminal using the shared inventory served by server.py
+        remote_storage.install(server_url, os.environ.get("INVENTORY_TOKEN"))
     storage.init_db()
     app = QApplication(sys.argv)
     app.setApplicationName(APP_NAME)
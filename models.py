@@ -1,19 +1,23 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
+from typing import Optional
 
-@dataclass
+# slots=True keeps instances free of a per-object __dict__; large result sets
+# (search, local stock, exports) hold hundreds of thousands of these.
+
+@dataclass(slots=True)
 class Department:
     dept_id: int
     abbreviation: str
     name: str
 
-@dataclass
+@dataclass(slots=True)
 class SubDepartment:
     sub_id: int
     parent: Department
     abbreviation: str
     name: str
 
-@dataclass
+@dataclass(slots=True)
 class Product:
     prod_id: str
     parent: SubDepartment
@@ -21,8 +25,47 @@ class Product:
     description: str
     price: float
     quantity: int
+    # Warehouse quantity when ``quantity`` holds a local's stock (list_products_for_local).
+    total_quantity: Optional[int] = None
 
-@dataclass
+@dataclass(slots=True)
 class Local:
     local_id: int
     name: str
+
+
+# ---- JSON wire format (server.py / remote_storage.py) -----------------------
+_WIRE_MODELS = {cls.__name__: cls for cls in (Department, SubDepartment, Product, Local)}
+_WIRE_KEYS = {"Department": "dept_id", "SubDepartment": "sub_id"}
+
+def to_wire(value):
+    """Turn models, and lists/tuples/dicts holding them, into JSON-ready data."""
+    if isinstance(value, (Department, SubDepartment, Product, Local)):
+        data = {f.name: to_wire(getattr(value, f.name)) for f in fields(value)}
+        data["__model__"] = type(value).__name__
+        return data
+    if isinstance(value, (list, tuple)):
+        return [to_wire(v) for v in value]
+    if isinstance(value, dict):
+        return {k: to_wire(v) for k, v in value.items()}
+    return value
+
+def from_wire(data, parents: Optional[dict] = None):
+    """Rebuild what :func:`to_wire` produced; tuples come back as lists.
+
+    Departments and subdepartments with the same id are rebuilt once and
+    shared, like the storage result sets do.
+    """
+    if parents is None:
+        parents = {}
+    if isinstance(data, list):
+        return [from_wire(v, parents) for v in data]
+    if isinstance(data, dict):
+        values = {k: from_wire(v, parents) for k, v in data.items() if k != "__model__"}
+        model = data.get("__model__")
+        if model is None:
+            return values
+        obj = _WIRE_MODELS[model](**values)
+        key = _WIRE_KEYS.get(model)
+        return parents.setdefault((model, values[key]), obj) if key else obj
+    return data
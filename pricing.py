@@ -0,0 +1,113 @@
+"""Bulk price conversion and stock valuation.
+
+Prices are stored in US dollars.  Screens show them in C$ through the
+conversion rate, and locals add their retail mark-up on top.  The helpers
+here work on whole price/quantity columns at once with NumPy, falling back to
+plain Python when NumPy is not installed.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+try:  # NumPy is optional; everything below also runs on plain lists
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None
+
+try:  # Allow use from both source and frozen builds
+    from . import storage
+except ImportError:  # pragma: no cover - fallback when package name changes
+    import storage  # type: ignore[import-not-found]
+
+
+@dataclass(slots=True)
+class Valuation:
+    items: int
+    quantity: int
+    value_usd: float
+    value_cad: float
+
+
+def markup_factor(markup_pct: float) -> float:
+    return 1.0 + float(markup_pct) / 100.0
+
+
+class PriceColumns:
+    """Base prices ($) and quantities of a set of products, held column-wise."""
+
+    __slots__ = ("prices", "quantities")
+
+    def __init__(self, prices: Iterable[float], quantities: Iterable[int]) -> None:
+        if np is not None:
+            self.prices = np.fromiter(prices, dtype=np.float64)
+            self.quantities = np.fromiter(quantities, dtype=np.int64)
+        else:
+            self.prices = [float(p) for p in prices]
+            self.quantities = [int(q) for q in quantities]
+        if len(self.prices) != len(self.quantities):
+            raise ValueError("prices and quantities must have the same length")
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+    def set(self, index: int, price: float, quantity: int) -> None:
+        self.prices[index] = float(price)
+        self.quantities[index] = int(quantity)
+
+    def valuation(self, rate: float = 1.0, markup_pct: float = 0.0) -> Valuation:
+        if np is not None:
+            quantity = int(self.quantities.sum())
+            base = float(np.dot(self.prices, self.quantities))
+        else:
+            quantity = sum(self.quantities)
+            base = sum(p * q for p, q in zip(self.prices, self.quantities))
+        value_usd = base * markup_factor(markup_pct)
+        return Valuation(len(self), quantity, value_usd, value_usd * float(rate))
+
+
+def what_if(
+    conversion_rate: Optional[float] = None,
+    retail_rates: Optional[dict[int, float]] = None,
+) -> dict[object, tuple[Valuation, Valuation]]:
+    """Preview stock values under a new conversion rate and/or retail rates.
+
+    Nothing is written.  The result maps ``"catalog"`` (warehouse stock at
+    base price) and every local id (stock at that local's retail price) to a
+    ``(current, proposed)`` pair of valuations.  *retail_rates* maps local ids
+    to a proposed mark-up percentage; locals not listed keep their own.
+
+    Both rates scale values linearly, so the base-price sums kept in the
+    storage aggregate tables are enough; no product rows are read.
+    """
+    rate_now = storage.get_conversion_rate()
+    rate_new = rate_now if conversion_rate is None else float(conversion_rate)
+    proposed_rates = retail_rates or {}
+
+    items, quantity, base = storage.catalog_stock_totals()
+    result: dict[object, tuple[Valuation, Valuation]] = {
+        "catalog": (
+            Valuation(items, quantity, base, base * rate_now),
+            Valuation(items, quantity, base, base * rate_new),
+        ),
+    }
+    for loc, items, quantity, base in storage.list_locals_summary():
+        pct_now = storage.get_local_retail_rate(loc)
+        pct_new = float(proposed_rates.get(loc.local_id, pct_now))
+        usd_now = base * markup_factor(pct_now)
+        usd_new = base * markup_factor(pct_new)
+        result[loc.local_id] = (
+            Valuation(items, quantity, usd_now, usd_now * rate_now),
+            Valuation(items, quantity, usd_new, usd_new * rate_new),
+        )
+    return result
+
+
+def preview_conversion_rate(rate: float) -> tuple[Valuation, Valuation]:
+    """Current and proposed value of the warehouse stock under a new conversion rate."""
+    return what_if(conversion_rate=rate)["catalog"]
+
+
+def preview_retail_rate(local, markup_pct: float) -> tuple[Valuation, Valuation]:
+    """Current and proposed value of one local's stock under a new retail rate."""
+    return what_if(retail_rates={local.local_id: markup_pct})[local.local_id]
@@ -0,0 +1,143 @@
+"""Storage backend that talks to a ``server.py`` instance instead of SQLite.
+
+:func:`install` swaps every function in ``storage.READ_API`` and
+``storage.WRITE_API`` for a call to the server, so the windows, importer and
+pricing code work unchanged on a terminal that has no database of its own.
+``main.py`` does this when the ``INVENTORY_SERVER`` environment variable holds
+the server's URL, and ``INVENTORY_TOKEN`` the server's shared token, if any.
+
+Product images are not shared: their files stay on the server's PC, so the
+image functions (``storage.IMAGE_API``) are switched off on remote terminals
+and the product dialogs hide the gallery.
+"""
+from __future__ import annotations
+
+import functools
+import http.client
+import json
+import sqlite3
+import threading
+from urllib.parse import urlsplit
+
+try:  # Allow use from both source and frozen builds
+    from . import storage
+    from .models import from_wire, to_wire
+except ImportError:  # pragma: no cover - fallback when package name changes
+    import storage  # type: ignore[import-not-found]
+    from models import from_wire, to_wire  # type: ignore[import-not-found]
+
+
+class RemoteError(RuntimeError):
+    """A server-side failure with no matching local exception type."""
+
+
+_ERRORS = {
+    "ValueError": ValueError,
+    "TypeError": TypeError,
+    "KeyError": KeyError,
+    "IntegrityError": sqlite3.IntegrityError,
+    "OperationalError": sqlite3.OperationalError,
+    "PermissionError": PermissionError,
+}
+
+
+class RemoteStorage:
+    """Client for the JSON API; each thread keeps its own keep-alive connection."""
+
+    def __init__(self, url: str, timeout: float = 30.0, token: str | None = None) -> None:
+        parts = urlsplit(url if "://" in url else f"http://{url}")
+        if parts.scheme != "http" or not parts.hostname:
+            raise ValueError(f"Not an http:// server URL: {url!r}")
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.prefix = parts.path.rstrip("/")
+        self.timeout = timeout
+        self._headers = {"Content-Type": "application/json"}
+        if token:
+            self._headers["X-Inventory-Token"] = token
+        self._reads = frozenset(storage.READ_API)
+        self._local = threading.local()
+
+    def _request(self, method: str, path: str, body: bytes | None, retry: bool):
+        for attempt in range(2 if retry else 1):
+            conn = getattr(self._local, "conn", None)
+            if conn is None:
+                conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                conn.request(method, self.prefix + path, body, self._headers)
+                response = conn.getresponse()
+                return json.loads(response.read())
+            except (OSError, http.client.HTTPException) as exc:
+                # The server may have dropped an idle connection (e.g. after a
+                # restart); after a timeout the connection is mid-exchange.
+                # Either way it cannot be reused.
+                conn.close()
+                self._local.conn = None
+                if attempt or not retry or isinstance(exc, TimeoutError):
+                    raise
+        raise AssertionError("unreachable")
+
+    def call(self, name: str, *args, **kwargs):
+        """Run ``storage.<name>(*args, **kwargs)`` on the server and return its result.
+
+        Reads are retried once on a dropped connection; writes are not, since
+        the server may already have applied them.
+        """
+        body = json.dumps({"args": to_wire(args), "kwargs": to_wire(kwargs)}, separators=(",", ":")).encode("utf-8")
+        payload = self._request("POST", f"/api/{name}", body, retry=name in self._reads)
+        error = payload.get("error")
+        if error is not None:
+            raise _ERRORS.get(error.get("type"), RemoteError)(error.get("message", ""))
+        return from_wire(payload.get("result"))
+
+    def health(self) -> dict:
+        payload = self._request("GET", "/health", None, retry=True)
+        error = payload.get("error")
+        if error is not None:
+            raise _ERRORS.get(error.get("type"), RemoteError)(error.get("message", ""))
+        return payload["result"]
+
+    def function(self, name: str):
+        """A drop-in replacement for ``storage.<name>`` that calls the server."""
+        @functools.wraps(getattr(storage, name))
+        def call(*args, **kwargs):
+            return self.call(name, *args, **kwargs)
+        return call
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def _iter_sold_products(client: RemoteStorage, *args, batch_size: int = 1000, **filters):
+    # A server-side cursor cannot cross HTTP; walk the keyset pages instead.
+    after = None
+    while True:
+        sales, after = client.call("list_sold_products_page", batch_size, after, *args, **filters)
+        yield from sales
+        if after is None:
+            return
+
+
+def _images_unavailable(*args, **kwargs):
+    raise RemoteError("Product images are only available on the PC that holds the database")
+
+
+def install(url: str, token: str | None = None) -> RemoteStorage:
+    """Route the storage API through the server at *url*; returns the client.
+
+    The server is contacted once up front, so a wrong URL fails here rather
+    than on the first window.
+    """
+    client = RemoteStorage(url, token=token)
+    client.health()
+    for name in (*storage.READ_API, *storage.WRITE_API):
+        setattr(storage, name, client.function(name))
+    storage.iter_sold_products = functools.partial(_iter_sold_products, client)
+    storage.IMAGES_ENABLED = False
+    for name in storage.IMAGE_API:
+        setattr(storage, name, _images_unavailable)
+    storage.clear_reference_cache()
+    return client
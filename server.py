@@ -0,0 +1,207 @@
+"""Headless inventory service: ``storage`` behind a small HTTP/JSON API.
+
+Run it on the PC that holds the database and point the other terminals at it::
+
+    python server.py --db inventory.sqlite3 --port 8765
+    INVENTORY_SERVER=http://store-pc:8765 python main.py
+
+Each call is ``POST /api/<function>`` with ``{"args": [...], "kwargs": {...}}``
+and is answered with ``{"result": ...}`` or ``{"error": {"type", "message"}}``;
+models travel in the format of :func:`models.to_wire`.  ``GET /health``
+reports the schema version.  Only the functions in ``storage.READ_API`` and
+``storage.WRITE_API`` are callable.
+
+The API can delete whole departments, so anything listening beyond this PC
+must be given a shared token (``--token`` or ``INVENTORY_TOKEN``); terminals
+send it in the ``X-Inventory-Token`` header, taken from their own
+``INVENTORY_TOKEN``.  Calls are not encrypted: keep the server on the
+store's trusted LAN, never on an address reachable from the internet.
+
+Reads run on a pool of threads, each with its own SQLite connection.  Writes
+are queued to a single writer thread, so terminals wait their turn instead
+of contending for the database lock.
+"""
+from __future__ import annotations
+
+import argparse
+import hmac
+import importlib
+import ipaddress
+import json
+import os
+import sqlite3
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+if __package__ in (None, ""):
+    # Started as "python server.py": load the app as a package so the
+    # relative imports inside storage resolve.
+    package_root = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, os.path.dirname(package_root))
+    __package__ = os.path.basename(package_root)
+    importlib.import_module(__package__)
+
+from . import storage
+from .models import from_wire, to_wire
+
+DEFAULT_PORT = 8765
+MAX_BODY = 16 * 1024 * 1024
+TOKEN_HEADER = "X-Inventory-Token"
+
+_ERROR_STATUS = (
+    (sqlite3.IntegrityError, 409),
+    (sqlite3.OperationalError, 503),
+    ((ValueError, TypeError, KeyError), 400),
+)
+
+
+class InventoryService:
+    """Runs storage calls: reads on a thread pool, writes on one writer thread."""
+
+    def __init__(self, readers: int = 4) -> None:
+        # Bound now, so the service keeps using SQLite even if this process
+        # later routes ``storage`` elsewhere (remote_storage.install).
+        self._functions = {name: getattr(storage, name) for name in (*storage.READ_API, *storage.WRITE_API)}
+        self._writes = frozenset(storage.WRITE_API)
+        self._readers = ThreadPoolExecutor(max_workers=max(1, readers), thread_name_prefix="rpc-read")
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rpc-write")
+
+    def exposes(self, name: str) -> bool:
+        return name in self._functions
+
+    def call(self, name: str, args: list, kwargs: dict):
+        pool = self._writer if name in self._writes else self._readers
+        return pool.submit(self._functions[name], *args, **kwargs).result()
+
+    def close(self) -> None:
+        self._readers.shutdown(wait=True)
+        self._writer.shutdown(wait=True)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive: one connection per terminal thread
+    # Headers and body go out in separate writes; without TCP_NODELAY the
+    # second one waits for the client's delayed ACK (~40 ms per call).
+    disable_nagle_algorithm = True
+    server: "InventoryServer"
+
+    def do_GET(self) -> None:
+        if not self._authorized():
+            return
+        if self.path.rstrip("/") != "/health":
+            self._reply(404, {"error": {"type": "NotFound", "message": self.path}})
+            return
+        self._reply(200, {"result": {"ok": True, "schema_version": self.server.service.call("schema_version", [], {})}})
+
+    def do_POST(self) -> None:
+        if not self._authorized():
+            return
+        name = self.path[len("/api/"):] if self.path.startswith("/api/") else ""
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if 0 < length <= MAX_BODY else b""
+        if length > MAX_BODY:
+            self.close_connection = True
+            self._reply(413, {"error": {"type": "ValueError", "message": "request body too large"}})
+            return
+        if not self.server.service.exposes(name):
+            self._reply(404, {"error": {"type": "NotFound", "message": f"unknown function {name!r}"}})
+            return
+        try:
+            payload = json.loads(body or b"{}")
+            args, kwargs = from_wire(payload.get("args", [])), from_wire(payload.get("kwargs", {}))
+            result = self.server.service.call(name, args, kwargs)
+        except Exception as exc:
+            status = next((code for types, code in _ERROR_STATUS if isinstance(exc, types)), 500)
+            self._reply(status, {"error": {"type": type(exc).__name__, "message": str(exc)}})
+            return
+        self._reply(200, {"result": to_wire(result)})
+
+    def _authorized(self) -> bool:
+        # Answers 401 itself when the token is missing or wrong.
+        token = self.server.token
+        if not token or hmac.compare_digest(self.headers.get(TOKEN_HEADER, "").encode("utf-8"), token.encode("utf-8")):
+            return True
+        self.close_connection = True
+        self._reply(401, {"error": {"type": "PermissionError", "message": "missing or wrong inventory token"}})
+        return False
+
+    def _reply(self, status: int, payload: dict) -> None:
+        data = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args) -> None:
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class InventoryServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # many terminals may connect at once
+
+    def __init__(self, address: tuple[str, int], service: InventoryService, verbose: bool = False, token: str | None = None) -> None:
+        super().__init__(address, _Handler)
+        self.service = service
+        self.verbose = verbose
+        self.token = token
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.service.close()
+
+
+def _is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def make_server(
+    host: str = "127.0.0.1",
+    port: int = DEFAULT_PORT,
+    readers: int = 4,
+    verbose: bool = False,
+    token: str | None = None,
+) -> InventoryServer:
+    """Open the database at ``storage.DB_PATH`` and bind the service; call serve_forever() on it.
+
+    Listening on anything but a loopback address requires a *token*.
+    """
+    if not token and not _is_loopback(host):
+        raise ValueError(f"refusing to serve on {host} without a token")
+    storage.init_db()
+    return InventoryServer((host, port), InventoryService(readers), verbose, token or None)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Serve the inventory database to other terminals.")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on; other than 127.0.0.1 needs --token and a trusted LAN")
+    parser.add_argument("--token", default=os.environ.get("INVENTORY_TOKEN"), help="shared secret terminals must send (default: $INVENTORY_TOKEN)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--db", help="database file (defaults to the app's own)")
+    parser.add_argument("--readers", type=int, default=4, help="threads serving read calls")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    options = parser.parse_args(argv)
+    if options.db:
+        storage.DB_PATH = os.path.abspath(options.db)
+    if not options.token and not _is_loopback(options.host):
+        parser.error("--token (or INVENTORY_TOKEN) is required to listen beyond this PC")
+    server = make_server(options.host, options.port, options.readers, options.verbose, options.token)
+    print(f"Serving {storage.DB_PATH} on http://{options.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,258 @@
-import sqlite3, os, uuid, shutil, mimetypes
+import sqlite3, os, re, uuid, shutil, math, mimetypes, random, string, threading, time, unicodedata
+from array import array
+from collections import Counter
+from contextlib import contextmanager
 from datetime import date
 from pathlib import Path
-from typing import Optional
+from typing import Iterator, Optional
 from .models import Department, SubDepartment, Product, Local
 
 DB_PATH = os.path.join(os.path.expanduser("~"), ".pyqt_inventory_app.sqlite3")
 _MEDIA_ROOT = Path.home() / ".pyqt_inventory_app_media" / "products"
 _ALLOWED_EXT = {".jpg", ".jpeg", ".png", ".webp", ".bmp", ".gif"}
+# Images live in the media folder of the PC that holds the database;
+# remote_storage turns them off on terminals that use another PC's database.
+IMAGES_ENABLED = True
 
-def get_conn():
-    conn = sqlite3.connect(DB_PATH)
-    try:
-        conn.execute("PRAGMA foreign_keys = ON")
-    except Exception:
+
+class _ThreadConnection:
+    """Connection bound to one thread; handed back to the pool when the thread ends."""
+
+    __slots__ = ("conn", "path", "manager")
+
+    def __init__(self, conn: sqlite3.Connection, path: str, manager: "ConnectionManager") -> None:
+        self.conn = conn; self.path = path; self.manager = manager
+
+    def __del__(self) -> None:
+        conn, self.conn = self.conn, None
+        if conn is None: return
+        try: self.manager._checkin(conn, self.path)
+        except Exception: pass
+
+
+class ConnectionManager:
+    """Keeps long-lived SQLite connections, one per thread.
+
+    The first call from a thread opens (or borrows from the idle pool) a
+    connection that stays bound to that thread.  When a worker thread finishes
+    its connection goes back to the pool, which keeps at most ``pool_size``
+    idle connections around for the next worker.  Connections run in
+    autocommit mode; writes go through :meth:`transaction`.
+    """
+
+    def __init__(self, pool_size: int = 4, cached_statements: int = 256, busy_timeout_ms: int = 5000, lock_retries: int = 4) -> None:
+        self.pool_size = pool_size
+        self.cached_statements = cached_statements
+        self.busy_timeout_ms = busy_timeout_ms
+        self.lock_retries = lock_retries
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._idle: list[tuple[str, sqlite3.Connection]] = []
+
+    def _open(self, path: str) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            path,
+            timeout=self.busy_timeout_ms / 1000.0,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+        )
+        try:
+            conn.execute("PRAGMA foreign_keys = ON")
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+        except Exception:
+            conn.close()
+            raise
+        return conn
+
+    def _checkout(self, path: str) -> sqlite3.Connection:
+        with self._lock:
+            for idx, (idle_path, conn) in enumerate(self._idle):
+                if idle_path == path:
+                    del self._idle[idx]
+                    return conn
+        return self._open(path)
+
+    def _checkin(self, conn: sqlite3.Connection, path: str) -> None:
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            if path == DB_PATH and len(self._idle) < self.pool_size:
+                self._idle.append((path, conn))
+                return
         conn.close()
-        raise
-    return conn
+
+    def connection(self) -> sqlite3.Connection:
+        """Return the calling thread's connection to ``DB_PATH``."""
+        bound: _ThreadConnection | None = getattr(self._local, "bound", None)
+        if bound is not None and bound.conn is not None and bound.path == DB_PATH:
+            return bound.conn
+        if bound is not None and bound.conn is not None:
+            # DB_PATH was switched (e.g. a different store file); drop the stale handle.
+            stale, bound.conn = bound.conn, None
+            stale.close()
+        path = DB_PATH
+        conn = self._checkout(path)
+        self._local.bound = _ThreadConnection(conn, path, self)
+        return conn
+
+    @contextmanager
+    def transaction(self, immediate: bool = False) -> Iterator[sqlite3.Connection]:
+        """Run the block in one transaction on the thread's connection.
+
+        Nested use joins the outer transaction through a savepoint, so helpers
+        can open their own block and still be called from a larger one.
+        """
+        conn = self.connection()
+        if conn.in_transaction:
+            conn.execute("SAVEPOINT nested")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK TO nested"); conn.execute("RELEASE nested")
+                raise
+            conn.execute("RELEASE nested")
+            return
+        conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+
+    def close_all(self) -> None:
+        """Close the calling thread's connection and every idle pooled one."""
+        bound: _ThreadConnection | None = getattr(self._local, "bound", None)
+        if bound is not None and bound.conn is not None:
+            conn, bound.conn = bound.conn, None
+            conn.close()
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for _, conn in idle:
+            conn.close()
+
+
+_connections = ConnectionManager()
+
+def configure_connections(
+    pool_size: int | None = None,
+    cached_statements: int | None = None,
+    busy_timeout_ms: int | None = None,
+    lock_retries: int | None = None,
+) -> None:
+    """Tune the connection pool.
+
+    ``busy_timeout_ms`` is how long a statement waits for another writer's
+    lock; it applies to connections opened afterwards.  ``lock_retries`` is
+    how many more times a write transaction is attempted when the wait still
+    ends in "database is locked".
+    """
+    if pool_size is not None: _connections.pool_size = max(0, int(pool_size))
+    if cached_statements is not None: _connections.cached_statements = max(0, int(cached_statements))
+    if busy_timeout_ms is not None: _connections.busy_timeout_ms = max(0, int(busy_timeout_ms))
+    if lock_retries is not None: _connections.lock_retries = max(0, int(lock_retries))
+
+def get_conn() -> sqlite3.Connection:
+    """Return the calling thread's persistent connection (do not close it)."""
+    return _connections.connection()
+
+def transaction(immediate: bool = False):
+    """Context manager wrapping a block of statements in a single transaction."""
+    return _connections.transaction(immediate)
+
+def close_connections() -> None:
+    _connections.close_all()
+
+_RETRY_BASE_DELAY = 0.05
+
+def _is_locked(exc: sqlite3.OperationalError) -> bool:
+    message = str(exc).lower()
+    return "locked" in message or "busy" in message
+
+def _write_with_retry(work):
+    """Run ``work(conn)`` in a BEGIN IMMEDIATE transaction and return its result.
+
+    If the lock is still held by another connection once the busy timeout
+    expires, the whole transaction is retried with jittered exponential
+    backoff, up to ``lock_retries`` more times.  Inside an outer transaction
+    the work simply joins it, since a partial outer block cannot be replayed.
+    """
+    if get_conn().in_transaction:
+        with transaction(immediate=True) as conn:
+            return work(conn)
+    delay = _RETRY_BASE_DELAY
+    for attempt in range(_connections.lock_retries + 1):
+        try:
+            with transaction(immediate=True) as conn:
+                return work(conn)
+        except sqlite3.OperationalError as exc:
+            if attempt >= _connections.lock_retries or not _is_locked(exc):
+                raise
+        time.sleep(delay * (1.0 + random.random()))
+        delay *= 2
+
+
+class _ReferenceCache:
+    """Read-through cache for small, rarely changing rows (departments, locals, settings).
+
+    Write functions drop it through :func:`_reference_write`.  Commits made by
+    other connections (worker threads or other processes) are caught by
+    ``PRAGMA data_version``: each thread remembers the value its connection
+    last reported, and any change clears the cache.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._entries: dict[object, object] = {}
+        self._path: str | None = None
+        self._seen = threading.local()
+        self._generation = 0
+
+    def _validate(self, conn: sqlite3.Connection) -> None:
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        seen = getattr(self._seen, "state", None)
+        with self._lock:
+            if self._path != DB_PATH or seen is None or seen[0] is not conn or seen[1] != version:
+                self._entries.clear()
+                self._generation += 1
+                self._path = DB_PATH
+        self._seen.state = (conn, version)
+
+    def get(self, key: object, loader):
+        self._validate(get_conn())
+        with self._lock:
+            if key in self._entries:
+                return self._entries[key]
+            generation = self._generation
+        value = loader()
+        with self._lock:
+            # A write that cleared the cache while we loaded may have made the value stale.
+            if self._generation == generation:
+                self._entries[key] = value
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+
+_reference_cache = _ReferenceCache()
+
+def clear_reference_cache() -> None:
+    """Forget cached departments, subdepartments, locals and settings."""
+    _reference_cache.clear()
+
+@contextmanager
+def _reference_write(immediate: bool = False) -> Iterator[sqlite3.Connection]:
+    """Transaction for writes to cached tables; the cache is dropped once it ends."""
+    try:
+        with transaction(immediate) as conn:
+            yield conn
+    finally:
+        _reference_cache.clear()
 
 def _delete_media_for_products(prod_ids: list[str]) -> None:
     for pid in prod_ids:
@@ -23,14 +260,17 @@ def _delete_media_for_products(prod_ids: list[str]) -> None:
         if media_dir.exists() and media_dir.is_dir():
             shutil.rmtree(media_dir, ignore_errors=True)
 
-def init_db():
-    conn = get_conn(); cur = conn.cursor()
-    cur.execute("""CREATE TABLE IF NOT EXISTS departments(
+# ---- schema migrations -----------------------------------------------------
+# Each step upgrades the schema by one version and must be safe to run against
+# databases created by older builds, which never recorded a user_version.
+
+def _migration_base_tables(conn: sqlite3.Connection) -> None:
+    conn.execute("""CREATE TABLE IF NOT EXISTS departments(
         dept_id INTEGER PRIMARY KEY AUTOINCREMENT,
         abbreviation TEXT NOT NULL UNIQUE,
         name TEXT NOT NULL
     )""" )
-    cur.execute("""CREATE TABLE IF NOT EXISTS subdepartments(
+    conn.execute("""CREATE TABLE IF NOT EXISTS subdepartments(
         sub_id INTEGER PRIMARY KEY AUTOINCREMENT,
         parent_dept_id INTEGER NOT NULL,
         abbreviation TEXT NOT NULL,
@@ -38,7 +278,7 @@ def init_db():
         UNIQUE(parent_dept_id, abbreviation),
         FOREIGN KEY(parent_dept_id) REFERENCES departments(dept_id) ON DELETE CASCADE
     )""" )
-    cur.execute("""CREATE TABLE IF NOT EXISTS products(
+    conn.execute("""CREATE TABLE IF NOT EXISTS products(
         prod_id TEXT PRIMARY KEY,
         parent_sub_id INTEGER NOT NULL,
         name TEXT NOT NULL,
@@ -47,16 +287,16 @@ def init_db():
         quantity INTEGER NOT NULL,
         FOREIGN KEY(parent_sub_id) REFERENCES subdepartments(sub_id) ON DELETE CASCADE
     )""" )
-    cur.execute("""CREATE TABLE IF NOT EXISTS locals(
+    conn.execute("""CREATE TABLE IF NOT EXISTS locals(
         local_id INTEGER PRIMARY KEY AUTOINCREMENT,
         name TEXT NOT NULL UNIQUE,
         retail_rate REAL NOT NULL DEFAULT 0
     )""" )
-    cur.execute("""CREATE TABLE IF NOT EXISTS settings(
+    conn.execute("""CREATE TABLE IF NOT EXISTS settings(
         key TEXT PRIMARY KEY,
         value TEXT NOT NULL
     )""" )
-    cur.execute("""CREATE TABLE IF NOT EXISTS product_images(
+    conn.execute("""CREATE TABLE IF NOT EXISTS product_images(
         image_id TEXT PRIMARY KEY,
         prod_id TEXT NOT NULL,
         rel_path TEXT NOT NULL,
@@ -66,7 +306,7 @@ def init_db():
         created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
         FOREIGN KEY(prod_id) REFERENCES products(prod_id) ON DELETE CASCADE
     )""" )
-    cur.execute("""CREATE TABLE IF NOT EXISTS local_products(
+    conn.execute("""CREATE TABLE IF NOT EXISTS local_products(
         local_id INTEGER NOT NULL,
         prod_id TEXT NOT NULL,
         quantity INTEGER NOT NULL DEFAULT 0,
@@ -74,17 +314,7 @@ def init_db():
         FOREIGN KEY(local_id) REFERENCES locals(local_id) ON DELETE CASCADE,
         FOREIGN KEY(prod_id) REFERENCES products(prod_id) ON DELETE CASCADE
     )""" )
-    cols = {row[1] for row in cur.execute("PRAGMA table_info(local_products)")}
-    if "quantity" not in cols:
-        cur.execute("ALTER TABLE local_products ADD COLUMN quantity INTEGER NOT NULL DEFAULT 0")
-    # Backwards compatibility: older databases may be missing the quantity column on
-    # the local_products table.  Ensure it exists so newer code paths can rely on it.
-    existing_columns = conn.execute("PRAGMA table_info(local_products)").fetchall()
-    if not any(col[1] == "quantity" for col in existing_columns):
-        conn.execute("ALTER TABLE local_products ADD COLUMN quantity INTEGER NOT NULL DEFAULT 0")
-        conn.execute("UPDATE local_products SET quantity = 0 WHERE quantity IS NULL")
-
-    cur.execute("""CREATE TABLE IF NOT EXISTS sold_products(
+    conn.execute("""CREATE TABLE IF NOT EXISTS sold_products(
         sale_id TEXT PRIMARY KEY,
         prod_id TEXT NOT NULL,
         qty INTEGER NOT NULL,
@@ -96,22 +326,355 @@ def init_db():
         FOREIGN KEY(prod_id) REFERENCES products(prod_id) ON DELETE CASCADE,
         FOREIGN KEY(local_id) REFERENCES locals(local_id) ON DELETE SET NULL
     )""" )
-    sold_cols = {row[1] for row in cur.execute("PRAGMA table_info(sold_products)")}
+
+def _table_columns(conn: sqlite3.Connection, table: str) -> set[str]:
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+def _migration_local_products_quantity(conn: sqlite3.Connection) -> None:
+    # Older databases may be missing the quantity column on local_products.
+    if "quantity" not in _table_columns(conn, "local_products"):
+        conn.execute("ALTER TABLE local_products ADD COLUMN quantity INTEGER NOT NULL DEFAULT 0")
+
+def _migration_sold_products_client_date(conn: sqlite3.Connection) -> None:
+    sold_cols = _table_columns(conn, "sold_products")
     if "client" not in sold_cols:
-        cur.execute("ALTER TABLE sold_products ADD COLUMN client TEXT")
+        conn.execute("ALTER TABLE sold_products ADD COLUMN client TEXT")
     if "sold_on" not in sold_cols:
-        cur.execute("ALTER TABLE sold_products ADD COLUMN sold_on TEXT NOT NULL DEFAULT (DATE('now'))")
-    conn.commit(); conn.close()
+        # ALTER TABLE cannot use a non-constant default, so back-fill from sold_at.
+        conn.execute("ALTER TABLE sold_products ADD COLUMN sold_on TEXT NOT NULL DEFAULT ''")
+        conn.execute("UPDATE sold_products SET sold_on = COALESCE(DATE(sold_at), DATE('now')) WHERE sold_on = ''")
+
+# Index steps list their CREATE INDEX statements literally, so each keeps
+# building exactly the schema of its version whatever later steps add.
+
+def _migration_secondary_indexes(conn: sqlite3.Connection) -> None:
+    # Secondary indexes backing the hot lookups below.
+    for ddl in (
+        "CREATE INDEX IF NOT EXISTS idx_subdepartments_parent_name ON subdepartments(parent_dept_id, name)",
+        "CREATE INDEX IF NOT EXISTS idx_products_parent_sub_name ON products(parent_sub_id, name)",
+        "CREATE INDEX IF NOT EXISTS idx_local_products_prod ON local_products(prod_id)",
+        "CREATE INDEX IF NOT EXISTS idx_sold_products_sold_at ON sold_products(sold_at, sale_id)",
+        "CREATE INDEX IF NOT EXISTS idx_sold_products_prod ON sold_products(prod_id)",
+        "CREATE INDEX IF NOT EXISTS idx_sold_products_local ON sold_products(local_id)",
+        "CREATE INDEX IF NOT EXISTS idx_product_images_prod ON product_images(prod_id)",
+    ):
+        conn.execute(ddl)
+
+def _migration_product_code_nocase_index(conn: sqlite3.Connection) -> None:
+    # Case-insensitive product code lookups (barcode scans, typed codes).
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_products_prod_id_nocase ON products(prod_id COLLATE NOCASE)")
+
+def _migration_product_search_index(conn: sqlite3.Connection) -> None:
+    # External-content FTS5 index over products, kept in sync by triggers.
+    # It is keyed on the implicit rowid of products, which VACUUM may renumber
+    # (the primary key is TEXT): always compact through vacuum(), which
+    # rebuilds the index straight after.
+    try:
+        conn.execute("""CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+            prod_id, name, description,
+            content='products', content_rowid='rowid',
+            tokenize='unicode61 remove_diacritics 2'
+        )""")
+    except sqlite3.OperationalError:
+        return  # SQLite built without FTS5; search falls back to LIKE scans.
+    conn.execute("""CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts(rowid, prod_id, name, description)
+        VALUES (new.rowid, new.prod_id, new.name, new.description);
+    END""")
+    conn.execute("""CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, prod_id, name, description)
+        VALUES ('delete', old.rowid, old.prod_id, old.name, old.description);
+    END""")
+    conn.execute("""CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF prod_id, name, description ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, prod_id, name, description)
+        VALUES ('delete', old.rowid, old.prod_id, old.name, old.description);
+        INSERT INTO products_fts(rowid, prod_id, name, description)
+        VALUES (new.rowid, new.prod_id, new.name, new.description);
+    END""")
+    conn.execute("INSERT INTO products_fts(products_fts) VALUES('rebuild')")
+
+def _migration_catalog_version(conn: sqlite3.Connection) -> None:
+    # Bumped on every change to product ids/names so in-memory search indexes
+    # (in this or another process) know when to rebuild.
+    conn.execute("INSERT OR IGNORE INTO settings(key, value) VALUES('catalog_version', '0')")
+    bump = "UPDATE settings SET value = CAST(value AS INTEGER) + 1 WHERE key = 'catalog_version';"
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS products_catalog_ai AFTER INSERT ON products BEGIN {bump} END")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS products_catalog_ad AFTER DELETE ON products BEGIN {bump} END")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS products_catalog_au AFTER UPDATE OF prod_id, name ON products BEGIN {bump} END")
+
+def _migration_sales_keyset_indexes(conn: sqlite3.Connection) -> None:
+    # Per-location sales pages walk (location, sold_at, sale_id) in order; the
+    # local_id composite also serves the ON DELETE SET NULL lookups.
+    conn.execute("DROP INDEX IF EXISTS idx_sold_products_local")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sold_products_local_time ON sold_products(local_id, sold_at, sale_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sold_products_location_time ON sold_products(location_type, sold_at, sale_id)")
+
+def _migration_sales_date_index(conn: sqlite3.Connection) -> None:
+    # Date-range reports walk sales by sale date (sold_on), which may differ
+    # from the registration time when a sale is entered late.
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sold_products_sold_on ON sold_products(sold_on, sold_at, sale_id)")
+
+# Aggregate tables kept current by the triggers below, so list screens read
+# counts and stock values by primary key instead of re-aggregating.
+_AGGREGATE_TABLES = {
+    "department_stats": """CREATE TABLE IF NOT EXISTS department_stats(
+        dept_id INTEGER PRIMARY KEY REFERENCES departments(dept_id) ON DELETE CASCADE,
+        subdepartment_count INTEGER NOT NULL DEFAULT 0
+    )""",
+    "subdepartment_stats": """CREATE TABLE IF NOT EXISTS subdepartment_stats(
+        sub_id INTEGER PRIMARY KEY REFERENCES subdepartments(sub_id) ON DELETE CASCADE,
+        product_count INTEGER NOT NULL DEFAULT 0,
+        stock_quantity INTEGER NOT NULL DEFAULT 0,
+        stock_value REAL NOT NULL DEFAULT 0
+    )""",
+    "local_stats": """CREATE TABLE IF NOT EXISTS local_stats(
+        local_id INTEGER PRIMARY KEY REFERENCES locals(local_id) ON DELETE CASCADE,
+        item_count INTEGER NOT NULL DEFAULT 0,
+        stock_quantity INTEGER NOT NULL DEFAULT 0,
+        stock_value REAL NOT NULL DEFAULT 0
+    )""",
+}
+
+_AGGREGATE_TRIGGERS = {
+    "departments_stats_ai": """AFTER INSERT ON departments BEGIN
+        INSERT OR IGNORE INTO department_stats(dept_id) VALUES (new.dept_id);
+    END""",
+    "subdepartments_stats_ai": """AFTER INSERT ON subdepartments BEGIN
+        INSERT OR IGNORE INTO subdepartment_stats(sub_id) VALUES (new.sub_id);
+        UPDATE department_stats SET subdepartment_count = subdepartment_count + 1 WHERE dept_id = new.parent_dept_id;
+    END""",
+    "subdepartments_stats_ad": """AFTER DELETE ON subdepartments BEGIN
+        UPDATE department_stats SET subdepartment_count = subdepartment_count - 1 WHERE dept_id = old.parent_dept_id;
+    END""",
+    "subdepartments_stats_au": """AFTER UPDATE OF parent_dept_id ON subdepartments BEGIN
+        UPDATE department_stats SET subdepartment_count = subdepartment_count - 1 WHERE dept_id = old.parent_dept_id;
+        UPDATE department_stats SET subdepartment_count = subdepartment_count + 1 WHERE dept_id = new.parent_dept_id;
+    END""",
+    "locals_stats_ai": """AFTER INSERT ON locals BEGIN
+        INSERT OR IGNORE INTO local_stats(local_id) VALUES (new.local_id);
+    END""",
+    "products_stats_ai": """AFTER INSERT ON products BEGIN
+        UPDATE subdepartment_stats SET product_count = product_count + 1,
+            stock_quantity = stock_quantity + new.quantity,
+            stock_value = stock_value + new.price * new.quantity
+        WHERE sub_id = new.parent_sub_id;
+    END""",
+    # Drop local stock before the product row goes, so the local_products
+    # delete trigger can still read the product price.
+    "products_stats_bd": """BEFORE DELETE ON products BEGIN
+        DELETE FROM local_products WHERE prod_id = old.prod_id;
+    END""",
+    "products_stats_ad": """AFTER DELETE ON products BEGIN
+        UPDATE subdepartment_stats SET product_count = product_count - 1,
+            stock_quantity = stock_quantity - old.quantity,
+            stock_value = stock_value - old.price * old.quantity
+        WHERE sub_id = old.parent_sub_id;
+    END""",
+    "products_stats_au": """AFTER UPDATE OF parent_sub_id, price, quantity ON products BEGIN
+        UPDATE subdepartment_stats SET product_count = product_count - 1,
+            stock_quantity = stock_quantity - old.quantity,
+            stock_value = stock_value - old.price * old.quantity
+        WHERE sub_id = old.parent_sub_id;
+        UPDATE subdepartment_stats SET product_count = product_count + 1,
+            stock_quantity = stock_quantity + new.quantity,
+            stock_value = stock_value + new.price * new.quantity
+        WHERE sub_id = new.parent_sub_id;
+        UPDATE local_stats SET stock_value = stock_value + (new.price - old.price) * (
+            SELECT lp.quantity FROM local_products lp WHERE lp.local_id = local_stats.local_id AND lp.prod_id = new.prod_id)
+        WHERE new.price <> old.price
+          AND local_id IN (SELECT local_id FROM local_products WHERE prod_id = new.prod_id);
+    END""",
+    "local_products_stats_ai": """AFTER INSERT ON local_products BEGIN
+        UPDATE local_stats SET item_count = item_count + 1,
+            stock_quantity = stock_quantity + new.quantity,
+            stock_value = stock_value + new.quantity * COALESCE((SELECT price FROM products WHERE prod_id = new.prod_id), 0)
+        WHERE local_id = new.local_id;
+    END""",
+    "local_products_stats_ad": """AFTER DELETE ON local_products BEGIN
+        UPDATE local_stats SET item_count = item_count - 1,
+            stock_quantity = stock_quantity - old.quantity,
+            stock_value = stock_value - old.quantity * COALESCE((SELECT price FROM products WHERE prod_id = old.prod_id), 0)
+        WHERE local_id = old.local_id;
+    END""",
+    "local_products_stats_au": """AFTER UPDATE OF local_id, prod_id, quantity ON local_products BEGIN
+        UPDATE local_stats SET item_count = item_count - 1,
+            stock_quantity = stock_quantity - old.quantity,
+            stock_value = stock_value - old.quantity * COALESCE((SELECT price FROM products WHERE prod_id = old.prod_id), 0)
+        WHERE local_id = old.local_id;
+        UPDATE local_stats SET item_count = item_count + 1,
+            stock_quantity = stock_quantity + new.quantity,
+            stock_value = stock_value + new.quantity * COALESCE((SELECT price FROM products WHERE prod_id = new.prod_id), 0)
+        WHERE local_id = new.local_id;
+    END""",
+}
+
+# Each aggregate table recomputed from scratch: (table, key, columns, query).
+_AGGREGATE_QUERIES = (
+    ("department_stats", "dept_id", ("subdepartment_count",), """
+        SELECT d.dept_id, COUNT(s.sub_id)
+        FROM departments d LEFT JOIN subdepartments s ON s.parent_dept_id = d.dept_id
+        GROUP BY d.dept_id"""),
+    ("subdepartment_stats", "sub_id", ("product_count", "stock_quantity", "stock_value"), """
+        SELECT s.sub_id, COUNT(p.prod_id), COALESCE(SUM(p.quantity), 0), COALESCE(SUM(p.price * p.quantity), 0)
+        FROM subdepartments s LEFT JOIN products p ON p.parent_sub_id = s.sub_id
+        GROUP BY s.sub_id"""),
+    ("local_stats", "local_id", ("item_count", "stock_quantity", "stock_value"), """
+        SELECT l.local_id, COUNT(lp.prod_id), COALESCE(SUM(lp.quantity), 0), COALESCE(SUM(p.price * lp.quantity), 0)
+        FROM locals l
+        LEFT JOIN local_products lp ON lp.local_id = l.local_id
+        LEFT JOIN products p ON p.prod_id = lp.prod_id
+        GROUP BY l.local_id"""),
+)
+
+def _rebuild_aggregates(conn: sqlite3.Connection) -> None:
+    for table, key, columns, query in _AGGREGATE_QUERIES:
+        conn.execute(f"DELETE FROM {table}")
+        conn.execute(f"INSERT INTO {table}({key}, {', '.join(columns)}) {query}")
+
+def check_aggregates(repair: bool = False) -> list[tuple[str, int]]:
+    """Recount the aggregate tables from scratch and report drift.
+
+    Returns the ``(table, key)`` pairs whose stored figures disagree with a
+    full recount; with *repair* the tables are rebuilt if any do.
+    """
+    with transaction(immediate=repair) as conn:
+        mismatched: list[tuple[str, int]] = []
+        for table, key, columns, query in _AGGREGATE_QUERIES:
+            expected = {row[0]: row[1:] for row in conn.execute(query)}
+            stored = {row[0]: row[1:] for row in conn.execute(f"SELECT {key}, {', '.join(columns)} FROM {table}")}
+            for ident in expected.keys() | stored.keys():
+                want, have = expected.get(ident), stored.get(ident)
+                if want is None or have is None or any(not math.isclose(a, b, rel_tol=1e-9, abs_tol=0.005) for a, b in zip(want, have)):
+                    mismatched.append((table, ident))
+        if repair and mismatched:
+            _rebuild_aggregates(conn)
+    return sorted(mismatched)
+
+def _migration_catalog_aggregates(conn: sqlite3.Connection) -> None:
+    for ddl in _AGGREGATE_TABLES.values():
+        conn.execute(ddl)
+    for name, body in _AGGREGATE_TRIGGERS.items():
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+    _rebuild_aggregates(conn)
+
+def _migration_product_id_sequences(conn: sqlite3.Connection) -> None:
+    conn.execute("""CREATE TABLE IF NOT EXISTS product_id_sequences(
+        prefix TEXT PRIMARY KEY,
+        next_value INTEGER NOT NULL
+    )""")
+    # Products inserted with explicit ids (add_product, imports) push the
+    # matching sequence past them, so allocated ids never collide.
+    conn.execute("""CREATE TRIGGER IF NOT EXISTS products_id_sequence_ai AFTER INSERT ON products BEGIN
+        UPDATE product_id_sequences SET next_value = CAST(substr(new.prod_id, length(prefix) + 1) AS INTEGER) + 1
+        WHERE new.prod_id >= prefix || '0' AND new.prod_id < prefix || ':'
+          AND substr(new.prod_id, length(prefix) + 1) NOT GLOB '*[^0-9]*'
+          AND CAST(substr(new.prod_id, length(prefix) + 1) AS INTEGER) >= next_value;
+    END""")
+    prefixes = {f"{d}{s}" for d, s in conn.execute(
+        "SELECT d.abbreviation, s.abbreviation FROM subdepartments s JOIN departments d ON d.dept_id = s.parent_dept_id"
+    )}
+    for prefix in prefixes:
+        conn.execute(
+            "INSERT OR IGNORE INTO product_id_sequences(prefix, next_value) VALUES(?, ?)",
+            (prefix, _highest_product_number(conn, prefix) + 1),
+        )
+
+def _migration_image_thumbnails(conn: sqlite3.Connection) -> None:
+    # Comma-separated sizes of the cached thumbnails of each image.
+    if "thumb_sizes" not in _table_columns(conn, "product_images"):
+        conn.execute("ALTER TABLE product_images ADD COLUMN thumb_sizes TEXT NOT NULL DEFAULT ''")
+
+def _migration_catalog_changes(conn: sqlite3.Connection) -> None:
+    # Log of product ids whose search text changed (insert, delete, id/name/
+    # description edit).  In-memory indexes replay the rows after the last
+    # seq they applied instead of rebuilding; the log keeps the latest 100k
+    # rows, and an index that fell further behind is rebuilt from scratch.
+    # Replaces the catalog_version counter.
+    conn.execute("""CREATE TABLE IF NOT EXISTS catalog_changes(
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        prod_id TEXT NOT NULL
+    )""")
+    for name in ("products_catalog_ai", "products_catalog_ad", "products_catalog_au"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+    conn.execute("DELETE FROM settings WHERE key = 'catalog_version'")
+    conn.execute("""CREATE TRIGGER IF NOT EXISTS products_changes_ai AFTER INSERT ON products BEGIN
+        INSERT INTO catalog_changes(prod_id) VALUES (new.prod_id);
+    END""")
+    conn.execute("""CREATE TRIGGER IF NOT EXISTS products_changes_ad AFTER DELETE ON products BEGIN
+        INSERT INTO catalog_changes(prod_id) VALUES (old.prod_id);
+    END""")
+    conn.execute("""CREATE TRIGGER IF NOT EXISTS products_changes_au AFTER UPDATE OF prod_id, name, description ON products BEGIN
+        INSERT INTO catalog_changes(prod_id) VALUES (old.prod_id);
+        INSERT INTO catalog_changes(prod_id) SELECT new.prod_id WHERE new.prod_id <> old.prod_id;
+    END""")
+    conn.execute("""CREATE TRIGGER IF NOT EXISTS catalog_changes_prune AFTER INSERT ON catalog_changes
+        WHEN new.seq % 1024 = 0 BEGIN
+        DELETE FROM catalog_changes WHERE seq <= new.seq - 100000;
+    END""")
+
+_MIGRATIONS = [
+    _migration_base_tables,
+    _migration_local_products_quantity,
+    _migration_sold_products_client_date,
+    _migration_secondary_indexes,
+    _migration_product_code_nocase_index,
+    _migration_product_search_index,
+    _migration_catalog_version,
+    _migration_sales_keyset_indexes,
+    _migration_catalog_aggregates,
+    _migration_product_id_sequences,
+    _migration_sales_date_index,
+    _migration_image_thumbnails,
+    _migration_catalog_changes,
+]
+SCHEMA_VERSION = len(_MIGRATIONS)
+
+def schema_version() -> int:
+    return int(get_conn().execute("PRAGMA user_version").fetchone()[0])
+
+_search_index_paths: dict[str, bool] = {}
+
+def _has_search_index() -> bool:
+    """Whether the current database has the FTS5 product index (memoised per file)."""
+    known = _search_index_paths.get(DB_PATH)
+    if known is None:
+        row = get_conn().execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='products_fts'").fetchone()
+        known = row is not None
+        if known or schema_version() >= SCHEMA_VERSION:
+            _search_index_paths[DB_PATH] = known
+    return known
+
+def has_search_index() -> bool:
+    """Whether ``search_products`` uses the FTS5 index rather than a LIKE scan."""
+    return _has_search_index()
+
+def init_db():
+    """Apply any pending migrations.
+
+    An up-to-date database costs a single ``PRAGMA user_version`` read, so
+    windows can call this freely.
+    """
+    if schema_version() >= SCHEMA_VERSION:
+        return
+    with transaction(immediate=True) as conn:
+        # Re-read under the write lock in case another process migrated meanwhile.
+        version = int(conn.execute("PRAGMA user_version").fetchone()[0])
+        for step in _MIGRATIONS[version:]:
+            step(conn)
+        if version < SCHEMA_VERSION:
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+def _query_setting(key: str) -> Optional[str]:
+    row = get_conn().execute("SELECT value FROM settings WHERE key=?", (key,)).fetchone()
+    return row[0] if row else None
 
 def _get_setting(key: str) -> Optional[str]:
-    conn = get_conn(); row = conn.execute("SELECT value FROM settings WHERE key=?", (key,)).fetchone()
-    conn.close(); return row[0] if row else None
+    return _reference_cache.get(("setting", key), lambda: _query_setting(key))
 
 def _set_setting(key: str, value: str) -> None:
-    conn = get_conn()
-    conn.execute("""INSERT INTO settings(key,value) VALUES(?,?)
-                  ON CONFLICT(key) DO UPDATE SET value=excluded.value""", (key, value))
-    conn.commit(); conn.close()
+    with _reference_write() as conn:
+        conn.execute("""INSERT INTO settings(key,value) VALUES(?,?)
+                      ON CONFLICT(key) DO UPDATE SET value=excluded.value""", (key, value))
 
 def get_conversion_rate(default: float = 36.62) -> float:
     v = _get_setting("conversion_rate")
@@ -123,68 +686,100 @@ def get_conversion_rate(default: float = 36.62) -> float:
 def set_conversion_rate(rate: float) -> None:
     _set_setting("conversion_rate", str(rate))
 
+def _query_retail_rate(local_id: int):
+    row = get_conn().execute("SELECT retail_rate FROM locals WHERE local_id=?", (local_id,)).fetchone()
+    return row[0] if row else None
+
 def get_local_retail_rate(local: Local, default: float = 0.0) -> float:
-    conn = get_conn(); row = conn.execute("SELECT retail_rate FROM locals WHERE local_id=?", (local.local_id,)).fetchone()
-    conn.close()
-    if not row: return default
-    try: return float(row[0])
+    value = _reference_cache.get(("retail_rate", local.local_id), lambda: _query_retail_rate(local.local_id))
+    if value is None: return default
+    try: return float(value)
     except: return default
 
 def set_local_retail_rate(local: Local, rate: float) -> None:
-    conn = get_conn(); conn.execute("UPDATE locals SET retail_rate=? WHERE local_id=?", (float(rate), local.local_id))
-    conn.commit(); conn.close()
+    with _reference_write() as conn:
+        conn.execute("UPDATE locals SET retail_rate=? WHERE local_id=?", (float(rate), local.local_id))
+
+def _query_departments() -> list[Department]:
+    rows = get_conn().execute("SELECT dept_id, abbreviation, name FROM departments ORDER BY name").fetchall()
+    return [Department(*r) for r in rows]
 
 def list_departments():
-    conn = get_conn(); rows = conn.execute("SELECT dept_id, abbreviation, name FROM departments ORDER BY name").fetchall()
-    conn.close(); return [Department(*r) for r in rows]
+    return list(_reference_cache.get("departments", _query_departments))
+
+def list_departments_summary() -> list[tuple[Department, int]]:
+    """Departments with their number of subdepartments."""
+    rows = get_conn().execute("""
+        SELECT d.dept_id, d.abbreviation, d.name, COALESCE(st.subdepartment_count, 0)
+        FROM departments d
+        LEFT JOIN department_stats st ON st.dept_id = d.dept_id
+        ORDER BY d.name
+    """).fetchall()
+    return [(Department(r[0], r[1], r[2]), int(r[3])) for r in rows]
 
 def get_department_by_id(dept_id: int) -> Department | None:
-    conn = get_conn()
-    row = conn.execute("SELECT dept_id, abbreviation, name FROM departments WHERE dept_id=?", (dept_id,)).fetchone()
-    conn.close()
+    row = get_conn().execute("SELECT dept_id, abbreviation, name FROM departments WHERE dept_id=?", (dept_id,)).fetchone()
     return Department(*row) if row else None
 
 def add_department(abbrev: str, name: str) -> Department:
-    conn = get_conn(); cur = conn.cursor()
-    cur.execute("INSERT INTO departments(abbreviation,name) VALUES(?,?)", (abbrev, name))
-    dept_id = cur.lastrowid; conn.commit(); conn.close()
+    with _reference_write() as conn:
+        dept_id = conn.execute("INSERT INTO departments(abbreviation,name) VALUES(?,?)", (abbrev, name)).lastrowid
     return Department(dept_id, abbrev, name)
 
 def rename_department(dept: Department, new_name: str):
-    conn = get_conn(); conn.execute("UPDATE departments SET name=? WHERE dept_id=?", (new_name, dept.dept_id)); conn.commit(); conn.close()
+    with _reference_write() as conn:
+        conn.execute("UPDATE departments SET name=? WHERE dept_id=?", (new_name, dept.dept_id))
 
 def delete_department_if_empty(dept: Department) -> bool:
-    conn = get_conn()
-    row = conn.execute("SELECT COUNT(*) FROM subdepartments WHERE parent_dept_id=?", (dept.dept_id,)).fetchone()
-    if row and row[0]==0:
-        conn.execute("DELETE FROM departments WHERE dept_id=?", (dept.dept_id,)); conn.commit(); conn.close(); return True
-    conn.close(); return False
+    with _reference_write() as conn:
+        row = conn.execute("SELECT COUNT(*) FROM subdepartments WHERE parent_dept_id=?", (dept.dept_id,)).fetchone()
+        if row and row[0]==0:
+            conn.execute("DELETE FROM departments WHERE dept_id=?", (dept.dept_id,)); return True
+    return False
 
 def delete_department(dept: Department) -> None:
-    conn = get_conn()
-    prod_rows = conn.execute(
-        """
-        SELECT p.prod_id
-        FROM products p
-        JOIN subdepartments s ON s.sub_id = p.parent_sub_id
-        WHERE s.parent_dept_id = ?
-        """,
-        (dept.dept_id,),
-    ).fetchall()
-    prod_ids = [row[0] for row in prod_rows]
-    conn.execute("DELETE FROM departments WHERE dept_id=?", (dept.dept_id,))
-    conn.commit(); conn.close()
+    with _reference_write() as conn:
+        prod_rows = conn.execute(
+            """
+            SELECT p.prod_id
+            FROM products p
+            JOIN subdepartments s ON s.sub_id = p.parent_sub_id
+            WHERE s.parent_dept_id = ?
+            """,
+            (dept.dept_id,),
+        ).fetchall()
+        prod_ids = [row[0] for row in prod_rows]
+        conn.execute("DELETE FROM departments WHERE dept_id=?", (dept.dept_id,))
     if prod_ids:
         _delete_media_for_products(prod_ids)
 
+def _query_subdepartments(dept: Department) -> list[SubDepartment]:
+    rows = get_conn().execute("""SELECT sub_id, abbreviation, name FROM subdepartments WHERE parent_dept_id=? ORDER BY name""", (dept.dept_id,)).fetchall()
+    return [SubDepartment(r[0], dept, r[1], r[2]) for r in rows]
+
 def list_subdepartments(dept: Department):
-    conn = get_conn()
-    rows = conn.execute("""SELECT sub_id, abbreviation, name FROM subdepartments WHERE parent_dept_id=? ORDER BY name""", (dept.dept_id,)).fetchall()
-    conn.close(); return [SubDepartment(r[0], dept, r[1], r[2]) for r in rows]
+    return list(_reference_cache.get(("subdepartments", dept.dept_id), lambda: _query_subdepartments(dept)))
+
+def list_subdepartments_summary(dept: Department) -> list[tuple[SubDepartment, int, float]]:
+    """Subdepartments of *dept* with their product count and stock value ($)."""
+    rows = get_conn().execute("""
+        SELECT s.sub_id, s.abbreviation, s.name, COALESCE(st.product_count, 0), COALESCE(st.stock_value, 0)
+        FROM subdepartments s
+        LEFT JOIN subdepartment_stats st ON st.sub_id = s.sub_id
+        WHERE s.parent_dept_id = ?
+        ORDER BY s.name
+    """, (dept.dept_id,)).fetchall()
+    return [(SubDepartment(r[0], dept, r[1], r[2]), int(r[3]), float(r[4])) for r in rows]
+
+def catalog_stock_totals() -> tuple[int, int, float]:
+    """Product count, warehouse quantity and stock value ($) of the whole catalog."""
+    row = get_conn().execute(
+        "SELECT COALESCE(SUM(product_count), 0), COALESCE(SUM(stock_quantity), 0), COALESCE(SUM(stock_value), 0) FROM subdepartment_stats"
+    ).fetchone()
+    return int(row[0]), int(row[1]), float(row[2])
 
 def get_subdepartment_by_id(sub_id: int) -> SubDepartment | None:
-    conn = get_conn()
-    row = conn.execute(
+    row = get_conn().execute(
         """
         SELECT s.sub_id, s.parent_dept_id, s.abbreviation, s.name,
                d.dept_id, d.abbreviation, d.name
@@ -194,184 +789,307 @@ def get_subdepartment_by_id(sub_id: int) -> SubDepartment | None:
         """,
         (sub_id,),
     ).fetchone()
-    conn.close()
     if not row:
         return None
     dept = Department(row[4], row[5], row[6])
     return SubDepartment(row[0], dept, row[2], row[3])
 
 def add_subdepartment(dept: Department, abbrev: str, name: str) -> SubDepartment:
-    conn = get_conn(); cur = conn.cursor()
-    cur.execute("INSERT INTO subdepartments(parent_dept_id,abbreviation,name) VALUES(?,?,?)", (dept.dept_id, abbrev, name))
-    sub_id = cur.lastrowid; conn.commit(); conn.close()
+    with _reference_write() as conn:
+        sub_id = conn.execute("INSERT INTO subdepartments(parent_dept_id,abbreviation,name) VALUES(?,?,?)", (dept.dept_id, abbrev, name)).lastrowid
     return SubDepartment(sub_id, dept, abbrev, name)
 
 def rename_subdepartment(sub: SubDepartment, new_name: str):
-    conn = get_conn(); conn.execute("UPDATE subdepartments SET name=? WHERE sub_id=?", (new_name, sub.sub_id)); conn.commit(); conn.close()
+    with _reference_write() as conn:
+        conn.execute("UPDATE subdepartments SET name=? WHERE sub_id=?", (new_name, sub.sub_id))
 
 def delete_subdepartment_if_empty(sub: SubDepartment) -> bool:
-    conn = get_conn(); row = conn.execute("SELECT COUNT(*) FROM products WHERE parent_sub_id=?", (sub.sub_id,)).fetchone()
-    if row and row[0]==0:
-        conn.execute("DELETE FROM subdepartments WHERE sub_id=?", (sub.sub_id,)); conn.commit(); conn.close(); return True
-    conn.close(); return False
+    with _reference_write() as conn:
+        row = conn.execute("SELECT COUNT(*) FROM products WHERE parent_sub_id=?", (sub.sub_id,)).fetchone()
+        if row and row[0]==0:
+            conn.execute("DELETE FROM subdepartments WHERE sub_id=?", (sub.sub_id,)); return True
+    return False
 
 def delete_subdepartment(sub: SubDepartment) -> None:
-    conn = get_conn(); prod_rows = conn.execute("SELECT prod_id FROM products WHERE parent_sub_id=?", (sub.sub_id,)).fetchall()
-    prod_ids = [row[0] for row in prod_rows]
-    conn.execute("DELETE FROM subdepartments WHERE sub_id=?", (sub.sub_id,))
-    conn.commit(); conn.close()
+    with _reference_write() as conn:
+        prod_rows = conn.execute("SELECT prod_id FROM products WHERE parent_sub_id=?", (sub.sub_id,)).fetchall()
+        prod_ids = [row[0] for row in prod_rows]
+        conn.execute("DELETE FROM subdepartments WHERE sub_id=?", (sub.sub_id,))
     if prod_ids:
         _delete_media_for_products(prod_ids)
 
 def list_products(sub: SubDepartment):
-    conn = get_conn()
-    rows = conn.execute("""SELECT prod_id, name, description, price, quantity FROM products WHERE parent_sub_id=? ORDER BY name""", (sub.sub_id,)).fetchall()
-    conn.close(); return [Product(r[0], sub, r[1], r[2], float(r[3]), int(r[4])) for r in rows]
+    rows = get_conn().execute("""SELECT prod_id, name, description, price, quantity FROM products WHERE parent_sub_id=? ORDER BY name""", (sub.sub_id,)).fetchall()
+    return [Product(r[0], sub, r[1], r[2], float(r[3]), int(r[4])) for r in rows]
+
+def list_products_page(
+    sub: SubDepartment,
+    limit: int = 500,
+    after: tuple[str, str] | None = None,
+) -> tuple[list[Product], tuple[str, str] | None]:
+    """Return one page of *sub*'s products in name order, plus the next cursor.
+
+    ``after`` is the ``(name, prod_id)`` of the last product already read;
+    the returned cursor is ``None`` on the last page.
+    """
+    query = "SELECT prod_id, name, description, price, quantity FROM products WHERE parent_sub_id=?"
+    params: list = [sub.sub_id]
+    if after is not None:
+        query += " AND (name, prod_id) > (?, ?)"
+        params.extend(after)
+    query += " ORDER BY name, prod_id LIMIT ?"
+    params.append(int(limit))
+    products = [Product(r[0], sub, r[1], r[2], float(r[3]), int(r[4])) for r in get_conn().execute(query, params)]
+    cursor = (products[-1].name, products[-1].prod_id) if len(products) == limit else None
+    return products, cursor
 
 def add_product(product: Product):
-    conn = get_conn()
-    conn.execute("""INSERT INTO products(prod_id,parent_sub_id,name,description,price,quantity)
-                  VALUES(?,?,?,?,?,?)""", (product.prod_id, product.parent.sub_id, product.name, product.description, float(product.price), int(product.quantity)))
-    conn.commit(); conn.close()
+    with transaction() as conn:
+        conn.execute("""INSERT INTO products(prod_id,parent_sub_id,name,description,price,quantity)
+                      VALUES(?,?,?,?,?,?)""", (product.prod_id, product.parent.sub_id, product.name, product.description, float(product.price), int(product.quantity)))
 
 def update_product(product: Product):
-    conn = get_conn()
-    conn.execute("""UPDATE products SET name=?, description=?, price=?, quantity=? WHERE prod_id=?""" ,
-                 (product.name, product.description, float(product.price), int(product.quantity), product.prod_id))
-    conn.commit(); conn.close()
+    with transaction() as conn:
+        conn.execute("""UPDATE products SET name=?, description=?, price=?, quantity=? WHERE prod_id=?""" ,
+                     (product.name, product.description, float(product.price), int(product.quantity), product.prod_id))
 
 def delete_product(product: Product):
-    conn = get_conn(); conn.execute("DELETE FROM products WHERE prod_id=?", (product.prod_id,)); conn.commit(); conn.close()
+    with transaction() as conn:
+        conn.execute("DELETE FROM products WHERE prod_id=?", (product.prod_id,))
 
 def count_products(sub: SubDepartment) -> int:
-    conn = get_conn(); row = conn.execute("SELECT COUNT(*) FROM products WHERE parent_sub_id=?", (sub.sub_id,)).fetchone()
-    conn.close(); return int(row[0] or 0)
+    row = get_conn().execute("SELECT product_count FROM subdepartment_stats WHERE sub_id=?", (sub.sub_id,)).fetchone()
+    return int(row[0] or 0) if row else 0
+
+def _query_locals() -> list[Local]:
+    rows = get_conn().execute("SELECT local_id, name FROM locals ORDER BY name").fetchall()
+    return [Local(*r) for r in rows]
 
 def list_locals():
-    conn = get_conn(); rows = conn.execute("SELECT local_id, name FROM locals ORDER BY name").fetchall()
-    conn.close(); return [Local(*r) for r in rows]
+    return list(_reference_cache.get("locals", _query_locals))
+
+def list_locals_summary() -> list[tuple[Local, int, int, float]]:
+    """Locals with their item count, total quantity and stock value ($, before retail mark-up)."""
+    rows = get_conn().execute("""
+        SELECT l.local_id, l.name, COALESCE(st.item_count, 0), COALESCE(st.stock_quantity, 0),
+               COALESCE(st.stock_value, 0)
+        FROM locals l
+        LEFT JOIN local_stats st ON st.local_id = l.local_id
+        ORDER BY l.name
+    """).fetchall()
+    return [(Local(r[0], r[1]), int(r[2]), int(r[3]), float(r[4])) for r in rows]
 
 def add_local(name: str) -> Local:
-    conn = get_conn(); cur = conn.cursor()
-    cur.execute("INSERT INTO locals(name) VALUES(?)", (name,))
-    local_id = cur.lastrowid; conn.commit(); conn.close()
+    with _reference_write() as conn:
+        local_id = conn.execute("INSERT INTO locals(name) VALUES(?)", (name,)).lastrowid
     return Local(local_id, name)
 
 def delete_local(local: Local):
-    conn = get_conn(); conn.execute("DELETE FROM locals WHERE local_id=?", (local.local_id,)); conn.commit(); conn.close()
+    with _reference_write() as conn:
+        conn.execute("DELETE FROM locals WHERE local_id=?", (local.local_id,))
 
 def count_local_products(local: Local) -> int:
-    conn = get_conn(); row = conn.execute("SELECT COUNT(*) FROM local_products WHERE local_id=?", (local.local_id,)).fetchone()
-    conn.close(); return int(row[0] or 0)
+    row = get_conn().execute("SELECT item_count FROM local_stats WHERE local_id=?", (local.local_id,)).fetchone()
+    return int(row[0] or 0) if row else 0
+
+# Product ids are "<dept abbrev><sub abbrev><n>".  product_id_sequences keeps
+# the next n per prefix so ids are handed out without scanning products.
+
+def _product_id_prefix(conn: sqlite3.Connection, sub: SubDepartment) -> str:
+    row = conn.execute(
+        """SELECT d.abbreviation, s.abbreviation
+               FROM subdepartments s JOIN departments d ON d.dept_id=s.parent_dept_id
+               WHERE s.sub_id=?""",
+        (sub.sub_id,),
+    ).fetchone()
+    if not row:
+        raise ValueError("Subdepartment not found")
+    return f"{row[0]}{row[1]}"
+
+def _highest_product_number(conn: sqlite3.Connection, prefix: str) -> int:
+    # prefix||'0' <= id < prefix||':' selects ids continuing with a digit, via the primary key.
+    row = conn.execute(
+        """SELECT MAX(CAST(substr(prod_id, ?) AS INTEGER)) FROM products
+           WHERE prod_id >= ? AND prod_id < ? AND substr(prod_id, ?) NOT GLOB '*[^0-9]*'""",
+        (len(prefix) + 1, prefix + "0", prefix + ":", len(prefix) + 1),
+    ).fetchone()
+    return int(row[0] or 0)
+
+def _next_product_number(conn: sqlite3.Connection, prefix: str) -> int:
+    row = conn.execute("SELECT next_value FROM product_id_sequences WHERE prefix=?", (prefix,)).fetchone()
+    return int(row[0]) if row else _highest_product_number(conn, prefix) + 1
+
+def _allocate_product_ids(conn: sqlite3.Connection, sub: SubDepartment, count: int) -> list[str]:
+    """Take *count* consecutive ids for *sub*; call inside a write transaction."""
+    prefix = _product_id_prefix(conn, sub)
+    row = conn.execute(
+        "UPDATE product_id_sequences SET next_value = next_value + ? WHERE prefix=? RETURNING next_value", (count, prefix),
+    ).fetchone()
+    if row is not None:
+        end = int(row[0])
+    else:
+        # First id of this prefix: seed the sequence past any ids already in use.
+        end = _highest_product_number(conn, prefix) + 1 + count
+        conn.execute("INSERT INTO product_id_sequences(prefix, next_value) VALUES(?, ?)", (prefix, end))
+    return [f"{prefix}{n}" for n in range(end - count, end)]
+
+def reserve_product_ids(sub: SubDepartment, count: int) -> list[str]:
+    """Reserve a block of *count* new product ids for *sub* (e.g. for a bulk import).
+
+    Reserved ids are never handed out again, even if they end up unused.
+    """
+    if count <= 0:
+        return []
+    return _write_with_retry(lambda conn: _allocate_product_ids(conn, sub, int(count)))
 
 def generate_next_product_id(sub: SubDepartment) -> str:
+    """Preview the id the next product of *sub* will get; nothing is reserved.
+
+    Use :func:`create_product` (or :func:`reserve_product_ids`) to actually
+    take an id, so two terminals never hand out the same one.
+    """
     conn = get_conn()
-    try:
-        row = conn.execute(
-            """SELECT d.abbreviation, s.abbreviation
-                   FROM subdepartments s JOIN departments d ON d.dept_id=s.parent_dept_id
-                   WHERE s.sub_id=?""",
-            (sub.sub_id,),
-        ).fetchone()
-        if row:
-            d_abbr, s_abbr = row[0], row[1]
-        else:
-            d_abbr = getattr(sub.parent, "abbreviation", None)
-            s_abbr = getattr(sub, "abbreviation", None)
-            if not d_abbr or not s_abbr:
-                raise ValueError("Subdepartment not found")
-            exists = conn.execute(
-                "SELECT 1 FROM subdepartments WHERE sub_id=?",
-                (sub.sub_id,),
-            ).fetchone()
-            if not exists:
-                raise ValueError("Subdepartment not found")
-        prefix = f"{d_abbr}{s_abbr}"
-        existing_rows = conn.execute(
-            "SELECT prod_id FROM products WHERE parent_sub_id=?",
-            (sub.sub_id,),
-        ).fetchall()
-        highest = 0
-        for (prod_id,) in existing_rows:
-            if not isinstance(prod_id, str):
-                continue
-            if not prod_id.startswith(prefix):
-                continue
-            suffix = prod_id[len(prefix):]
-            if not suffix:
-                continue
-            if suffix.isdigit():
-                highest = max(highest, int(suffix))
-        return f"{prefix}{highest + 1}"
-    finally:
-        conn.close()
+    prefix = _product_id_prefix(conn, sub)
+    return f"{prefix}{_next_product_number(conn, prefix)}"
+
+def create_product(sub: SubDepartment, name: str, description: str, price: float, quantity: int) -> Product:
+    """Insert a product under the next free id of *sub*, allocated in the same transaction."""
+    def work(conn: sqlite3.Connection) -> Product:
+        prod_id = _allocate_product_ids(conn, sub, 1)[0]
+        product = Product(prod_id, sub, name, description, float(price), int(quantity))
+        conn.execute("""INSERT INTO products(prod_id,parent_sub_id,name,description,price,quantity)
+                      VALUES(?,?,?,?,?,?)""", (prod_id, sub.sub_id, name, description, product.price, product.quantity))
+        return product
+    return _write_with_retry(work)
+
+def add_products(entries) -> tuple[list[str], list[tuple[int, str]]]:
+    """Insert many products in one transaction.
+
+    *entries* are ``(sub, prod_id, name, description, price, quantity)``
+    tuples; a ``None`` prod_id gets the next id of its subdepartment.
+    Returns the inserted ids and ``(index, reason)`` for entries skipped
+    because their id is already taken.
+    """
+    entries = list(entries)
+    rejected: list[tuple[int, str]] = []
+    explicit: list[tuple] = []
+    generated: dict[int, list[int]] = {}
+    seen: set[str] = set()
+    with transaction(immediate=True) as conn:
+        wanted = [e[1] for e in entries if e[1] is not None]
+        for start in range(0, len(wanted), 500):
+            chunk = wanted[start:start + 500]
+            seen.update(r[0] for r in conn.execute(f"SELECT prod_id FROM products WHERE prod_id IN ({','.join('?' * len(chunk))})", chunk))
+        for idx, (sub, prod_id, name, desc, price, qty) in enumerate(entries):
+            if prod_id is None:
+                generated.setdefault(sub.sub_id, []).append(idx)
+            elif prod_id in seen:
+                rejected.append((idx, f"product id {prod_id} already exists"))
+            else:
+                seen.add(prod_id)
+                explicit.append((prod_id, sub.sub_id, name, desc, float(price), int(qty)))
+        # Explicit ids go in first so the sequence trigger moves past them
+        # before the remaining ids are allocated.
+        insert = "INSERT INTO products(prod_id,parent_sub_id,name,description,price,quantity) VALUES(?,?,?,?,?,?)"
+        conn.executemany(insert, explicit)
+        inserted = [row[0] for row in explicit]
+        for indexes in generated.values():
+            sub = entries[indexes[0]][0]
+            ids = _allocate_product_ids(conn, sub, len(indexes))
+            rows = [(prod_id, sub.sub_id) + tuple(entries[i][2:4]) + (float(entries[i][4]), int(entries[i][5]))
+                    for prod_id, i in zip(ids, indexes)]
+            conn.executemany(insert, rows)
+            inserted.extend(ids)
+    return inserted, rejected
 
 def _ensure_media_dir(prod_id: str) -> Path:
     d = _MEDIA_ROOT / prod_id; d.mkdir(parents=True, exist_ok=True); return d
 
-def add_product_images(prod: Product, src_paths):
+def thumbnail_path(prod_id: str, image_id: str, size: int) -> Path:
+    return _MEDIA_ROOT / prod_id / "thumbs" / f"{image_id}_{int(size)}.png"
+
+def _thumb_sizes(value: str | None) -> tuple[int, ...]:
+    return tuple(int(v) for v in (value or "").split(",") if v.strip().isdigit())
+
+def add_product_images(prod: Product, src_paths, thumbnailer=None):
+    """Copy images into *prod*'s media folder and register them.
+
+    ``thumbnailer(path, prod_id, image_id)``, if given, is called on each
+    copy and returns the thumbnail sizes it cached; they are recorded with
+    the image.  Files are copied and scaled before the write transaction
+    starts, so other terminals are not kept waiting on image work.
+    """
     if not src_paths: return []
-    dest_dir = _ensure_media_dir(prod.prod_id); rels = []
-    conn = get_conn()
-    try:
-        for p in src_paths:
-            sp = Path(p)
-            if not sp.exists() or not sp.is_file(): continue
-            ext = sp.suffix.lower()
-            if ext not in _ALLOWED_EXT: continue
-            fname = f"{uuid.uuid4().hex}{ext}"; dp = dest_dir / fname
-            try: shutil.copy2(sp, dp)
-            except Exception: continue
-            rel_path = str(Path(prod.prod_id) / fname); mime, _ = mimetypes.guess_type(str(dp))
-            conn.execute("INSERT INTO product_images(image_id, prod_id, rel_path, mime_type) VALUES(?,?,?,?)",
-                         (uuid.uuid4().hex, prod.prod_id, rel_path, mime or ""))
-            rels.append(rel_path)
-        conn.commit()
-    finally:
-        conn.close()
+    dest_dir = _ensure_media_dir(prod.prod_id); rels = []; rows = []
+    for p in src_paths:
+        sp = Path(p)
+        if not sp.exists() or not sp.is_file(): continue
+        ext = sp.suffix.lower()
+        if ext not in _ALLOWED_EXT: continue
+        fname = f"{uuid.uuid4().hex}{ext}"; dp = dest_dir / fname
+        try: shutil.copy2(sp, dp)
+        except Exception: continue
+        image_id = uuid.uuid4().hex
+        sizes = sorted(thumbnailer(dp, prod.prod_id, image_id)) if thumbnailer else []
+        rel_path = str(Path(prod.prod_id) / fname); mime, _ = mimetypes.guess_type(str(dp))
+        rows.append((image_id, prod.prod_id, rel_path, mime or "", ",".join(map(str, sizes))))
+        rels.append(rel_path)
+    if rows:
+        with transaction() as conn:
+            conn.executemany("INSERT INTO product_images(image_id, prod_id, rel_path, mime_type, thumb_sizes) VALUES(?,?,?,?,?)", rows)
     return rels
 
 def list_product_images(prod: Product):
-    conn = get_conn()
-    rows = conn.execute("""SELECT rel_path, image_id, is_primary FROM product_images WHERE prod_id=?
-                          ORDER BY COALESCE(sort_order,999999), created_at""", (prod.prod_id,)).fetchall()
-    conn.close(); return [{"rel_path": r[0], "image_id": r[1], "is_primary": int(r[2])} for r in rows]
+    rows = get_conn().execute("""SELECT rel_path, image_id, is_primary, thumb_sizes FROM product_images WHERE prod_id=?
+                              ORDER BY COALESCE(sort_order,999999), created_at""", (prod.prod_id,)).fetchall()
+    return [{"rel_path": r[0], "image_id": r[1], "is_primary": int(r[2]), "thumb_sizes": _thumb_sizes(r[3])} for r in rows]
+
+def set_thumbnail_sizes(image_id: str, sizes) -> None:
+    """Record which thumbnail sizes are cached for an image."""
+    with transaction() as conn:
+        conn.execute("UPDATE product_images SET thumb_sizes=? WHERE image_id=?",
+                     (",".join(str(int(s)) for s in sorted(set(sizes))), image_id))
 
 def get_image_abspath(rel_path: str) -> Path:
     return _MEDIA_ROOT / rel_path
 
 def delete_product_image(image_id: str) -> None:
-    conn = get_conn(); conn.execute("DELETE FROM product_images WHERE image_id=?", (image_id,)); conn.commit(); conn.close()
+    with transaction() as conn:
+        row = conn.execute("SELECT prod_id, thumb_sizes FROM product_images WHERE image_id=?", (image_id,)).fetchone()
+        conn.execute("DELETE FROM product_images WHERE image_id=?", (image_id,))
+    if row:
+        for size in _thumb_sizes(row[1]):
+            try: thumbnail_path(row[0], image_id, size).unlink()
+            except OSError: pass
 
 def get_product_total_quantity(product) -> int:
     prod_id = product.prod_id if hasattr(product, "prod_id") else str(product)
-    conn = get_conn(); row = conn.execute("SELECT quantity FROM products WHERE prod_id=?", (prod_id,)).fetchone()
-    conn.close(); return int(row[0]) if row else 0
+    row = get_conn().execute("SELECT quantity FROM products WHERE prod_id=?", (prod_id,)).fetchone()
+    return int(row[0]) if row else 0
 
 def get_allocated_qty_for_product(product) -> int:
     prod_id = product.prod_id if hasattr(product, "prod_id") else str(product)
-    conn = get_conn(); row = conn.execute("SELECT COALESCE(SUM(quantity),0) FROM local_products WHERE prod_id=?", (prod_id,)).fetchone()
-    conn.close(); return int(row[0] or 0)
+    row = get_conn().execute("SELECT COALESCE(SUM(quantity),0) FROM local_products WHERE prod_id=?", (prod_id,)).fetchone()
+    return int(row[0] or 0)
 
 def add_product_to_local(local: Local, product: Product, qty: int) -> None:
     qty = int(qty)
     if qty <= 0: return
-    conn = get_conn(); cur = conn.cursor()
-    row = cur.execute("SELECT quantity FROM local_products WHERE local_id=? AND prod_id=?", (local.local_id, product.prod_id)).fetchone()
-    if row:
-        new_q = int(row[0]) + qty
-        cur.execute("UPDATE local_products SET quantity=? WHERE local_id=? AND prod_id=?", (new_q, local.local_id, product.prod_id))
-    else:
-        cur.execute("INSERT INTO local_products(local_id, prod_id, quantity) VALUES(?,?,?)", (local.local_id, product.prod_id, qty))
-    conn.commit(); conn.close()
+    with transaction() as conn:
+        cur = conn.cursor()
+        row = cur.execute("SELECT quantity FROM local_products WHERE local_id=? AND prod_id=?", (local.local_id, product.prod_id)).fetchone()
+        if row:
+            new_q = int(row[0]) + qty
+            cur.execute("UPDATE local_products SET quantity=? WHERE local_id=? AND prod_id=?", (new_q, local.local_id, product.prod_id))
+        else:
+            cur.execute("INSERT INTO local_products(local_id, prod_id, quantity) VALUES(?,?,?)", (local.local_id, product.prod_id, qty))
 
 def remove_product_from_local(local: Local, product: Product) -> None:
-    conn = get_conn(); conn.execute("DELETE FROM local_products WHERE local_id=? AND prod_id=?", (local.local_id, product.prod_id))
-    conn.commit(); conn.close()
+    with transaction() as conn:
+        conn.execute("DELETE FROM local_products WHERE local_id=? AND prod_id=?", (local.local_id, product.prod_id))
 
 def list_products_for_local(local: Local):
-    conn = get_conn()
-    rows = conn.execute("""
+    rows = get_conn().execute("""
         SELECT p.prod_id, p.name, p.description, p.price, p.quantity AS total_qty,
                lp.quantity AS local_qty,
                s.sub_id, s.parent_dept_id, s.abbreviation, s.name,
@@ -383,43 +1101,74 @@ def list_products_for_local(local: Local):
         WHERE lp.local_id = ?
         ORDER BY p.name COLLATE NOCASE
     """, (local.local_id,)).fetchall()
-    conn.close()
-    out = []
-    for r in rows:
-        dept = Department(r[10], r[11], r[12]); sub = SubDepartment(r[6], dept, r[8], r[9])
-        prod = Product(r[0], sub, r[1], r[2], float(r[3]), int(r[5]))
-        try: prod.total_quantity = int(r[4])
-        except: pass
-        out.append(prod)
-    return out
+    parents = _IdentityMap()
+    return [
+        Product(r[0], parents.subdepartment(r[6], r[8], r[9], r[10], r[11], r[12]), r[1], r[2],
+                float(r[3]), int(r[5]), int(r[4]))
+        for r in rows
+    ]
+
+_PRODUCT_SELECT = """
+    SELECT p.prod_id, p.parent_sub_id, p.name, p.description, p.price, p.quantity,
+           s.sub_id, s.parent_dept_id, s.abbreviation, s.name,
+           d.dept_id, d.abbreviation, d.name
+    FROM products p
+    JOIN subdepartments s ON s.sub_id = p.parent_sub_id
+    JOIN departments d ON d.dept_id = s.parent_dept_id
+"""
+
+class _IdentityMap:
+    """Shares one Department/SubDepartment object per id across a result set."""
+
+    __slots__ = ("departments", "subdepartments")
+
+    def __init__(self) -> None:
+        self.departments: dict[int, Department] = {}
+        self.subdepartments: dict[int, SubDepartment] = {}
+
+    def subdepartment(self, sub_id, sub_abbrev, sub_name, dept_id, dept_abbrev, dept_name) -> SubDepartment:
+        sub = self.subdepartments.get(sub_id)
+        if sub is None:
+            dept = self.departments.get(dept_id)
+            if dept is None:
+                dept = self.departments[dept_id] = Department(dept_id, dept_abbrev, dept_name)
+            sub = self.subdepartments[sub_id] = SubDepartment(sub_id, dept, sub_abbrev, sub_name)
+        return sub
+
+def _product_from_row(row, parents: _IdentityMap | None = None) -> Product:
+    """Build a Product from a ``_PRODUCT_SELECT`` row, interning parents in *parents*."""
+    sub = (parents or _IdentityMap()).subdepartment(row[6], row[8], row[9], row[10], row[11], row[12])
+    return Product(row[0], sub, row[2], row[3], float(row[4]), int(row[5]))
+
+# SQLite's NOCASE collation only folds ASCII letters; mirror that in Python.
+_NOCASE_FOLD = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
 
 def get_product_by_id(prod_code: str):
-    conn = get_conn()
-    row = conn.execute("""
-        SELECT p.prod_id, p.parent_sub_id, p.name, p.description, p.price, p.quantity,
-               s.sub_id, s.parent_dept_id, s.abbreviation, s.name,
-               d.dept_id, d.abbreviation, d.name
-        FROM products p
-        JOIN subdepartments s ON s.sub_id = p.parent_sub_id
-        JOIN departments d ON d.dept_id = s.parent_dept_id
-        WHERE UPPER(p.prod_id) = UPPER(?)
-    """, (prod_code,)).fetchone()
-    if not row: conn.close(); return None
-    dept = Department(row[10], row[11], row[12]); sub = SubDepartment(row[6], dept, row[8], row[9])
-    prod = Product(row[0], sub, row[2], row[3], float(row[4]), int(row[5]))
-    conn.close(); return prod
-
-def search_products(term: str) -> list[Product]:
-    conn = get_conn()
+    # COLLATE NOCASE lets the lookup use idx_products_prod_id_nocase.
+    row = get_conn().execute(_PRODUCT_SELECT + " WHERE p.prod_id = ? COLLATE NOCASE", (prod_code,)).fetchone()
+    return _product_from_row(row) if row else None
+
+def get_products_by_ids(prod_codes) -> list[Product | None]:
+    """Look up several product codes at once (case-insensitive).
+
+    The result is aligned with ``prod_codes``; unknown codes map to ``None``.
+    """
+    codes = [str(c) for c in prod_codes]
+    found: dict[str, Product] = {}
+    unique = list(dict.fromkeys(c.translate(_NOCASE_FOLD) for c in codes))
+    conn = get_conn(); parents = _IdentityMap()
+    for start in range(0, len(unique), 500):
+        chunk = unique[start:start + 500]
+        marks = ",".join("?" * len(chunk))
+        for row in conn.execute(_PRODUCT_SELECT + f" WHERE p.prod_id COLLATE NOCASE IN ({marks})", chunk):
+            found[row[0].translate(_NOCASE_FOLD)] = _product_from_row(row, parents)
+    return [found.get(c.translate(_NOCASE_FOLD)) for c in codes]
+
+def _search_products_like(term: str, limit: int | None) -> list[Product]:
+    """Substring search used when the SQLite build lacks FTS5."""
     like_term = f"%{term}%"
-    rows = conn.execute(
-        """
-        SELECT p.prod_id, p.parent_sub_id, p.name, p.description, p.price, p.quantity,
-               s.sub_id, s.parent_dept_id, s.abbreviation, s.name,
-               d.dept_id, d.abbreviation, d.name
-        FROM products p
-        JOIN subdepartments s ON s.sub_id = p.parent_sub_id
-        JOIN departments d ON d.dept_id = s.parent_dept_id
+    rows = get_conn().execute(
+        _PRODUCT_SELECT + """
         WHERE UPPER(p.prod_id) LIKE UPPER(?) OR UPPER(p.name) LIKE UPPER(?)
         ORDER BY
             CASE
@@ -430,59 +1179,273 @@ def search_products(term: str) -> list[Product]:
                 ELSE 4
             END,
             p.prod_id
+        LIMIT ?
         """,
-        (like_term, like_term, term, term, like_term, like_term),
+        (like_term, like_term, term, term, like_term, like_term, -1 if limit is None else int(limit)),
     ).fetchall()
-    conn.close()
+    parents = _IdentityMap()
+    return [_product_from_row(row, parents) for row in rows]
 
-    results: list[Product] = []
-    for row in rows:
-        dept = Department(row[10], row[11], row[12])
-        sub = SubDepartment(row[6], dept, row[8], row[9])
-        results.append(Product(row[0], sub, row[2], row[3], float(row[4]), int(row[5])))
-    return results
+def _search_words(text: str) -> list[str]:
+    """Split text the way the unicode61 tokenizer does (folded, no diacritics)."""
+    folded = unicodedata.normalize("NFKD", text.casefold())
+    folded = "".join(ch for ch in folded if not unicodedata.combining(ch))
+    return re.findall(r"[^\W_]+", folded)
 
-def list_sold_products(
-    department_id: int | None = None,
-    subdepartment_id: int | None = None,
-    location_type: str | None = None,
-    local_id: int | None = None,
-) -> list[dict]:
-    """Return sold products sorted from most recent to oldest.
+def _fts_match_expression(term: str) -> str:
+    """Turn free text into an FTS5 query: every word must match as a prefix."""
+    return " ".join(f'"{tok}"*' for tok in _search_words(term))
 
-    Optional filters can be applied by department, subdepartment and location.
+def filter_search_results(products: list[Product], term: str, indexed: bool) -> list[Product]:
+    """Narrow an earlier ``search_products`` result to a longer query in memory.
+
+    Applies the same matching and exact-match-first ordering as
+    ``search_products``, so a result fetched for "vel" can answer "vela"
+    without another query, provided the earlier result was not truncated.
+    *indexed* is what ``has_search_index()`` reported for the database the
+    result came from; this function never touches the database itself.
     """
+    words = _search_words(term)
+    if not indexed:
+        needle = term.upper()
+        hits = [p for p in products if needle in p.prod_id.upper() or needle in p.name.upper()]
+    elif not words:
+        return []
+    else:
+        hits = []
+        for p in products:
+            tokens = _search_words(f"{p.prod_id} {p.name} {p.description}")
+            if all(any(tok.startswith(w) for tok in tokens) for w in words):
+                hits.append(p)
+    key = term.strip().translate(_NOCASE_FOLD)
+    def exact_rank(p: Product) -> int:
+        if p.prod_id.translate(_NOCASE_FOLD) == key: return 0
+        if p.name.translate(_NOCASE_FOLD) == key: return 1
+        return 2
+    return sorted(hits, key=exact_rank)
 
+def search_products(term: str, limit: int | None = None) -> list[Product]:
+    """Full-text search over product id, name and description.
+
+    Every word of ``term`` is matched as a prefix.  An exact id match comes
+    first, then an exact name match, then the rest ordered by bm25 relevance.
+    """
+    if not _has_search_index():
+        return _search_products_like(term, limit)
+    match = _fts_match_expression(term)
+    if not match:
+        return []
+    rows = get_conn().execute(
+        """
+        SELECT p.prod_id, p.parent_sub_id, p.name, p.description, p.price, p.quantity,
+               s.sub_id, s.parent_dept_id, s.abbreviation, s.name,
+               d.dept_id, d.abbreviation, d.name
+        FROM products_fts
+        JOIN products p ON p.rowid = products_fts.rowid
+        JOIN subdepartments s ON s.sub_id = p.parent_sub_id
+        JOIN departments d ON d.dept_id = s.parent_dept_id
+        WHERE products_fts MATCH ?
+        ORDER BY
+            CASE
+                WHEN p.prod_id = ? COLLATE NOCASE THEN 0
+                WHEN p.name = ? COLLATE NOCASE THEN 1
+                ELSE 2
+            END,
+            bm25(products_fts, 10.0, 5.0, 1.0),
+            p.prod_id
+        LIMIT ?
+        """,
+        (match, term.strip(), term.strip(), -1 if limit is None else int(limit)),
+    ).fetchall()
+    parents = _IdentityMap()
+    return [_product_from_row(row, parents) for row in rows]
+
+def rebuild_search_index() -> None:
+    """Re-index every product from scratch (e.g. after restoring a backup or a VACUUM)."""
+    with _fuzzy_lock:
+        _fuzzy_indexes.pop(DB_PATH, None)
+    if not _has_search_index():
+        return
+    with transaction() as conn:
+        conn.execute("INSERT INTO products_fts(products_fts) VALUES('rebuild')")
+
+def vacuum() -> None:
+    """Compact the database file, then rebuild the search index.
+
+    VACUUM may renumber the rowids of ``products`` that the FTS5 index points
+    at, so running it any other way (e.g. from the sqlite3 shell) must be
+    followed by :func:`rebuild_search_index`.
+    """
     conn = get_conn()
-    query = """
-        SELECT
-            s.sale_id,
-            s.prod_id,
-            s.qty,
-            s.sold_on,
-            s.sold_at,
-            s.location_type,
-            s.local_id,
-            p.name,
-            p.description,
-            p.price,
-            s.client,
-            l.name as local_name,
-            d.dept_id,
-            d.name as dept_name,
-            sd.sub_id,
-            sd.name as sub_name
-        FROM sold_products s
-        JOIN products p ON p.prod_id = s.prod_id
-        JOIN subdepartments sd ON sd.sub_id = p.parent_sub_id
-        JOIN departments d ON d.dept_id = sd.parent_dept_id
-        LEFT JOIN locals l ON l.local_id = s.local_id
+    if conn.in_transaction:
+        raise RuntimeError("vacuum() cannot run inside a transaction")
+    conn.execute("VACUUM")
+    rebuild_search_index()
+
+# ---- typo-tolerant search -----------------------------------------------------
+# Candidates come from an in-memory trigram index kept current from
+# catalog_changes, so edits cost well under a millisecond to apply.  A query
+# still counts every posting of its rarest trigrams in Python: expect tens of
+# milliseconds per search at 100k products and 100-300 ms at 500k when names
+# share most of their trigrams.
+
+def _trigrams(text: str) -> set[str]:
+    """pg_trgm-style trigrams: case/accent-folded words padded with blanks."""
+    grams: set[str] = set()
+    for word in _search_words(text):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+class _TrigramIndex:
+    """In-memory inverted index from trigram to products (ids and names).
+
+    Products are numbered in the order they were added to the index, not by
+    rowid, so VACUUM cannot invalidate it.  A changed product is marked dead
+    under its old number and added again under a new one; the index is
+    rebuilt once the dead outnumber the live.
+    """
+
+    def __init__(self, seq: int, rows) -> None:
+        self.seq = seq  # last catalog_changes row applied
+        self.postings: dict[str, array] = {}
+        self.docs: dict[str, int] = {}  # prod_id -> number
+        self.keys: list[str | None] = []  # number -> prod_id, None once dead
+        self.dead = 0
+        for prod_id, name in rows:
+            self._add(prod_id, name)
+
+    def _add(self, prod_id: str, name: str) -> None:
+        doc = len(self.keys)
+        self.keys.append(prod_id)
+        self.docs[prod_id] = doc
+        postings = self.postings
+        for gram in _trigrams(f"{prod_id} {name}"):
+            bucket = postings.get(gram)
+            if bucket is None:
+                bucket = postings[gram] = array("I")
+            bucket.append(doc)
+
+    def update(self, seq: int, rows) -> None:
+        """Apply ``(prod_id, name)`` rows read after *seq*; a ``None`` name means deleted."""
+        for prod_id, name in rows:
+            doc = self.docs.pop(prod_id, None)
+            if doc is not None:
+                self.keys[doc] = None
+                self.dead += 1
+            if name is not None:
+                self._add(prod_id, name)
+        self.seq = seq
+
+    def candidates(self, grams: set[str], threshold: float, limit: int) -> list[str]:
+        """Product ids sharing the most trigrams with the query, best first.
+
+        Only the rarest ``len(grams) - need + 1`` posting lists are scanned: a
+        product reaching the threshold must appear in at least one of them.
         """
+        lists = sorted((self.postings.get(g, array("I")) for g in grams), key=len)
+        need = max(1, math.ceil(threshold * len(grams)))
+        counts: Counter[int] = Counter()
+        for bucket in lists[:len(lists) - need + 1]:
+            counts.update(bucket)
+        keys = self.keys
+        if self.dead:
+            for doc in [doc for doc in counts if keys[doc] is None]:
+                del counts[doc]
+        return [keys[doc] for doc, _ in counts.most_common(limit)]
+
+_fuzzy_indexes: dict[str, _TrigramIndex] = {}
+_fuzzy_lock = threading.Lock()
+
+def catalog_version() -> int:
+    """Changes whenever a product is added, deleted or gets a new id, name or description."""
+    row = get_conn().execute("SELECT MAX(seq) FROM catalog_changes").fetchone()
+    return int(row[0] or 0)
+
+def _fuzzy_candidates(grams: set[str], threshold: float, limit: int) -> list[str]:
+    # The head is read before the rows, so rows committed in between are at
+    # worst applied twice; replaying a product is idempotent.
+    conn = get_conn(); head = catalog_version()
+    with _fuzzy_lock:
+        index = _fuzzy_indexes.get(DB_PATH)
+        if index is not None and index.seq != head:
+            oldest = conn.execute("SELECT MIN(seq) FROM catalog_changes").fetchone()[0]
+            if head < index.seq or index.seq + 1 < (oldest or 0) or index.dead > len(index.docs):
+                index = None  # database replaced, missed pruned changes, or mostly dead
+            else:
+                index.update(head, conn.execute(
+                    """SELECT c.prod_id, p.name FROM (SELECT DISTINCT prod_id FROM catalog_changes WHERE seq > ?) c
+                       LEFT JOIN products p ON p.prod_id = c.prod_id""", (index.seq,)))
+        if index is None:
+            index = _fuzzy_indexes[DB_PATH] = _TrigramIndex(head, conn.execute("SELECT prod_id, name FROM products"))
+        return index.candidates(grams, threshold, limit)
+
+def fuzzy_search_products(term: str, limit: int = 50, threshold: float = 0.4) -> list[Product]:
+    """Typo-tolerant search over product ids and names.
+
+    Products are scored by the share of the query's trigrams they contain
+    (ties broken by overall trigram similarity); those below ``threshold``
+    are dropped.  The trigram index is built on first use and then brought
+    up to date from ``catalog_changes`` before each search.
+    """
+    grams = _trigrams(term)
+    if not grams:
+        return []
+    prod_ids = _fuzzy_candidates(grams, threshold, max(limit * 4, 200))
+    if not prod_ids:
+        return []
+    marks = ",".join("?" * len(prod_ids))
+    scored = []
+    for row in get_conn().execute(_PRODUCT_SELECT + f" WHERE p.prod_id IN ({marks})", prod_ids):
+        doc = _trigrams(f"{row[0]} {row[2]}")
+        common = len(grams & doc)
+        coverage = common / len(grams)
+        if coverage >= threshold:
+            scored.append((-coverage, -common / len(grams | doc), row[0], row))
+    scored.sort(key=lambda item: item[:3])
+    parents = _IdentityMap()
+    return [_product_from_row(item[3], parents) for item in scored[:limit]]
+
+_SOLD_PRODUCTS_SELECT = """
+    SELECT
+        s.sale_id,
+        s.prod_id,
+        s.qty,
+        s.sold_on,
+        s.sold_at,
+        s.location_type,
+        s.local_id,
+        p.name,
+        p.description,
+        p.price,
+        s.client,
+        l.name as local_name,
+        d.dept_id,
+        d.name as dept_name,
+        sd.sub_id,
+        sd.name as sub_name
+    FROM sold_products s
+    JOIN products p ON p.prod_id = s.prod_id
+    JOIN subdepartments sd ON sd.sub_id = p.parent_sub_id
+    JOIN departments d ON d.dept_id = sd.parent_dept_id
+    LEFT JOIN locals l ON l.local_id = s.local_id
+"""
+
+def _sold_products_filters(
+    department_id: int | None,
+    subdepartment_id: int | None,
+    location_type: str | None,
+    local_id: int | None,
+    sold_from: str | None = None,
+    sold_to: str | None = None,
+) -> tuple[list[str], list[object]]:
+    # The unary "+" keeps SQLite from driving the query off these columns, so it
+    # walks the (location, sold_at) indexes in order and a page can stop early.
     clauses: list[str] = []
     params: list[object] = []
 
     if department_id is not None:
-        clauses.append("d.dept_id = ?")
+        clauses.append("+d.dept_id = ?")
         params.append(int(department_id))
 
     if subdepartment_id is not None:
@@ -490,44 +1453,260 @@ def list_sold_products(
         params.append(int(subdepartment_id))
 
     if location_type:
-        clauses.append("s.location_type = ?")
+        local_filter = location_type.lower() == "local" and local_id is not None
+        clauses.append("+s.location_type = ?" if local_filter else "s.location_type = ?")
         params.append(location_type)
-        if location_type.lower() == "local" and local_id is not None:
+        if local_filter:
             clauses.append("s.local_id = ?")
             params.append(int(local_id))
     elif local_id is not None:
         clauses.append("s.local_id = ?")
         params.append(int(local_id))
 
+    # Inclusive "YYYY-MM-DD" bounds on the sale date.
+    if sold_from:
+        clauses.append("s.sold_on >= ?")
+        params.append(str(sold_from))
+    if sold_to:
+        clauses.append("s.sold_on <= ?")
+        params.append(str(sold_to))
+    return clauses, params
+
+def _sale_from_row(row) -> dict:
+    return {
+        "sale_id": row[0],
+        "prod_id": row[1],
+        "qty": int(row[2]),
+        "sold_on": row[3],
+        "sold_at": row[4],
+        "location_type": row[5],
+        "local_id": row[6],
+        "name": row[7],
+        "price": float(row[9]),
+        "description": row[8],
+        "client": row[10],
+        "local_name": row[11],
+        "department_id": row[12],
+        "department_name": row[13],
+        "subdepartment_id": row[14],
+        "subdepartment_name": row[15],
+    }
+
+def list_sold_products(
+    department_id: int | None = None,
+    subdepartment_id: int | None = None,
+    location_type: str | None = None,
+    local_id: int | None = None,
+    sold_from: str | None = None,
+    sold_to: str | None = None,
+) -> list[dict]:
+    """Return sold products sorted from most recent to oldest.
+
+    Optional filters can be applied by department, subdepartment, location and
+    an inclusive ``sold_from``/``sold_to`` range of ``YYYY-MM-DD`` sale dates.
+    """
+
+    query, params = _sold_products_query(department_id, subdepartment_id, location_type, local_id, sold_from, sold_to)
+    rows = get_conn().execute(query, params).fetchall()
+    return [_sale_from_row(row) for row in rows]
+
+def _sold_products_query(department_id, subdepartment_id, location_type, local_id, sold_from=None, sold_to=None) -> tuple[str, list[object]]:
+    clauses, params = _sold_products_filters(department_id, subdepartment_id, location_type, local_id, sold_from, sold_to)
+    query = _SOLD_PRODUCTS_SELECT
     if clauses:
         query += " WHERE " + " AND ".join(clauses)
 
-    query += " ORDER BY datetime(s.sold_at) DESC, s.sale_id DESC"
+    # sold_at is stored as "YYYY-MM-DD HH:MM:SS", so text order is time order and
+    # the ORDER BY can walk idx_sold_products_sold_at instead of sorting.
+    query += " ORDER BY s.sold_at DESC, s.sale_id DESC"
+    return query, params
 
-    rows = conn.execute(query, params).fetchall()
-    conn.close()
+def iter_sold_products(
+    department_id: int | None = None,
+    subdepartment_id: int | None = None,
+    location_type: str | None = None,
+    local_id: int | None = None,
+    sold_from: str | None = None,
+    sold_to: str | None = None,
+    batch_size: int = 1000,
+) -> Iterator[dict]:
+    """Yield the sales of :func:`list_sold_products` one by one.
 
-    return [
-        {
-            "sale_id": row[0],
-            "prod_id": row[1],
-            "qty": int(row[2]),
-            "sold_on": row[3],
-            "sold_at": row[4],
-            "location_type": row[5],
-            "local_id": row[6],
-            "name": row[7],
-            "price": float(row[9]),
-            "description": row[8],
-            "client": row[10],
-            "local_name": row[11],
-            "department_id": row[12],
-            "department_name": row[13],
-            "subdepartment_id": row[14],
-            "subdepartment_name": row[15],
-        }
-        for row in rows
-    ]
+    Rows are pulled from the cursor ``batch_size`` at a time, so memory stays
+    flat however long the history is.  The read keeps one snapshot of the
+    database until the iterator is exhausted or closed.
+    """
+    query, params = _sold_products_query(department_id, subdepartment_id, location_type, local_id, sold_from, sold_to)
+    cursor = get_conn().execute(query, params)
+    try:
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            for row in rows:
+                yield _sale_from_row(row)
+    finally:
+        cursor.close()
+
+# Columns of iter_sales_report rows; prices are in dollars.
+SALES_REPORT_COLUMNS = (
+    "sale_id", "sold_on", "sold_at", "prod_id", "name", "department", "subdepartment",
+    "location_type", "local_name", "client", "qty", "price", "total",
+)
+
+def iter_sales_report(
+    department_id: int | None = None,
+    subdepartment_id: int | None = None,
+    location_type: str | None = None,
+    local_id: int | None = None,
+    sold_from: str | None = None,
+    sold_to: str | None = None,
+    batch_size: int = 10000,
+) -> Iterator[list[tuple]]:
+    """Yield the sales history in batches of plain row tuples, oldest first.
+
+    Rows follow :data:`SALES_REPORT_COLUMNS` and come straight off the cursor,
+    with no per-row dict, for bulk exports of the whole history.  Filters are
+    those of :func:`list_sold_products`; the read walks
+    ``idx_sold_products_sold_on``, so date ranges cost only the rows in range.
+    """
+    clauses, params = _sold_products_filters(department_id, subdepartment_id, location_type, local_id, sold_from, sold_to)
+    query = """SELECT s.sale_id, s.sold_on, s.sold_at, s.prod_id, p.name, d.name, sd.name,
+                      s.location_type, l.name, s.client, s.qty, p.price, ROUND(s.qty * p.price, 2)
+               FROM sold_products s
+               JOIN products p ON p.prod_id = s.prod_id
+               JOIN subdepartments sd ON sd.sub_id = p.parent_sub_id
+               JOIN departments d ON d.dept_id = sd.parent_dept_id
+               LEFT JOIN locals l ON l.local_id = s.local_id"""
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    query += " ORDER BY s.sold_on, s.sold_at, s.sale_id"
+    cursor = get_conn().execute(query, params)
+    try:
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield rows
+    finally:
+        cursor.close()
+
+def count_sold_products(
+    department_id: int | None = None,
+    subdepartment_id: int | None = None,
+    location_type: str | None = None,
+    local_id: int | None = None,
+    sold_from: str | None = None,
+    sold_to: str | None = None,
+) -> int:
+    clauses, params = _sold_products_filters(department_id, subdepartment_id, location_type, local_id, sold_from, sold_to)
+    query = """SELECT COUNT(*) FROM sold_products s
+               JOIN products p ON p.prod_id = s.prod_id
+               JOIN subdepartments sd ON sd.sub_id = p.parent_sub_id
+               JOIN departments d ON d.dept_id = sd.parent_dept_id"""
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    return int(get_conn().execute(query, params).fetchone()[0])
+
+def list_sold_products_page(
+    limit: int = 200,
+    after: tuple[str, str] | None = None,
+    department_id: int | None = None,
+    subdepartment_id: int | None = None,
+    location_type: str | None = None,
+    local_id: int | None = None,
+    sold_from: str | None = None,
+    sold_to: str | None = None,
+) -> tuple[list[dict], tuple[str, str] | None]:
+    """Return one page of sales, newest first, plus the cursor for the next page.
+
+    ``after`` is the ``(sold_at, sale_id)`` of the last sale already shown; the
+    page starts right after it, so the cost does not grow with how far the
+    user has scrolled.  The returned cursor is ``None`` on the last page.
+    """
+
+    clauses, params = _sold_products_filters(department_id, subdepartment_id, location_type, local_id, sold_from, sold_to)
+    if after is not None:
+        clauses.append("(s.sold_at, s.sale_id) < (?, ?)")
+        params.extend([after[0], after[1]])
+    query = _SOLD_PRODUCTS_SELECT
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    query += " ORDER BY s.sold_at DESC, s.sale_id DESC LIMIT ?"
+    params.append(int(limit))
+
+    sales = [_sale_from_row(row) for row in get_conn().execute(query, params)]
+    cursor = (sales[-1]["sold_at"], sales[-1]["sale_id"]) if len(sales) == limit else None
+    return sales, cursor
+
+def _sell_line(conn: sqlite3.Connection, prod_id: str, qty: int, local: Local | None) -> str | None:
+    """Take *qty* of one product off the shelves; return why not, or None on success.
+
+    Each decrement is a guarded ``UPDATE ... WHERE quantity >= ?`` so stock
+    can never go negative, whatever other terminals did in the meantime.
+    """
+    conn.execute("SAVEPOINT sale_line")
+    try:
+        if local is not None:
+            cur = conn.execute(
+                "UPDATE local_products SET quantity = quantity - ? WHERE local_id=? AND prod_id=? AND quantity >= ?",
+                (qty, local.local_id, prod_id, qty),
+            )
+            if cur.rowcount != 1:
+                row = conn.execute("SELECT quantity FROM local_products WHERE local_id=? AND prod_id=?", (local.local_id, prod_id)).fetchone()
+                if row is None and conn.execute("SELECT 1 FROM products WHERE prod_id=?", (prod_id,)).fetchone() is None:
+                    return "product not found"
+                return f"only {row[0] if row else 0} allocated to {local.name}"
+            conn.execute("DELETE FROM local_products WHERE local_id=? AND prod_id=? AND quantity <= 0", (local.local_id, prod_id))
+        cur = conn.execute("UPDATE products SET quantity = quantity - ? WHERE prod_id = ? AND quantity >= ?", (qty, prod_id, qty))
+        if cur.rowcount != 1:
+            conn.execute("ROLLBACK TO sale_line")
+            row = conn.execute("SELECT quantity FROM products WHERE prod_id=?", (prod_id,)).fetchone()
+            return f"only {row[0]} in stock" if row else "product not found"
+        return None
+    finally:
+        conn.execute("RELEASE sale_line")
+
+def register_sale_ticket(
+    lines,
+    location_type: str,
+    local: Local | None,
+    client: Optional[str] = None,
+    sold_on: Optional[str] = None,
+) -> list[tuple[int, str]]:
+    """Register a ticket of ``(product, qty)`` lines in one transaction.
+
+    Lines that cannot be sold (unknown product, bad quantity, not enough
+    stock, or not allocated in *local*) are skipped and returned as
+    ``(line index, reason)``; every other line is committed together.  The
+    transaction takes the write lock up front (BEGIN IMMEDIATE) and is retried
+    if another terminal holds it for longer than the busy timeout.
+    """
+    lines = [(p.prod_id if hasattr(p, "prod_id") else str(p), q) for p, q in lines]
+    stock_local = local if location_type == "local" and local is not None else None
+    sale_date = sold_on or date.today().isoformat()
+    local_id = local.local_id if local else None
+
+    def work(conn: sqlite3.Connection) -> list[tuple[int, str]]:
+        failures: list[tuple[int, str]] = []
+        sold: list[tuple] = []
+        for idx, (prod_id, qty) in enumerate(lines):
+            try: qty = int(qty)
+            except (TypeError, ValueError): qty = 0
+            if qty <= 0:
+                failures.append((idx, "quantity must be at least 1")); continue
+            reason = _sell_line(conn, prod_id, qty, stock_local)
+            if reason is not None:
+                failures.append((idx, reason)); continue
+            sold.append((uuid.uuid4().hex, prod_id, qty, location_type, local_id, client, sale_date))
+        conn.executemany(
+            """INSERT INTO sold_products(sale_id, prod_id, qty, location_type, local_id, client, sold_on)
+                      VALUES(?,?,?,?,?,?,?)""",
+            sold,
+        )
+        return failures
+
+    return _write_with_retry(work)
 
 def register_sale(
     prod: Product,
@@ -537,29 +1716,29 @@ def register_sale(
     client: Optional[str] = None,
     sold_on: Optional[str] = None,
 ) -> bool:
-    total = get_product_total_quantity(prod)
-    if qty <= 0 or qty > total: return False
-    conn = get_conn(); cur = conn.cursor()
-    cur.execute("UPDATE products SET quantity = quantity - ? WHERE prod_id = ?", (qty, prod.prod_id))
-    if location_type == "local" and local is not None:
-        row = cur.execute("SELECT quantity FROM local_products WHERE local_id=? AND prod_id=?", (local.local_id, prod.prod_id)).fetchone()
-        allocated = int(row[0]) if row else 0
-        if allocated < qty:
-            conn.rollback(); conn.close(); return False
-        cur.execute("UPDATE local_products SET quantity = quantity - ? WHERE local_id=? AND prod_id=?", (qty, local.local_id, prod.prod_id))
-        cur.execute("DELETE FROM local_products WHERE local_id=? AND prod_id=? AND quantity <= 0", (local.local_id, prod.prod_id))
-    sale_date = sold_on or date.today().isoformat()
-    cur.execute(
-        """INSERT INTO sold_products(sale_id, prod_id, qty, location_type, local_id, client, sold_on)
-                  VALUES(?,?,?,?,?,?,?)""",
-        (
-            uuid.uuid4().hex,
-            prod.prod_id,
-            qty,
-            location_type,
-            local.local_id if local else None,
-            client,
-            sale_date,
-        ),
-    )
-    conn.commit(); conn.close(); return True
+    return not register_sale_ticket([(prod, qty)], location_type, local, client, sold_on)
+
+# Public entry points, split by whether they write.  async_storage and the
+# JSON service (server.py) expose exactly these.
+READ_API = (
+    "schema_version", "get_conversion_rate", "get_local_retail_rate",
+    "list_departments", "list_departments_summary", "get_department_by_id",
+    "list_subdepartments", "list_subdepartments_summary", "get_subdepartment_by_id",
+    "catalog_stock_totals", "list_products", "list_products_page", "count_products",
+    "list_locals", "list_locals_summary", "count_local_products", "generate_next_product_id",
+    "get_product_total_quantity", "get_allocated_qty_for_product",
+    "list_products_for_local", "get_product_by_id", "get_products_by_ids",
+    "search_products", "fuzzy_search_products", "has_search_index", "catalog_version", "list_sold_products",
+    "list_sold_products_page", "count_sold_products",
+)
+WRITE_API = (
+    "init_db", "set_conversion_rate", "set_local_retail_rate",
+    "add_department", "rename_department", "delete_department_if_empty", "delete_department",
+    "add_subdepartment", "rename_subdepartment", "delete_subdepartment_if_empty", "delete_subdepartment",
+    "add_product", "update_product", "delete_product", "create_product", "add_products", "reserve_product_ids",
+    "add_product_to_local", "remove_product_from_local",
+    "add_local", "delete_local", "rebuild_search_index", "vacuum", "register_sale_ticket", "register_sale",
+)
+# Product image functions: they pair database rows with files in the local
+# media folder, so they are neither served nor routed to a server.
+IMAGE_API = ("add_product_images", "list_product_images", "set_thumbnail_sizes", "delete_product_image")
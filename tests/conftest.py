@@ -0,0 +1,27 @@
+"""Shared fixtures: the app imported as a package, storage on a scratch database."""
+import importlib
+import os
+import sys
+
+import pytest
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = os.path.basename(PACKAGE_ROOT)
+# Import the app the way server.py does when started as a script, so the
+# relative imports inside storage resolve.
+sys.path.insert(0, os.path.dirname(PACKAGE_ROOT))
+
+
+def load_storage():
+    return importlib.import_module(f"{PACKAGE}.storage")
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    """``storage`` pointed at a fresh, migrated database under *tmp_path*."""
+    module = load_storage()
+    monkeypatch.setattr(module, "DB_PATH", str(tmp_path / "inventory.sqlite3"))
+    monkeypatch.setattr(module, "_MEDIA_ROOT", tmp_path / "media")
+    module.init_db()
+    yield module
+    module.close_connections()
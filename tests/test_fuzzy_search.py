@@ -0,0 +1,44 @@
+"""Typo-tolerant search keeps its in-memory index in step with the catalog."""
+
+
+def _names(products):
+    return [p.name for p in products]
+
+
+def test_index_follows_inserts_renames_and_deletes(storage):
+    dept = storage.add_department("CO", "Cocina")
+    sub = storage.add_subdepartment(dept, "VE", "Velas")
+    storage.add_products([(sub, None, f"vela aromatica {i}", "", 1.0, 1) for i in range(50)])
+    assert storage.fuzzy_search_products("zanaoria") == []  # builds the index
+    carrot = storage.create_product(sub, "zanahoria", "", 1.0, 1)
+    assert _names(storage.fuzzy_search_products("zanaoria")) == ["zanahoria"]
+    carrot.name = "berenjena"
+    storage.update_product(carrot)
+    assert storage.fuzzy_search_products("zanaoria") == []
+    assert _names(storage.fuzzy_search_products("berenjna")) == ["berenjena"]
+    storage.delete_product(carrot)
+    assert storage.fuzzy_search_products("berenjna") == []
+    assert storage._fuzzy_indexes[storage.DB_PATH].dead == 2
+
+
+def test_vacuum_keeps_fuzzy_hits(storage):
+    dept = storage.add_department("CO", "Cocina")
+    sub = storage.add_subdepartment(dept, "VE", "Velas")
+    products = [storage.create_product(sub, f"lampara {i}", "", 1.0, 1) for i in range(30)]
+    for product in products[::2]:
+        storage.delete_product(product)
+    before = _names(storage.fuzzy_search_products("lampra 7"))
+    storage.vacuum()
+    assert _names(storage.fuzzy_search_products("lampra 7")) == before
+    assert "lampara 7" in before
+
+
+def test_index_catches_up_after_changes_were_pruned(storage):
+    dept = storage.add_department("CO", "Cocina")
+    sub = storage.add_subdepartment(dept, "VE", "Velas")
+    storage.create_product(sub, "mantel", "", 1.0, 1)
+    storage.fuzzy_search_products("mantl")
+    carrot = storage.create_product(sub, "zanahoria", "", 1.0, 1)
+    storage.get_conn().execute("DELETE FROM catalog_changes")  # as if pruned past the index
+    storage.create_product(sub, "pepino", "", 1.0, 1)
+    assert _names(storage.fuzzy_search_products("zanaoria")) == [carrot.name]
@@ -0,0 +1,32 @@
+"""Spreadsheet import: bad numbers are rejected row by row, never stored."""
+import importlib
+import math
+
+from conftest import PACKAGE
+
+
+def test_non_finite_numbers_are_rejected(storage, tmp_path):
+    importer = importlib.import_module(f"{PACKAGE}.importer")
+    dept = storage.add_department("CO", "Cocina")
+    storage.add_subdepartment(dept, "VE", "Velas")
+    path = tmp_path / "products.csv"
+    path.write_text(
+        "Dept,Sub,Name,Price,Qty\n"
+        "CO,VE,Vela lavanda,4.5,10\n"
+        "CO,VE,Vela infinita,inf,10\n"
+        "CO,VE,Vela nan,NaN,10\n"
+        "CO,VE,Vela enorme,1e400,10\n"
+        "CO,VE,Vela sin fin,3,-inf\n"
+        "CO,VE,Vela canela,\"3,25\",2\n",
+        encoding="utf-8",
+    )
+
+    result = importer.import_products(path)
+
+    assert result.read == 6 and result.imported == 2
+    assert [(r.line, r.reason.split(" is ")[0]) for r in result.rejected] == [
+        (3, "price"), (4, "price"), (5, "price"), (6, "quantity"),
+    ]
+    assert all("finite" in r.reason for r in result.rejected)
+    prices = [row[0] for row in storage.get_conn().execute("SELECT price FROM products ORDER BY name")]
+    assert prices == [3.25, 4.5] and all(math.isfinite(p) for p in prices)
@@ -0,0 +1,36 @@
+"""Product id allocation from the per-prefix sequences."""
+import re
+
+_PRODUCTS_TABLE = re.compile(r"\bproducts\b", re.IGNORECASE)
+
+
+def _statements(storage, call) -> list[str]:
+    conn = storage.get_conn()
+    statements: list[str] = []
+    conn.set_trace_callback(statements.append)
+    try:
+        call()
+    finally:
+        conn.set_trace_callback(None)
+    return statements
+
+
+def test_first_allocation_continues_after_existing_ids(storage):
+    dept = storage.add_department("CO", "Cocina")
+    sub = storage.add_subdepartment(dept, "VE", "Velas")
+    storage.get_conn().execute("DELETE FROM product_id_sequences")
+    storage.add_products([(sub, "COVE7", "Vela", "Roja", 2.0, 1)])
+    storage.get_conn().execute("DELETE FROM product_id_sequences")  # as if never allocated
+    assert storage.reserve_product_ids(sub, 2) == ["COVE8", "COVE9"]
+    assert storage.create_product(sub, "Vela", "Azul", 2.0, 1).prod_id == "COVE10"
+    assert storage.generate_next_product_id(sub) == "COVE11"
+
+
+def test_sequence_path_never_reads_products(storage):
+    dept = storage.add_department("CO", "Cocina")
+    sub = storage.add_subdepartment(dept, "VE", "Velas")
+    storage.add_products([(sub, None, f"Vela {i}", "", 1.0, 1) for i in range(500)])
+    for call in (lambda: storage.reserve_product_ids(sub, 3), lambda: storage.generate_next_product_id(sub)):
+        touched = [sql for sql in _statements(storage, call) if _PRODUCTS_TABLE.search(sql)]
+        assert touched == []
+    assert storage.generate_next_product_id(sub) == "COVE504"
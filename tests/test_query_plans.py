@@ -0,0 +1,112 @@
+"""EXPLAIN QUERY PLAN regression checks for the hot storage queries.
+
+Each hot function is run against a synthetic database of realistic size with
+SQLite's trace callback on; every statement it issued is then explained, and
+the test fails if any of them reads a whole table instead of an index.
+"""
+import datetime
+import re
+
+import pytest
+
+from conftest import load_storage
+
+DEPARTMENTS, SUBS_PER_DEPARTMENT, PRODUCTS_PER_SUB = 4, 5, 1000
+SALES = 50_000
+WORDS = "vela jarra taza plato vaso copa mantel cojin lampara espejo".split()
+
+# "SCAN <table>" with nothing after it is a full table scan; "SCAN t USING
+# INDEX" walks an index in order and the FTS5 "VIRTUAL TABLE INDEX" is a match.
+_FULL_SCAN = re.compile(r"SCAN (\w+)")
+_SCHEMA_TABLES = {"sqlite_master", "sqlite_schema"}
+
+
+@pytest.fixture(scope="module")
+def big_db(tmp_path_factory):
+    storage = load_storage()
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(storage, "DB_PATH", str(tmp_path_factory.mktemp("plans") / "inventory.sqlite3"))
+        storage.init_db()
+        subs = []
+        for d in range(DEPARTMENTS):
+            dept = storage.add_department(f"D{d}", f"Department {d}")
+            subs += [storage.add_subdepartment(dept, f"S{k}", f"Sub {k}") for k in range(SUBS_PER_DEPARTMENT)]
+        for sub in subs:
+            storage.add_products([
+                (sub, None, f"{WORDS[j % 10]} {WORDS[j // 10 % 10]} {j}", "synthetic", 1.0 + j % 7, 1000)
+                for j in range(PRODUCTS_PER_SUB)
+            ])
+        local = storage.add_local("Centro")
+        for product in storage.list_products_page(subs[0], 300)[0]:
+            storage.add_product_to_local(local, product, 10)
+        conn = storage.get_conn()
+        prod_ids = [row[0] for row in conn.execute("SELECT prod_id FROM products")]
+        local_ids = [row[0] for row in conn.execute("SELECT prod_id FROM local_products")]
+        start = datetime.datetime(2025, 1, 1)
+        rows = []
+        for i in range(SALES):
+            at = start + datetime.timedelta(minutes=10 * i)
+            in_local = i % 2 == 1
+            rows.append((
+                f"{i:032x}", local_ids[i % len(local_ids)] if in_local else prod_ids[i % len(prod_ids)], 1,
+                "local" if in_local else "online", local.local_id if in_local else None,
+                at.strftime("%Y-%m-%d %H:%M:%S"), at.date().isoformat(),
+            ))
+        with storage.transaction() as conn:
+            conn.executemany(
+                "INSERT INTO sold_products(sale_id, prod_id, qty, location_type, local_id, sold_at, sold_on) VALUES(?,?,?,?,?,?,?)",
+                rows,
+            )
+        yield storage, subs, local, prod_ids
+        storage.close_connections()
+
+
+def _full_scans(storage, call) -> list[str]:
+    conn = storage.get_conn()
+    statements: list[str] = []
+    conn.set_trace_callback(statements.append)
+    try:
+        call()
+    finally:
+        conn.set_trace_callback(None)
+    scans = []
+    for sql in statements:
+        if not sql.lstrip().upper().startswith(("SELECT", "WITH", "UPDATE", "DELETE")):
+            continue
+        for row in conn.execute("EXPLAIN QUERY PLAN " + sql):
+            match = _FULL_SCAN.fullmatch(row[3])
+            if match and match.group(1) not in _SCHEMA_TABLES:
+                scans.append(f"{row[3]} in: {' '.join(sql.split())[:160]}")
+    return scans
+
+
+HOT_QUERIES = {
+    "search": lambda storage, subs, local, ids: storage.search_products("vela ja", limit=500),
+    "search_exact_id": lambda storage, subs, local, ids: storage.search_products(ids[1234], limit=500),
+    "product_by_code": lambda storage, subs, local, ids: storage.get_product_by_id(ids[4321].lower()),
+    "products_by_codes": lambda storage, subs, local, ids: storage.get_products_by_ids(ids[:50]),
+    "products_page": lambda storage, subs, local, ids: storage.list_products_page(subs[7], 200),
+    "sales_page": lambda storage, subs, local, ids: storage.list_sold_products_page(200),
+    "sales_next_page": lambda storage, subs, local, ids: storage.list_sold_products_page(
+        200, storage.list_sold_products_page(200)[1]),
+    "sales_page_local": lambda storage, subs, local, ids: storage.list_sold_products_page(
+        200, location_type="local", local_id=local.local_id),
+    "sales_page_dates": lambda storage, subs, local, ids: storage.list_sold_products_page(
+        200, sold_from="2025-03-01", sold_to="2025-03-31"),
+    "local_stock": lambda storage, subs, local, ids: storage.list_products_for_local(local),
+    "allocated_qty": lambda storage, subs, local, ids: storage.get_allocated_qty_for_product(ids[5]),
+    "next_product_id": lambda storage, subs, local, ids: storage.generate_next_product_id(subs[3]),
+    "reserve_product_ids": lambda storage, subs, local, ids: storage.reserve_product_ids(subs[3], 5),
+}
+
+
+@pytest.mark.parametrize("name", sorted(HOT_QUERIES))
+def test_hot_query_uses_indexes(big_db, name):
+    storage, subs, local, prod_ids = big_db
+    assert _full_scans(storage, lambda: HOT_QUERIES[name](storage, subs, local, prod_ids)) == []
+
+
+def test_detects_full_scan(big_db):
+    storage = big_db[0]
+    scans = _full_scans(storage, lambda: storage.get_conn().execute("SELECT * FROM products WHERE price > 3").fetchall())
+    assert scans and scans[0].startswith("SCAN products")
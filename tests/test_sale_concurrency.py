@@ -0,0 +1,72 @@
+"""Several processes selling the same product at once must never oversell it."""
+import importlib
+import multiprocessing
+import time
+
+from conftest import PACKAGE
+
+PROCESSES = 6
+TICKETS_PER_PROCESS = 40
+STOCK = 150
+ALLOCATED = 60
+
+
+def _sell(db_path: str, prod_id: str, local_id: int, start) -> None:
+    # Runs in a spawned process (which inherits sys.path), with its own SQLite connection.
+    storage = importlib.import_module(f"{PACKAGE}.storage")
+    storage.DB_PATH = db_path
+    local = next(l for l in storage.list_locals() if l.local_id == local_id)
+    start.wait()
+    for i in range(TICKETS_PER_PROCESS):
+        # Two one-unit lines per ticket, alternating the local and online.
+        if i % 2:
+            storage.register_sale_ticket([(prod_id, 1), (prod_id, 1)], "local", local)
+        else:
+            storage.register_sale_ticket([(prod_id, 1), (prod_id, 1)], "online", None)
+
+
+def _stock(storage, prod_id: str, local_id: int) -> tuple[int, int]:
+    conn = storage.get_conn()
+    total = conn.execute("SELECT quantity FROM products WHERE prod_id=?", (prod_id,)).fetchone()[0]
+    row = conn.execute("SELECT quantity FROM local_products WHERE local_id=? AND prod_id=?", (local_id, prod_id)).fetchone()
+    return total, row[0] if row else 0
+
+
+def test_concurrent_sales_never_oversell(storage):
+    dept = storage.add_department("CO", "Cocina")
+    sub = storage.add_subdepartment(dept, "VE", "Velas")
+    product = storage.create_product(sub, "Vela lavanda", "Aromatica", 4.5, STOCK)
+    local = storage.add_local("Centro")
+    storage.add_product_to_local(local, product, ALLOCATED)
+    assert PROCESSES * TICKETS_PER_PROCESS * 2 > STOCK  # demand must exceed supply
+
+    context = multiprocessing.get_context("spawn")
+    start = context.Event()
+    workers = [
+        context.Process(target=_sell, args=(storage.DB_PATH, product.prod_id, local.local_id, start))
+        for _ in range(PROCESSES)
+    ]
+    for worker in workers:
+        worker.start()
+    start.set()
+    lowest = (STOCK, ALLOCATED)
+    deadline = time.monotonic() + 120
+    while any(w.is_alive() for w in workers) and time.monotonic() < deadline:
+        total, allocated = _stock(storage, product.prod_id, local.local_id)
+        lowest = (min(lowest[0], total), min(lowest[1], allocated))
+        time.sleep(0.01)
+    for worker in workers:
+        worker.join(timeout=5)
+        assert worker.exitcode == 0
+
+    total, allocated = _stock(storage, product.prod_id, local.local_id)
+    assert min(lowest[0], total) >= 0 and min(lowest[1], allocated) >= 0
+    conn = storage.get_conn()
+    sold = conn.execute("SELECT COALESCE(SUM(qty), 0) FROM sold_products WHERE prod_id=?", (product.prod_id,)).fetchone()[0]
+    sold_in_local = conn.execute(
+        "SELECT COALESCE(SUM(qty), 0) FROM sold_products WHERE prod_id=? AND local_id=?", (product.prod_id, local.local_id),
+    ).fetchone()[0]
+    assert total == 0
+    assert sold == STOCK
+    assert allocated == ALLOCATED - sold_in_local
+    assert storage.check_aggregates() == []
@@ -0,0 +1,121 @@
+"""The HTTP service under concurrent terminals, and its token and size limits."""
+import http.client
+import importlib
+import json
+import threading
+import time
+
+import pytest
+
+from conftest import PACKAGE
+
+CLIENTS = 8
+TICKETS_PER_CLIENT = 25
+STOCK = 300
+TOKEN = "s3cret"
+
+
+@pytest.fixture
+def service(storage):
+    server_module = importlib.import_module(f"{PACKAGE}.server")
+    remote = importlib.import_module(f"{PACKAGE}.remote_storage")
+    server = server_module.make_server("127.0.0.1", 0, readers=4, token=TOKEN)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield server_module, remote, url
+    server.shutdown()
+    server.server_close()
+    thread.join(timeout=5)
+
+
+def _status(url: str, method: str, path: str, body: bytes | None = None, headers: dict | None = None) -> int:
+    host, port = url[len("http://"):].split(":")
+    conn = http.client.HTTPConnection(host, int(port), timeout=10)
+    try:
+        conn.request(method, path, body, headers or {})
+        return conn.getresponse().status
+    finally:
+        conn.close()
+
+
+def test_concurrent_terminals_lose_and_duplicate_no_sales(storage, service):
+    _, remote, url = service
+    dept = storage.add_department("CO", "Cocina")
+    sub = storage.add_subdepartment(dept, "VE", "Velas")
+    product = storage.create_product(sub, "Vela lavanda", "Aromatica", 4.5, STOCK)
+    other = storage.create_product(sub, "Vela canela", "Aromatica", 3.0, STOCK)
+    local = storage.add_local("Centro")
+    assert CLIENTS * TICKETS_PER_CLIENT * 2 > STOCK  # demand must exceed supply
+
+    start = threading.Barrier(CLIENTS + 1)
+    accepted: list[int] = []  # lines sold by each terminal
+    calls: list[int] = []
+    errors: list[BaseException] = []
+    lock = threading.Lock()
+
+    def terminal() -> None:
+        client = remote.RemoteStorage(url, token=TOKEN)
+        mine = count = 0
+        try:
+            start.wait()
+            for _ in range(TICKETS_PER_CLIENT):
+                assert [l.local_id for l in client.call("list_locals")] == [local.local_id]
+                assert client.call("get_product_by_id", other.prod_id).name == "Vela canela"
+                failures = client.call("register_sale_ticket", [(product.prod_id, 1), (product.prod_id, 1)], "online", None)
+                mine += 2 - len(failures)
+                count += 3
+        except BaseException as exc:  # reported by the main thread
+            with lock:
+                errors.append(exc)
+        finally:
+            client.close()
+            with lock:
+                accepted.append(mine)
+                calls.append(count)
+
+    workers = [threading.Thread(target=terminal) for _ in range(CLIENTS)]
+    for worker in workers:
+        worker.start()
+    start.wait()
+    began = time.perf_counter()
+    for worker in workers:
+        worker.join(timeout=120)
+    elapsed = time.perf_counter() - began
+
+    assert errors == []
+    print(f"\n{sum(calls)} calls from {CLIENTS} terminals in {elapsed:.2f}s: {sum(calls) / elapsed:.0f} calls/s")
+
+    conn = storage.get_conn()
+    rows, units, sale_ids = conn.execute(
+        "SELECT COUNT(*), COALESCE(SUM(qty), 0), COUNT(DISTINCT sale_id) FROM sold_products WHERE prod_id=?",
+        (product.prod_id,),
+    ).fetchone()
+    quantity = conn.execute("SELECT quantity FROM products WHERE prod_id=?", (product.prod_id,)).fetchone()[0]
+    assert sum(accepted) == STOCK  # every unit sold once, then every line refused
+    assert rows == units == sale_ids == STOCK  # one row per accepted line, none repeated
+    assert quantity == 0
+    assert storage.check_aggregates() == []
+
+
+def test_missing_or_wrong_token_is_refused(storage, service):
+    _, remote, url = service
+    assert remote.RemoteStorage(url, token=TOKEN).health()["ok"] is True
+    with pytest.raises(PermissionError):
+        remote.RemoteStorage(url).health()
+    with pytest.raises(PermissionError):
+        remote.RemoteStorage(url, token="wrong").call("list_locals")
+    assert _status(url, "GET", "/health") == 401
+    assert _status(url, "POST", "/api/list_locals", b"{}", {"X-Inventory-Token": "wrong"}) == 401
+
+
+def test_oversized_body_is_refused(storage, service, monkeypatch):
+    server_module, remote, url = service
+    monkeypatch.setattr(server_module, "MAX_BODY", 1024)
+    body = json.dumps({"args": ["x" * 4096]}).encode("utf-8")
+    headers = {"X-Inventory-Token": TOKEN, "Content-Type": "application/json"}
+    assert _status(url, "POST", "/api/search_products", body, headers) == 413
+    with pytest.raises(ValueError, match="too large"):
+        remote.RemoteStorage(url, token=TOKEN).call("search_products", "x" * 4096)
+    # A body under the limit still goes through.
+    assert remote.RemoteStorage(url, token=TOKEN).call("search_products", "vela") == []
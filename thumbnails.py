@@ -0,0 +1,72 @@
+"""On-disk thumbnails of product images.
+
+Decoding and scaling a full-size phone photo takes long enough to make the
+product dialog lag, so each image is scaled once, when it is added, to every
+size in :data:`SIZES` and cached as PNG under the product's media folder
+(``<prod_id>/thumbs/<image_id>_<size>.png``).  The sizes cached are recorded
+in ``product_images.thumb_sizes``.  Images added before the cache existed get
+their thumbnails the first time they are shown.
+"""
+from __future__ import annotations
+
+import os
+from typing import Iterable
+
+from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QImageReader, QPixmap
+
+try:  # Allow use from both source and frozen builds
+    from . import storage
+except ImportError:  # pragma: no cover - fallback when package name changes
+    import storage  # type: ignore[import-not-found]
+
+GALLERY_SIZE = 240
+SIZES = (96, GALLERY_SIZE)
+
+
+def make_thumbnails(source, prod_id: str, image_id: str, sizes: Iterable[int] = SIZES) -> list[int]:
+    """Cache thumbnails of the image at *source*; returns the sizes written.
+
+    The image is decoded once, straight at the largest size when the format
+    allows it (JPEG does), and each smaller size is scaled from the previous.
+    """
+    sizes = sorted({int(s) for s in sizes}, reverse=True)
+    reader = QImageReader(str(source))
+    reader.setAutoTransform(True)  # honour EXIF rotation of phone photos
+    full = reader.size()
+    if full.isValid() and sizes and max(full.width(), full.height()) > sizes[0]:
+        reader.setScaledSize(full.scaled(sizes[0], sizes[0], Qt.AspectRatioMode.KeepAspectRatio))
+    image = reader.read()
+    if image.isNull():
+        return []
+    made = []
+    for size in sizes:
+        if image.width() > size or image.height() > size:
+            image = image.scaled(size, size, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
+        target = storage.thumbnail_path(prod_id, image_id, size)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_name(f".{target.name}.tmp")
+        if image.save(str(tmp), "PNG"):
+            os.replace(tmp, target)
+            made.append(size)
+    return sorted(made)
+
+
+def load_thumbnail(prod_id: str, record: dict, size: int = GALLERY_SIZE) -> QPixmap:
+    """The cached thumbnail of a ``storage.list_product_images`` record.
+
+    A missing one is made (and recorded) on the spot.  Returns a null pixmap
+    when the image itself cannot be read.
+    """
+    if size in record.get("thumb_sizes", ()):
+        pixmap = QPixmap(str(storage.thumbnail_path(prod_id, record["image_id"], size)))
+        if not pixmap.isNull():
+            return pixmap
+    source = storage.get_image_abspath(record["rel_path"])
+    made = make_thumbnails(source, prod_id, record["image_id"], {*SIZES, size})
+    if not made:
+        return QPixmap()
+    sizes = {*record.get("thumb_sizes", ()), *made}
+    storage.set_thumbnail_sizes(record["image_id"], sizes)
+    record["thumb_sizes"] = tuple(sorted(sizes))
+    return QPixmap(str(storage.thumbnail_path(prod_id, record["image_id"], size)))
@@ -1,11 +1,11 @@
 from __future__ import annotations
 
-from typing import Callable, ClassVar, Dict, List
-from html import escape
+import threading
+from typing import Any, Callable, ClassVar, Dict, Iterator, List
 from pathlib import Path
 
-from PyQt6.QtCore import QMarginsF,Qt
-from PyQt6.QtGui import QTextDocument, QPageLayout, QIcon
+from PyQt6.QtCore import QModelIndex, QObject, Qt, pyqtSignal
+from PyQt6.QtGui import QIcon
 from PyQt6.QtWidgets import (
     QButtonGroup,
     QGridLayout,
@@ -14,17 +14,19 @@ from PyQt6.QtWidgets import (
     QHBoxLayout,
     QMainWindow,
     QMessageBox,
+    QProgressDialog,
     QPushButton,
-    QTableWidget,
-    QTableWidgetItem,
+    QTableView,
     QVBoxLayout,
     QWidget,
 )
-from PyQt6.QtPrintSupport import QPrinter
+
+from .tasks import storage_executor
 
 try:  # PyInstaller may load modules as top-level packages
-    from .. import storage
+    from .. import exporter, storage
 except ImportError:  # pragma: no cover - runtime fallback for frozen build
+    import exporter  # type: ignore[import-not-found]
     import storage  # type: ignore[import-not-found]
 
 
@@ -98,6 +100,12 @@ class BaseWindow(QMainWindow):
         top_layout.addWidget(self._brand_label)
         top_layout.addStretch(1)
 
+        self._busy_jobs = 0
+        self._busy_label = QLabel("Loading…")
+        self._busy_label.setStyleSheet("background: transparent; color: white;")
+        self._busy_label.setVisible(False)
+        top_layout.addWidget(self._busy_label)
+
         grid.addWidget(topbar, 0, 0, 1, 2)
 
         # ---- Sidebar -----------------------------------------------------
@@ -240,40 +248,80 @@ class BaseWindow(QMainWindow):
     def set_page_title(self, text: str) -> None:
         self._page_title.setText(text)
 
+    def run_storage(
+        self,
+        call: Callable[[], Any],
+        on_done: Callable[[Any], None] | None = None,
+        *,
+        write: bool = False,
+        key: Any = None,
+        on_error: Callable[[BaseException], None] | None = None,
+    ):
+        """Run a storage call in the background while showing the loading state.
+
+        A newer call made by this window with the same *key* replaces an older
+        one whose result has not been shown yet.  Errors are reported in a
+        message box unless *on_error* handles them.
+        """
+        if on_error is None:
+            on_error = lambda exc: QMessageBox.warning(self, "Error", str(exc))
+        self._set_busy(+1)
+        return storage_executor().submit(
+            call, on_done, on_error,
+            write=write,
+            key=None if key is None else (id(self), key),
+            on_settled=lambda: self._set_busy(-1),
+        )
+
+    def discard_storage(self, key: Any) -> None:
+        """Forget a pending :meth:`run_storage` call; its result is never shown."""
+        storage_executor().discard((id(self), key))
+
+    def _set_busy(self, delta: int) -> None:
+        was_busy = self._busy_jobs > 0
+        self._busy_jobs = max(0, self._busy_jobs + delta)
+        if (self._busy_jobs > 0) != was_busy:
+            self._busy_label.setVisible(self._busy_jobs > 0)
+            if self._busy_jobs:
+                self.setCursor(Qt.CursorShape.BusyCursor)
+            else:
+                self.unsetCursor()
+
 
-def _table_headers(table: QTableWidget) -> List[str]:
+def _table_headers(table: QTableView) -> List[str]:
+    model = table.model()
     headers: List[str] = []
-    for col in range(table.columnCount()):
-        header_item = table.horizontalHeaderItem(col)
-        headers.append(header_item.text() if header_item else f"Column {col + 1}")
+    for col in range(model.columnCount()):
+        text = model.headerData(col, Qt.Orientation.Horizontal, Qt.ItemDataRole.DisplayRole)
+        headers.append(str(text) if text is not None else f"Column {col + 1}")
     return headers
 
 
-def _table_rows(table: QTableWidget) -> List[List[str]]:
-    rows: List[List[str]] = []
-    for row in range(table.rowCount()):
+def _iter_table_rows(table: QTableView) -> Iterator[List[str]]:
+    model = table.model()
+    while model.canFetchMore(QModelIndex()):  # exports cover rows not scrolled into view yet
+        model.fetchMore(QModelIndex())
+    columns = model.columnCount()
+    for row in range(model.rowCount()):
         row_data: List[str] = []
-        for col in range(table.columnCount()):
-            item: QTableWidgetItem | None = table.item(row, col)
-            row_data.append(item.text() if item else "")
-        rows.append(row_data)
-    return rows
+        for col in range(columns):
+            value = model.index(row, col).data(Qt.ItemDataRole.DisplayRole)
+            row_data.append(str(value) if value is not None else "")
+        yield row_data
 
 
-def export_table_to_xlsx(table: QTableWidget, parent: QWidget | None = None) -> None:
-    """Export a QTableWidget to an Excel workbook (.xlsx)."""
+def _table_rows(table: QTableView) -> List[List[str]]:
+    return list(_iter_table_rows(table))
 
+
+def _ask_xlsx_path(parent: QWidget | None) -> str | None:
     path, _ = QFileDialog.getSaveFileName(parent, "Export to Excel", "", "Excel Workbook (*.xlsx)")
     if not path:
-        return
+        return None
     if not path.lower().endswith(".xlsx"):
         path += ".xlsx"
-
-    headers = _table_headers(table)
-    rows = _table_rows(table)
-
     try:
-        from openpyxl import Workbook
+        import openpyxl  # noqa: F401
     except ImportError:
         QMessageBox.warning(
             parent,
@@ -281,19 +329,18 @@ def export_table_to_xlsx(table: QTableWidget, parent: QWidget | None = None) ->
             "The 'openpyxl' package is required to export to Excel. "
             "Install it with:\n\npip install openpyxl",
         )
-        return
+        return None
+    return path
+
 
+def export_table_to_xlsx(table: QTableView, parent: QWidget | None = None) -> None:
+    """Export a table view (or QTableWidget) to an Excel workbook (.xlsx)."""
+
+    path = _ask_xlsx_path(parent)
+    if not path:
+        return
     try:
-        workbook = Workbook()
-        sheet = workbook.active
-        sheet.append(headers)
-        for row in rows:
-            sheet.append(row)
-        for column_cells in sheet.columns:
-            max_length = max(len(str(cell.value or "")) for cell in column_cells)
-            column_letter = column_cells[0].column_letter
-            sheet.column_dimensions[column_letter].width = min(60, max(12, max_length + 2))
-        workbook.save(path)
+        exporter.write_xlsx(path, _table_headers(table), _iter_table_rows(table))
     except Exception as exc:  # pragma: no cover - GUI warning
         QMessageBox.critical(parent, "Export failed", f"Could not export to Excel:\n{exc}")
         return
@@ -301,77 +348,103 @@ def export_table_to_xlsx(table: QTableWidget, parent: QWidget | None = None) ->
     QMessageBox.information(parent, "Export successful", f"Table exported to:\n{path}")
 
 
-_PDF_TABLE_TEMPLATE = """
-<!DOCTYPE html>
-<html>
-<head>
-    <meta charset=\"utf-8\">
-    <style>
-        body {{ font-family: Arial, Helvetica, sans-serif; font-size: 11pt; margin: 0; }}
-        table {{ border-collapse: collapse; width: 100%; }}
-        th, td {{ border: 1px solid #444; padding: 6px 8px; text-align: left; }}
-        th {{ background-color: #f2f2f2; font-weight: 600; }}
-        tbody tr:nth-child(even) {{ background-color: #fafafa; }}
-    </style>
-</head>
-<body>
-    <table>
-        <thead>
-            <tr>{header}</tr>
-        </thead>
-        <tbody>
-            {rows}
-        </tbody>
-    </table>
-</body>
-</html>
-""".strip()
-
-
-def _table_to_pdf_html(table: QTableWidget) -> str:
-    """Build an HTML representation of a table suitable for PDF export."""
-
-    headers = _table_headers(table)
-    if headers:
-        header_html = "".join(f"<th>{escape(text)}</th>" for text in headers)
-    else:
-        header_html = "<th>Table</th>"
-
-    rows = _table_rows(table)
-    if rows:
-        row_html = [
-            "<tr>" + "".join(f"<td>{escape(cell)}</td>" for cell in row) + "</tr>"
-            for row in rows
-        ]
-    else:
-        colspan = max(len(headers), 1)
-        row_html = [f"<tr><td colspan=\"{colspan}\">No data available</td></tr>"]
-
-    return _PDF_TABLE_TEMPLATE.format(header=header_html, rows="\n".join(row_html))
-
-
-def export_table_to_pdf(table: QTableWidget, parent: QWidget | None = None) -> None:
-    """Render a QTableWidget to a PDF file."""
-
+class _ExportProgress(QObject):
+    advanced = pyqtSignal(int, int)
+
+
+def _run_export(
+    parent: QWidget | None,
+    path: str,
+    export: Callable[[str, Callable[[int, int | None], bool]], "exporter.ExportResult"],
+    label: str,
+    target: str,
+) -> None:
+    """Run ``export(path, progress)`` on the executor's bulk threads behind a progress dialog."""
+    dialog = QProgressDialog(label, "Cancel", 0, 0, parent)
+    dialog.setWindowTitle(f"Export to {target}")
+    dialog.setWindowModality(Qt.WindowModality.WindowModal)
+    dialog.setAutoClose(False)
+    dialog.setAutoReset(False)
+    dialog.setMinimumDuration(300)
+    cancelled = threading.Event()
+    dialog.canceled.connect(cancelled.set)
+    executor = storage_executor()
+    relay = _ExportProgress(dialog)
+
+    def show_progress(done: int, total: int) -> None:
+        dialog.setMaximum(total)
+        dialog.setValue(min(done, total) if total else 0)
+        dialog.setLabelText(f"{label}\n{done:,} rows written")
+
+    relay.advanced.connect(show_progress)
+
+    def progress(done: int, total: int | None) -> bool:
+        relay.advanced.emit(done, total or 0)  # queued to the GUI thread
+        return not (cancelled.is_set() or executor.closing())
+
+    def finished(result) -> None:
+        dialog.close()
+        if result.cancelled:
+            QMessageBox.information(parent, "Export cancelled", "Nothing was written.")
+        else:
+            QMessageBox.information(parent, "Export successful", f"{result.rows:,} rows exported to:\n{path}")
+
+    def failed(exc: BaseException) -> None:
+        dialog.close()
+        QMessageBox.critical(parent, "Export failed", f"Could not export to {target}:\n{exc}")
+
+    dialog.show()
+    executor.bulk_read(lambda: export(path, progress), finished, failed)
+
+
+def export_xlsx_in_background(
+    parent: QWidget | None,
+    export: Callable[[str, Callable[[int, int | None], bool]], "exporter.ExportResult"],
+    label: str = "Exporting…",
+) -> None:
+    """Ask for a file name and run ``export(path, progress)`` off the GUI thread.
+
+    *export* is typically one of the ``exporter.export_*`` functions; it reads
+    straight from storage, so the whole dataset is written whatever the
+    window has loaded.  A progress dialog shows the row count and can cancel.
+    """
+    path = _ask_xlsx_path(parent)
+    if path:
+        _run_export(parent, path, export, label, "Excel")
+
+
+def _ask_pdf_path(parent: QWidget | None) -> str | None:
     path, _ = QFileDialog.getSaveFileName(parent, "Export to PDF", "", "PDF Files (*.pdf)")
     if not path:
-        return
+        return None
     if not path.lower().endswith(".pdf"):
         path += ".pdf"
+    return path
 
-    printer = QPrinter(QPrinter.PrinterMode.HighResolution)
-    printer.setOutputFormat(QPrinter.OutputFormat.PdfFormat)
-    printer.setOutputFileName(path)
-    printer.setPageMargins(QMarginsF(12, 12, 12, 12), QPageLayout.Unit.Millimeter)
 
-    document = QTextDocument()
-    document.setDocumentMargin(12)
-    document.setHtml(_table_to_pdf_html(table))
+def export_pdf_in_background(
+    parent: QWidget | None,
+    export: Callable[[str, Callable[[int, int | None], bool]], "exporter.ExportResult"],
+    label: str = "Exporting…",
+) -> None:
+    """PDF counterpart of :func:`export_xlsx_in_background`."""
+    path = _ask_pdf_path(parent)
+    if path:
+        _run_export(parent, path, export, label, "PDF")
 
-    try:
-        document.print(printer)
-    except Exception as exc:  # pragma: no cover - GUI warning
-        QMessageBox.critical(parent, "Export failed", f"Could not export to PDF:\n{exc}")
-        return
 
-    QMessageBox.information(parent, "Export successful", f"Table exported to:\n{path}")
+def export_table_to_pdf(table: QTableView, parent: QWidget | None = None, title: str = "") -> None:
+    """Render a table view (or QTableWidget) to a paginated PDF file.
+
+    The rows are copied off the model here, since models belong to the GUI
+    thread; the pages are painted in the background.
+    """
+    path = _ask_pdf_path(parent)
+    if not path:
+        return
+    headers, rows = _table_headers(table), _table_rows(table)
+    _run_export(
+        parent, path,
+        lambda path, progress: exporter.write_pdf(path, headers, rows, title=title, total=len(rows), progress=progress),
+        "Exporting…", "PDF",
+    )
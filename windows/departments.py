@@ -1,7 +1,10 @@
+import threading
+
 from PyQt6.QtWidgets import (
     QWidget,
     QVBoxLayout,
     QPushButton,
+    QTableView,
     QTableWidget,
     QTableWidgetItem,
     QHeaderView,
@@ -10,9 +13,13 @@ from PyQt6.QtWidgets import (
     QInputDialog,
     QLabel,
     QStackedWidget,
+    QFileDialog,
+    QProgressDialog,
 )
-from PyQt6.QtCore import Qt
-from .base import BaseWindow, export_table_to_xlsx, export_table_to_pdf
+from PyQt6.QtCore import QObject, Qt, pyqtSignal
+from .base import BaseWindow, export_pdf_in_background, export_table_to_xlsx, export_table_to_pdf
+from .table_models import ProductTableModel
+from .tasks import storage_executor
 try:  # Allow running when package layout is flattened by PyInstaller
     from ..forms import (
         AddDepartmentForm,
@@ -22,7 +29,7 @@ try:  # Allow running when package layout is flattened by PyInstaller
         EditSubDepartmentNameDialog,
     )
     from ..models import Department, SubDepartment, Product
-    from .. import storage
+    from .. import exporter, importer, storage
 except ImportError:  # pragma: no cover - fallback for frozen build
     from forms import (  # type: ignore[import-not-found]
         AddDepartmentForm,
@@ -32,8 +39,15 @@ except ImportError:  # pragma: no cover - fallback for frozen build
         EditSubDepartmentNameDialog,
     )
     from models import Department, SubDepartment, Product  # type: ignore[import-not-found]
+    import exporter  # type: ignore[import-not-found]
+    import importer  # type: ignore[import-not-found]
     import storage  # type: ignore[import-not-found]
 
+
+class _ImportProgress(QObject):
+    advanced = pyqtSignal(int, int, int)
+
+
 class DepartmentsWindow(BaseWindow):
     def __init__(self):
         super().__init__("Departments - Inventory App", "Departments")
@@ -53,15 +67,17 @@ class DepartmentsWindow(BaseWindow):
         self.add_button = QPushButton("Create Department")
         self.rename_button = QPushButton("Rename Department")
         self.delete_button = QPushButton("Delete Department")
+        self.import_button = QPushButton("Import Products")
         self.export_xlsx_btn = QPushButton("Export XLSX"); self.export_pdf_btn = QPushButton("Export PDF")
         btn_row.addWidget(self.add_button); btn_row.addWidget(self.rename_button); btn_row.addWidget(self.delete_button)
-        btn_row.addStretch(1); btn_row.addWidget(self.export_xlsx_btn); btn_row.addWidget(self.export_pdf_btn)
+        btn_row.addStretch(1); btn_row.addWidget(self.import_button); btn_row.addWidget(self.export_xlsx_btn); btn_row.addWidget(self.export_pdf_btn)
         dept_layout.addLayout(btn_row)
         self.add_button.clicked.connect(self.show_add_form)
         self.rename_button.clicked.connect(self.rename_selected_dept)
         self.delete_button.clicked.connect(self.delete_selected_dept)
+        self.import_button.clicked.connect(self.import_products)
         self.export_xlsx_btn.clicked.connect(lambda: export_table_to_xlsx(self.table, self))
-        self.export_pdf_btn.clicked.connect(lambda: export_table_to_pdf(self.table, self))
+        self.export_pdf_btn.clicked.connect(lambda: export_table_to_pdf(self.table, self, "Departments"))
         self.table = QTableWidget(0, 2)
         self.table.setHorizontalHeaderLabels(["Name", "Number of items"])
         self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
@@ -107,7 +123,6 @@ class DepartmentsWindow(BaseWindow):
          # --- Products page ---------------------------------------------------
         self.detail_page = SubDepartmentDetailWindow(self)
         self.stack.addWidget(self.detail_page)
-        storage.init_db()
         self.active_department: Department | None = None
         self.refresh_departments()
         self.stack.setCurrentWidget(self.dept_page)
@@ -117,11 +132,11 @@ class DepartmentsWindow(BaseWindow):
         self.sub_table.cellDoubleClicked.connect(self.open_sub_detail)
 
     def refresh_departments(self):
-        self.depts = storage.list_departments(); self.table.setRowCount(0)
-        for d in self.depts:
+        summary = storage.list_departments_summary(); self.table.setRowCount(0)
+        self.depts = [d for d, _ in summary]
+        for d, cnt in summary:
             row = self.table.rowCount(); self.table.insertRow(row)
             name_item = QTableWidgetItem(d.name); name_item.setData(Qt.ItemDataRole.UserRole, d.dept_id)
-            cnt = len(storage.list_subdepartments(d))
             cnt_item = QTableWidgetItem(str(cnt)); cnt_item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
             self.table.setItem(row, 0, name_item); self.table.setItem(row, 1, cnt_item)
 
@@ -131,6 +146,18 @@ class DepartmentsWindow(BaseWindow):
         dept_id = self.table.item(row, 0).data(Qt.ItemDataRole.UserRole)
         return next((x for x in self.depts if x.dept_id == dept_id), None)
 
+    def _department_deleted(self, d: Department):
+        self.delete_button.setEnabled(True)
+        QMessageBox.information(self, "Deleted", "Department and all of its data deleted.")
+        if self.active_department and self.active_department.dept_id == d.dept_id:
+            self.active_department = None
+        self.refresh_departments(); self.stack.setCurrentWidget(self.dept_page)
+
+    def _department_delete_failed(self, d: Department, exc: BaseException):
+        self.delete_button.setEnabled(True)
+        QMessageBox.warning(self, "Delete Department", f"Could not delete '{d.name}': {exc}")
+        self.refresh_departments()
+
     def show_add_form(self):
         dlg = AddDepartmentForm(self); dlg.exec()
 
@@ -152,16 +179,69 @@ class DepartmentsWindow(BaseWindow):
             )
             if confirm != QMessageBox.StandardButton.Yes:
                 return
-            storage.delete_department(d)
-            QMessageBox.information(self, "Deleted", "Department and all of its data deleted.")
-            if self.active_department and self.active_department.dept_id == d.dept_id:
-                self.active_department = None
-            self.refresh_departments(); self.stack.setCurrentWidget(self.dept_page)
+            # Deleting the rows and the product media can take a while; keep the window responsive.
+            self.delete_button.setEnabled(False)
+            self.run_storage(
+                lambda: storage.delete_department(d),
+                lambda _: self._department_deleted(d),
+                write=True,
+                on_error=lambda exc: self._department_delete_failed(d, exc),
+            )
             return
         if self.active_department and self.active_department.dept_id == d.dept_id:
             self.active_department = None
         self.refresh_departments()
 
+    def import_products(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Import Products", "", "Spreadsheets (*.csv *.xlsx)")
+        if not path:
+            return
+        progress = QProgressDialog("Importing products…", "Cancel", 0, 0, self)
+        progress.setWindowModality(Qt.WindowModality.WindowModal); progress.setMinimumDuration(0)
+        progress.setAutoClose(False); progress.setAutoReset(False)
+        cancelled = threading.Event()
+        progress.canceled.connect(cancelled.set)
+        executor = storage_executor()
+        relay = _ImportProgress(progress)
+        relay.advanced.connect(lambda read, imported, rejected: progress.setLabelText(
+            f"Read {read} rows: {imported} imported, {rejected} rejected"))
+
+        def report(read: int, imported: int, rejected: int) -> bool:
+            relay.advanced.emit(read, imported, rejected)  # queued to the GUI thread
+            return not (cancelled.is_set() or executor.closing())
+
+        def failed(exc: BaseException) -> None:
+            progress.close()
+            if isinstance(exc, ImportError):
+                QMessageBox.warning(self, "Import failed", "The 'openpyxl' package is required to import Excel files. "
+                                    "Install it with:\n\npip install openpyxl")
+            else:
+                QMessageBox.critical(self, "Import failed", f"Could not import products:\n{exc}")
+
+        def finished(result) -> None:
+            progress.close()
+            self._import_finished(result)
+
+        progress.show()
+        # The chunks are written on the storage writer thread, in turn with other writes.
+        self.run_storage(lambda: importer.import_products(path, report), finished, write=True, on_error=failed)
+
+    def _import_finished(self, result) -> None:
+        self.refresh_departments()
+        if self.active_department: self.refresh_subdepartments()
+        summary = f"Imported {result.imported} product(s); {len(result.rejected)} row(s) rejected."
+        if result.cancelled:
+            summary = "Import cancelled. " + summary
+        if not result.rejected:
+            QMessageBox.information(self, "Import finished", summary); return
+        save = QMessageBox.question(self, "Import finished", summary + "\n\nSave a report of the rejected rows?",
+                                    QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
+        if save != QMessageBox.StandardButton.Yes:
+            return
+        report_path, _ = QFileDialog.getSaveFileName(self, "Save rejected rows", "rejected_rows.csv", "CSV Files (*.csv)")
+        if report_path:
+            importer.write_rejected_report(result, report_path)
+
     def show_departments_page(self):
         self.active_department = None
         self.set_page_title("Departments")
@@ -190,12 +270,12 @@ class DepartmentsWindow(BaseWindow):
         if not self.active_department:
             self.sub_table.setRowCount(0)
             return
-        self.subs = storage.list_subdepartments(self.active_department)
+        summary = storage.list_subdepartments_summary(self.active_department)
+        self.subs = [s for s, _, _ in summary]
         self.sub_table.setRowCount(0)
-        for s in self.subs:
+        for s, cnt, _value in summary:
             row = self.sub_table.rowCount(); self.sub_table.insertRow(row)
             name_item = QTableWidgetItem(s.name); name_item.setData(Qt.ItemDataRole.UserRole, s.sub_id)
-            cnt = storage.count_products(s)
             cnt_item = QTableWidgetItem(str(cnt)); cnt_item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
             self.sub_table.setItem(row, 0, name_item); self.sub_table.setItem(row, 1, cnt_item)
 
@@ -237,17 +317,17 @@ class SubDepartmentDetailWindow(QWidget):
         self.back_button.clicked.connect(self.go_back); self.rate_button.clicked.connect(self.change_conversion_rate)
         self.rename_sub_btn.clicked.connect(self.rename_subdepartment); self.delete_sub_btn.clicked.connect(self.delete_subdepartment)
         self.export_xlsx_btn.clicked.connect(lambda: export_table_to_xlsx(self.prod_table, self))
-        self.export_pdf_btn.clicked.connect(lambda: export_table_to_pdf(self.prod_table, self))
+        self.export_pdf_btn.clicked.connect(self.export_products_pdf)
         actions = QHBoxLayout()
         self.add_product_button = QPushButton("Add Product"); self.edit_product_button = QPushButton("Edit Product"); self.delete_product_button = QPushButton("Delete Product")
         actions.addWidget(self.add_product_button); actions.addStretch(1); actions.addWidget(self.edit_product_button); actions.addWidget(self.delete_product_button)
         layout.addLayout(actions)
         self.add_product_button.clicked.connect(self.show_add_product_form); self.edit_product_button.clicked.connect(self.edit_selected_product); self.delete_product_button.clicked.connect(self.delete_selected_product)
-        self.prod_table = QTableWidget(0, 7)
-        self.prod_table.setHorizontalHeaderLabels(["Id", "Name", "Price $", "Price C$", "Quantity", "Subtotal $", "Subtotal C$"])
-        self.prod_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
-        self.prod_table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
-        self.prod_table.setSelectionMode(QTableWidget.SelectionMode.SingleSelection)
+        self.prod_model = ProductTableModel(self)
+        self.prod_table = QTableView(); self.prod_table.setModel(self.prod_model)
+        self.prod_table.setEditTriggers(QTableView.EditTrigger.NoEditTriggers)
+        self.prod_table.setSelectionBehavior(QTableView.SelectionBehavior.SelectRows)
+        self.prod_table.setSelectionMode(QTableView.SelectionMode.SingleSelection)
         self.prod_table.verticalHeader().setVisible(False)
         header = self.prod_table.horizontalHeader()
         header.setSectionResizeMode(0, QHeaderView.ResizeMode.ResizeToContents); header.setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
@@ -260,7 +340,7 @@ class SubDepartmentDetailWindow(QWidget):
         totals.addWidget(self.total_items_lbl); totals.addStretch(1); totals.addWidget(self.total_qty_lbl); totals.addStretch(1)
         totals.addWidget(self.total_usd_lbl); totals.addWidget(self.total_c_lbl); totals.addWidget(self.sum_sub_usd_lbl); totals.addWidget(self.sum_sub_c_lbl)
         layout.addLayout(totals)
-        self.prod_table.cellDoubleClicked.connect(lambda *_: self.edit_selected_product())
+        self.prod_table.doubleClicked.connect(lambda *_: self.edit_selected_product())
     
     def set_subdepartment(self, subdepartment: SubDepartment):
         self.subdepartment = subdepartment
@@ -269,35 +349,30 @@ class SubDepartmentDetailWindow(QWidget):
 
     def refresh_products(self):
         if not self.subdepartment:
-            self.prod_table.setRowCount(0)
             self.products = []
+            self.prod_model.set_rows([])
+            self.show_totals()
             return
-        rate = storage.get_conversion_rate(); self.products = storage.list_products(self.subdepartment)
-        self.prod_table.setRowCount(0); items = len(self.products); total_qty=0; total_usd=0.0; total_c=0.0
-        for p in self.products:
-            row = self.prod_table.rowCount(); self.prod_table.insertRow(row)
-            price_usd = float(p.price); price_c = price_usd * float(rate); qty = int(p.quantity)
-            subtotal_usd = price_usd * qty; subtotal_c = price_c * qty
-            total_qty += qty; total_usd += subtotal_usd; total_c += subtotal_c
-            id_item = QTableWidgetItem(p.prod_id); id_item.setData(Qt.ItemDataRole.UserRole, p.prod_id)
-            name_item = QTableWidgetItem(p.name)
-            usd_item = QTableWidgetItem(f"{price_usd:.2f}"); usd_item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
-            cord_item = QTableWidgetItem(f"{price_c:.2f}"); cord_item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
-            qty_item = QTableWidgetItem(str(qty)); qty_item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
-            sub_usd_item = QTableWidgetItem(f"{subtotal_usd:.2f}"); sub_usd_item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
-            sub_c_item = QTableWidgetItem(f"{subtotal_c:.2f}"); sub_c_item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
-            self.prod_table.setItem(row, 0, id_item); self.prod_table.setItem(row, 1, name_item)
-            self.prod_table.setItem(row, 2, usd_item); self.prod_table.setItem(row, 3, cord_item)
-            self.prod_table.setItem(row, 4, qty_item); self.prod_table.setItem(row, 5, sub_usd_item); self.prod_table.setItem(row, 6, sub_c_item)
+        self.products = storage.list_products(self.subdepartment)
+        self.prod_model.set_products(self.products, storage.get_conversion_rate())
+        self.show_totals()
+
+    def show_totals(self):
+        items, total_qty, total_usd, total_c = self.prod_model.totals()
         self.total_items_lbl.setText(f"Items: {items}"); self.total_qty_lbl.setText(f"Total quantity: {total_qty}")
         self.total_usd_lbl.setText(f"Total price $: {total_usd:.2f}"); self.total_c_lbl.setText(f"Total price C$: {total_c:.2f}")
         self.sum_sub_usd_lbl.setText(f"Subtotal $ (sum): {total_usd:.2f}"); self.sum_sub_c_lbl.setText(f"Subtotal C$ (sum): {total_c:.2f}")
 
+    def export_products_pdf(self):
+        # Streams the products from storage instead of copying the table.
+        sub = self.subdepartment
+        if sub:
+            export_pdf_in_background(self, lambda path, progress: exporter.export_products_pdf(path, sub, progress), "Exporting products…")
+
     def current_product(self):
-        row = self.prod_table.currentRow()
-        if row < 0: return None
-        prod_id = self.prod_table.item(row, 0).data(Qt.ItemDataRole.UserRole)
-        return next((p for p in self.products if p.prod_id == prod_id), None)
+        row = self.prod_table.currentIndex().row()
+        if row < 0 or row >= len(self.products): return None
+        return self.products[row]
 
     def go_back(self):
         self.subdepartment = None
@@ -358,8 +433,10 @@ class SubDepartmentDetailWindow(QWidget):
             return
         form = AddProductForm(self); form.exec()
 
-    def add_product(self, product: Product):
-        storage.add_product(product); self.refresh_products(); self.parent_window.refresh_subdepartments()
+    def create_product(self, name: str, desc: str, price: float, qty: int) -> Product:
+        product = storage.create_product(self.subdepartment, name, desc, price, qty)
+        self.refresh_products(); self.parent_window.refresh_subdepartments()
+        return product
 
     def edit_selected_product(self):
         prod = self.current_product()
@@ -372,7 +449,8 @@ class SubDepartmentDetailWindow(QWidget):
                 prod.name = name; prod.description = desc; prod.price = float(price); prod.quantity = int(qty)
             except ValueError:
                 QMessageBox.warning(self, "Invalid", "Price must be a number and Quantity must be an integer."); return
-            storage.update_product(prod); self.refresh_products()
+            storage.update_product(prod)
+            self.prod_model.update_product(self.products.index(prod), prod); self.show_totals()
 
     def delete_selected_product(self):
         prod = self.current_product()
@@ -1,6 +1,7 @@
-from PyQt6.QtWidgets import QWidget, QVBoxLayout, QPushButton, QTableWidget, QTableWidgetItem, QHeaderView, QHBoxLayout, QMessageBox, QInputDialog, QLabel, QStackedWidget
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QPushButton, QTableView, QTableWidget, QTableWidgetItem, QHeaderView, QHBoxLayout, QMessageBox, QInputDialog, QLabel, QStackedWidget
 from PyQt6.QtCore import Qt
 from .base import BaseWindow, export_table_to_xlsx, export_table_to_pdf
+from .table_models import LocalStockTableModel
 try:  # Enable execution from frozen bundles where package context is lost
     from ..models import Local
     from .. import storage
@@ -34,7 +35,7 @@ class LocalsWindow(BaseWindow):
         main_layout.insertLayout(1, btn_row)
         self.add_button.clicked.connect(self.show_add_form); self.delete_button.clicked.connect(self.delete_selected_local)
         self.export_xlsx_btn.clicked.connect(lambda: export_table_to_xlsx(self.table, self))
-        self.export_pdf_btn.clicked.connect(lambda: export_table_to_pdf(self.table, self))
+        self.export_pdf_btn.clicked.connect(lambda: export_table_to_pdf(self.table, self, "Locals"))
 
         self.table = QTableWidget(0, 2)
         self.table.setHorizontalHeaderLabels(["Name", "Number of items"])
@@ -71,11 +72,11 @@ class LocalsWindow(BaseWindow):
 
         self.remove_btn.clicked.connect(self.remove_selected_product)
 
-        self.prod_table = QTableWidget(0, 7)
-        self.prod_table.setHorizontalHeaderLabels(["Id", "Name", "Price $", "Price C$", "Quantity", "Subtotal $", "Subtotal C$"])
-        self.prod_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
-        self.prod_table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
-        self.prod_table.setSelectionMode(QTableWidget.SelectionMode.SingleSelection)
+        self.prod_model = LocalStockTableModel(self)
+        self.prod_table = QTableView(); self.prod_table.setModel(self.prod_model)
+        self.prod_table.setEditTriggers(QTableView.EditTrigger.NoEditTriggers)
+        self.prod_table.setSelectionBehavior(QTableView.SelectionBehavior.SelectRows)
+        self.prod_table.setSelectionMode(QTableView.SelectionMode.SingleSelection)
         self.prod_table.verticalHeader().setVisible(False)
         header = self.prod_table.horizontalHeader()
         header.setSectionResizeMode(0, QHeaderView.ResizeMode.ResizeToContents); header.setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
@@ -94,7 +95,6 @@ class LocalsWindow(BaseWindow):
 
         self.stack.addWidget(self.detail_page)
 
-        storage.init_db()
         self.active_local: Local | None = None
         self.products: list = []
         self.refresh_locals()
@@ -102,11 +102,12 @@ class LocalsWindow(BaseWindow):
         self.table.cellDoubleClicked.connect(self.open_local_detail)
 
     def refresh_locals(self):
-        self.locals = storage.list_locals(); self.table.setRowCount(0)
-        for loc in self.locals:
+        summary = storage.list_locals_summary(); self.table.setRowCount(0)
+        self.locals = [loc for loc, *_ in summary]
+        for loc, cnt, _qty, _value in summary:
             row = self.table.rowCount(); self.table.insertRow(row)
             name_item = QTableWidgetItem(loc.name); name_item.setData(Qt.ItemDataRole.UserRole, loc.local_id)
-            cnt = storage.count_local_products(loc); cnt_item = QTableWidgetItem(str(cnt)); cnt_item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+            cnt_item = QTableWidgetItem(str(cnt)); cnt_item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
             self.table.setItem(row, 0, name_item); self.table.setItem(row, 1, cnt_item)
 
     def show_add_form(self):
@@ -120,6 +121,7 @@ class LocalsWindow(BaseWindow):
             return
         self.active_local = loc
         self.set_page_title(f"{loc.name} - Products")
+        self.products = []; self.prod_model.set_rows([]); self.show_totals()
         self.refresh_products()
         self.stack.setCurrentWidget(self.detail_page)
 
@@ -138,6 +140,7 @@ class LocalsWindow(BaseWindow):
 
     def show_locals_page(self):
         self.active_local = None
+        self.discard_storage("products")
         self.set_page_title("Locals")
         self.refresh_locals()
         self.stack.setCurrentWidget(self.list_page)
@@ -145,44 +148,39 @@ class LocalsWindow(BaseWindow):
     def refresh_products(self):
         if not self.active_local:
             self.products = []
-            self.prod_table.setRowCount(0)
-            self.total_items_lbl.setText("Items: 0"); self.total_qty_lbl.setText("Total quantity: 0")
-            self.total_usd_lbl.setText("Total price $: 0.00"); self.total_c_lbl.setText("Total price C$: 0.00")
-            self.sum_sub_usd_lbl.setText("Subtotal $ (sum): 0.00"); self.sum_sub_c_lbl.setText("Subtotal C$ (sum): 0.00")
+            self.prod_model.set_rows([])
+            self.show_totals()
+            self.discard_storage("products")
             return
-        conv = storage.get_conversion_rate(); retail_pct = storage.get_local_retail_rate(self.active_local)
-        self.products = storage.list_products_for_local(self.active_local)
-       
-        self.prod_table.setRowCount(0); items = len(self.products); total_qty=0; total_usd=0.0; total_c=0.0
-        for p in self.products:
-            row = self.prod_table.rowCount(); self.prod_table.insertRow(row)
-            base_usd = float(p.price); retail_usd = base_usd * (1.0 + float(retail_pct)/100.0); retail_c = retail_usd * float(conv)
-            qty = int(p.quantity); subtotal_usd = retail_usd * qty; subtotal_c = retail_c * qty
-            total_qty += qty; total_usd += subtotal_usd; total_c += subtotal_c
-            id_item = QTableWidgetItem(p.prod_id); id_item.setData(Qt.ItemDataRole.UserRole, p.prod_id)
-            name_item = QTableWidgetItem(p.name)
-            usd_item = QTableWidgetItem(f"{retail_usd:.2f}"); usd_item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
-            cord_item = QTableWidgetItem(f"{retail_c:.2f}"); cord_item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
-            qty_item = QTableWidgetItem(str(qty)); qty_item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
-            sub_usd_item = QTableWidgetItem(f"{subtotal_usd:.2f}"); sub_usd_item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
-            sub_c_item = QTableWidgetItem(f"{subtotal_c:.2f}"); sub_c_item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
-            self.prod_table.setItem(row, 0, id_item); self.prod_table.setItem(row, 1, name_item)
-            self.prod_table.setItem(row, 2, usd_item); self.prod_table.setItem(row, 3, cord_item)
-            self.prod_table.setItem(row, 4, qty_item); self.prod_table.setItem(row, 5, sub_usd_item); self.prod_table.setItem(row, 6, sub_c_item)
+        loc = self.active_local
+        self.run_storage(
+            lambda: (storage.get_conversion_rate(), storage.get_local_retail_rate(loc), storage.list_products_for_local(loc)),
+            lambda result: self._show_products(loc, *result),
+            key="products",
+        )
+
+    def _show_products(self, loc: Local, conv: float, retail_pct: float, products: list) -> None:
+        if self.active_local is None or self.active_local.local_id != loc.local_id:
+            return  # the user left this local while it was loading
+        self.products = products
+        self.prod_model.set_products(self.products, conv, retail_pct)
+        self.show_totals()
+        try:
+            pct = float(retail_pct)
+            self.set_page_title(f"{loc.name} - Products (Retail {pct:.2f}%)")
+        except Exception:
+            self.set_page_title(f"{loc.name} - Products")
+
+    def show_totals(self):
+        items, total_qty, total_usd, total_c = self.prod_model.totals()
         self.total_items_lbl.setText(f"Items: {items}"); self.total_qty_lbl.setText(f"Total quantity: {total_qty}")
         self.total_usd_lbl.setText(f"Total price $: {total_usd:.2f}"); self.total_c_lbl.setText(f"Total price C$: {total_c:.2f}")
         self.sum_sub_usd_lbl.setText(f"Subtotal $ (sum): {total_usd:.2f}"); self.sum_sub_c_lbl.setText(f"Subtotal C$ (sum): {total_c:.2f}")
-        try:
-            pct = float(storage.get_local_retail_rate(self.active_local))
-            self.set_page_title(f"{self.active_local.name} - Products (Retail {pct:.2f}%)")
-        except Exception:
-            self.set_page_title(f"{self.active_local.name} - Products")
 
     def current_product(self):
-        row = self.prod_table.currentRow()
-        if row < 0: return None
-        prod_id = self.prod_table.item(row, 0).data(Qt.ItemDataRole.UserRole)
-        return next((p for p in self.products if p.prod_id == prod_id), None)
+        row = self.prod_table.currentIndex().row()
+        if row < 0 or row >= len(self.products): return None
+        return self.products[row]
 
     def remove_selected_product(self):
         if not self.active_local:
@@ -6,16 +6,19 @@ from PyQt6.QtWidgets import (
     QHeaderView,
     QLabel,
     QPushButton,
+    QTableView,
     QTableWidget,
     QTableWidgetItem,
     QVBoxLayout,
 )
 
-from .base import BaseWindow
+from .base import BaseWindow, export_pdf_in_background, export_xlsx_in_background
+from .table_models import SalesTableModel
 try:  # Handle module loading differences in frozen builds
-    from .. import storage
+    from .. import exporter, storage
     from ..forms import RegisterSaleDialog
 except ImportError:  # pragma: no cover - fallback for frozen build
+    import exporter  # type: ignore[import-not-found]
     import storage  # type: ignore[import-not-found]
     from forms import RegisterSaleDialog  # type: ignore[import-not-found]
 
@@ -111,19 +114,22 @@ class SalesWindow(BaseWindow):
         self.register_button = QPushButton("Register sales")
         actions.addWidget(self.register_button)
         actions.addStretch(1)
+        self.export_xlsx_btn = QPushButton("Export XLSX")
+        actions.addWidget(self.export_xlsx_btn)
+        self.export_pdf_btn = QPushButton("Export PDF")
+        actions.addWidget(self.export_pdf_btn)
 
         main_layout.insertLayout(1, actions)
 
-        self.sales_table = QTableWidget(0, 7)
-        self.sales_table.setHorizontalHeaderLabels(
-            ["Date", "Id", "Name", "Location", "Qty", "$ Price", "C$ Price"]
-        )
-        self.sales_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.sales_model = SalesTableModel(self)
+        self.sales_table = QTableView()
+        self.sales_table.setModel(self.sales_model)
+        self.sales_table.setEditTriggers(QTableView.EditTrigger.NoEditTriggers)
         self.sales_table.setSelectionBehavior(
-            QTableWidget.SelectionBehavior.SelectRows
+            QTableView.SelectionBehavior.SelectRows
         )
         self.sales_table.setSelectionMode(
-            QTableWidget.SelectionMode.SingleSelection
+            QTableView.SelectionMode.SingleSelection
         )
         self.sales_table.verticalHeader().setVisible(False)
 
@@ -142,7 +148,9 @@ class SalesWindow(BaseWindow):
         self.subdepartment_filter.currentIndexChanged.connect(self.refresh_sales_table)
         self.location_filter.currentIndexChanged.connect(self.refresh_sales_table)
         self.register_button.clicked.connect(self.open_register_sales_dialog)
-        self.sales_table.cellClicked.connect(self._open_sale_details)
+        self.export_xlsx_btn.clicked.connect(self.export_sales_xlsx)
+        self.export_pdf_btn.clicked.connect(self.export_sales_pdf)
+        self.sales_table.clicked.connect(self._open_sale_details)
         
         self._reload_filters()
         self.refresh_sales_table()
@@ -159,6 +167,32 @@ class SalesWindow(BaseWindow):
         self.refresh_sales_table()
 
     def refresh_sales_table(self) -> None:
+        filters = self._current_filters()
+        self.run_storage(
+            lambda: (storage.get_conversion_rate(), SalesTableModel.first_page(**filters)),
+            lambda result: self.sales_model.show_first_page(result[0], filters, result[1]),
+            key="sales",
+        )
+
+    def export_sales_xlsx(self) -> None:
+        """Export every sale matching the filters, not only the loaded pages."""
+        filters = self._current_filters()
+        export_xlsx_in_background(
+            self,
+            lambda path, progress: exporter.export_sales_xlsx(path, progress, **filters),
+            "Exporting sales…",
+        )
+
+    def export_sales_pdf(self) -> None:
+        """PDF report of every sale matching the filters, with totals."""
+        filters = self._current_filters()
+        export_pdf_in_background(
+            self,
+            lambda path, progress: exporter.export_sales_pdf(path, progress, **filters),
+            "Exporting sales…",
+        )
+
+    def _current_filters(self) -> dict:
         department_id = self.department_filter.currentData()
         if not isinstance(department_id, int):
             department_id = None
@@ -181,70 +215,12 @@ class SalesWindow(BaseWindow):
 
         local_id = int(local_id) if isinstance(local_id, int) else None
 
-        sales = storage.list_sold_products(
+        return dict(
             department_id=department_id,
             subdepartment_id=subdepartment_id,
             location_type=location_type,
             local_id=local_id,
         )
-        rate = float(storage.get_conversion_rate())
-
-        self.sales_table.setRowCount(0)
-
-        for sale in sales:
-            row = self.sales_table.rowCount()
-            self.sales_table.insertRow(row)
-
-            date_item = QTableWidgetItem(sale.get("sold_on") or "")
-            id_item = QTableWidgetItem(sale["prod_id"])
-            name_item = QTableWidgetItem(sale["name"])
-
-            location = self._format_location(sale)
-            qty = int(sale["qty"])
-            price_usd = float(sale["price"])
-            price_cad = price_usd * rate
-
-            sale_details = {
-                "sale_id": sale["sale_id"],
-                "prod_id": sale["prod_id"],
-                "name": sale["name"],
-                "description": sale.get("description") or "",
-                "qty": str(qty),
-                "price_usd": f"{price_usd:.2f}",
-                "price_cad": f"{price_cad:.2f}",
-                "sold_on": sale.get("sold_on") or "",
-                "location": location,
-                "client": sale.get("client") or "",
-                "department": sale.get("department_name") or "",
-                "subdepartment": sale.get("subdepartment_name") or "",
-            }
-
-            date_item.setData(Qt.ItemDataRole.UserRole, sale_details)
-
-            location_item = QTableWidgetItem(location)
-
-            qty_item = QTableWidgetItem(str(qty))
-            qty_item.setTextAlignment(
-                Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter
-            )
-
-            usd_item = QTableWidgetItem(f"{price_usd:.2f}")
-            usd_item.setTextAlignment(
-                Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter
-            )
-
-            cad_item = QTableWidgetItem(f"{price_cad:.2f}")
-            cad_item.setTextAlignment(
-                Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter
-            )
-
-            self.sales_table.setItem(row, 0, date_item)
-            self.sales_table.setItem(row, 1, id_item)
-            self.sales_table.setItem(row, 2, name_item)
-            self.sales_table.setItem(row, 3, location_item)
-            self.sales_table.setItem(row, 4, qty_item)
-            self.sales_table.setItem(row, 5, usd_item)
-            self.sales_table.setItem(row, 6, cad_item)
 
     def _reload_filters(self) -> None:
         self._reload_department_filter()
@@ -328,22 +304,9 @@ class SalesWindow(BaseWindow):
         self._reload_subdepartment_filter(current_dept)
         self.refresh_sales_table()
         
-    def _format_location(self, sale: dict) -> str:
-        location_type = (sale.get("location_type") or "").strip().lower()
-        if location_type == "local":
-            local_name = sale.get("local_name") or "Local"
-            return local_name
-        if location_type == "online":
-            return "Online"
-        return location_type.capitalize() if location_type else ""
-
-    def _open_sale_details(self, row: int, column: int) -> None:
-        del column
-        item = self.sales_table.item(row, 0)
-        if not item:
-            return
-        sale = item.data(Qt.ItemDataRole.UserRole)
+    def _open_sale_details(self, index) -> None:
+        sale = self.sales_model.sale_details(index.row())
         if not isinstance(sale, dict):
             return
         dialog = SaleDetailsDialog(sale, self)
-        dialog.exec()
\ No newline at end of file
+        dialog.exec()
@@ -1,14 +1,15 @@
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import QTimer, Qt
 from PyQt6.QtWidgets import (
+    QCheckBox,
     QHBoxLayout,
     QHeaderView,
     QLineEdit,
     QPushButton,
-    QTableWidget,
-    QTableWidgetItem,
+    QTableView,
 )
 
 from .base import BaseWindow
+from .table_models import SearchResultsModel
 try:  # Maintain compatibility with frozen builds lacking package parents
     from .. import storage
     from ..forms import EditProductDialog
@@ -20,6 +21,9 @@ except ImportError:  # pragma: no cover - fallback for frozen build
 
 
 class SearchWindow(BaseWindow):
+    RESULT_LIMIT = 500
+    TYPING_DELAY_MS = 250
+
     def __init__(self) -> None:
         super().__init__("Search - Inventory App", "Search")
         self.set_page_title("Search Products")
@@ -31,26 +35,24 @@ class SearchWindow(BaseWindow):
         search_row.setSpacing(12)
 
         self.search_edit = QLineEdit()
-        self.search_edit.setPlaceholderText("Search by product id or name")
+        self.search_edit.setPlaceholderText("Search by product id, name or description")
         self.search_button = QPushButton("Search")
+        self.fuzzy_check = QCheckBox("Typo tolerant")
+        self.fuzzy_check.setToolTip("Also find products whose id or name is misspelled")
 
         search_row.addWidget(self.search_edit)
         search_row.addWidget(self.search_button)
+        search_row.addWidget(self.fuzzy_check)
         search_row.addStretch(1)
 
         main_layout.insertLayout(1, search_row)
 
-        self.results_table = QTableWidget(0, 5)
-        self.results_table.setHorizontalHeaderLabels([
-            "Id",
-            "Name",
-            "$ Price",
-            "C$ Price",
-            "Quantity",
-        ])
-        self.results_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
-        self.results_table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
-        self.results_table.setSelectionMode(QTableWidget.SelectionMode.SingleSelection)
+        self.results_model = SearchResultsModel(self)
+        self.results_table = QTableView()
+        self.results_table.setModel(self.results_model)
+        self.results_table.setEditTriggers(QTableView.EditTrigger.NoEditTriggers)
+        self.results_table.setSelectionBehavior(QTableView.SelectionBehavior.SelectRows)
+        self.results_table.setSelectionMode(QTableView.SelectionMode.SingleSelection)
         self.results_table.verticalHeader().setVisible(False)
 
         header = self.results_table.horizontalHeader()
@@ -63,54 +65,82 @@ class SearchWindow(BaseWindow):
         main_layout.addWidget(self.results_table)
 
         self._results: list[Product] = []
-
-
-        self.search_button.clicked.connect(self.search_product)
-        self.search_edit.returnPressed.connect(self.search_product)
-        self.results_table.cellDoubleClicked.connect(lambda *_: self.open_selected_product())
+        # Last plain search result; a longer query is narrowed from it in memory
+        # as long as storage.catalog_version() has not moved since.
+        self._cached_query: str | None = None
+        self._cached_results: list[Product] = []
+        self._cached_indexed = False  # has_search_index() of the database searched
+        self._cached_version = -1
+        self._typing_timer = QTimer(self)
+        self._typing_timer.setSingleShot(True)
+        self._typing_timer.setInterval(self.TYPING_DELAY_MS)
+        self._typing_timer.timeout.connect(self.search_product)
+
+        self.search_button.clicked.connect(self.refresh_search)
+        self.search_edit.returnPressed.connect(self.refresh_search)
+        self.search_edit.textChanged.connect(lambda *_: self._typing_timer.start())
+        self.fuzzy_check.toggled.connect(lambda *_: self.search_product())
+        self.results_table.doubleClicked.connect(lambda *_: self.open_selected_product())
 
     def showEvent(self, event) -> None:  # type: ignore[override]
         super().showEvent(event)
         self.search_edit.setFocus(Qt.FocusReason.OtherFocusReason)
         self.search_edit.selectAll()
 
+    def refresh_search(self) -> None:
+        """Search again from the database, ignoring the typing cache."""
+        self._cached_query = None
+        self._cached_results = []
+        self.search_product()
+
     def search_product(self) -> None:
+        self._typing_timer.stop()
         query = self.search_edit.text().strip()
         if not query:
-            self._results = []
-            self.results_table.setRowCount(0)
+            self.discard_storage("search")
+            self._show_results([])
             return
 
-        rate = storage.get_conversion_rate()
-        self._results = storage.search_products(query)
-        self.results_table.setRowCount(0)
-
-        for product in self._results:
-            row = self.results_table.rowCount()
-            self.results_table.insertRow(row)
-
-            price_usd = float(product.price)
-            price_c = price_usd * float(rate)
-            qty = int(product.quantity)
-
-            id_item = QTableWidgetItem(product.prod_id)
-            id_item.setData(Qt.ItemDataRole.UserRole, product.prod_id)
-            name_item = QTableWidgetItem(product.name)
-            usd_item = QTableWidgetItem(f"{price_usd:.2f}")
-            usd_item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
-            cad_item = QTableWidgetItem(f"{price_c:.2f}")
-            cad_item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
-            qty_item = QTableWidgetItem(str(qty))
-            qty_item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
-
-            self.results_table.setItem(row, 0, id_item)
-            self.results_table.setItem(row, 1, name_item)
-            self.results_table.setItem(row, 2, usd_item)
-            self.results_table.setItem(row, 3, cad_item)
-            self.results_table.setItem(row, 4, qty_item)
+        fuzzy = self.fuzzy_check.isChecked()
+        cached = self._cached_query
+        narrow = not fuzzy and cached is not None and query.casefold().startswith(cached.casefold())
+        cached_results, indexed, cached_version = self._cached_results, self._cached_indexed, self._cached_version
+        search = storage.fuzzy_search_products if fuzzy else storage.search_products
+
+        def lookup():
+            # The version is read first: a write landing during the search
+            # only makes the next keystroke search again.
+            version = storage.catalog_version()
+            if narrow and version == cached_version:
+                return storage.filter_search_results(cached_results, query, indexed), None, version
+            return search(query, limit=self.RESULT_LIMIT), not fuzzy and storage.has_search_index(), version
+
+        # A newer keystroke cancels this search if it has not started yet and
+        # drops its result if it has.
+        self.run_storage(
+            lookup,
+            lambda found: self._on_search_finished(query, fuzzy, *found),
+            key="search",
+            on_error=lambda _exc: self._show_results([]),
+        )
+
+    def _on_search_finished(self, query: str, fuzzy: bool, results, indexed: bool | None, version: int) -> None:
+        # indexed is None for a result narrowed from the cache, which stays as is.
+        if not fuzzy and indexed is not None:
+            # Only a complete (untruncated) result can answer longer queries.
+            complete = len(results) < self.RESULT_LIMIT
+            self._cached_query = query if complete else None
+            self._cached_results = results if complete else []
+            self._cached_indexed = indexed
+            self._cached_version = version
+        self._show_results(results)
+
+    def _show_results(self, products: list[Product]) -> None:
+        self._results = products
+        self.results_model.set_products(products, storage.get_conversion_rate())
 
     def open_selected_product(self) -> None:
-        row = self.results_table.currentRow()
+        row = self.results_table.currentIndex().row()
         if row < 0 or row >= len(self._results):
             return
         
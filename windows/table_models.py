@@ -0,0 +1,251 @@
+from __future__ import annotations
+
+from operator import itemgetter
+from typing import Any, Iterable, Sequence
+
+from PyQt6.QtCore import QAbstractTableModel, QModelIndex, Qt
+
+try:  # PyInstaller may load modules as top-level packages
+    from .. import pricing, storage
+    from ..exporter import location_text as _location_text
+    from ..models import Product
+except ImportError:  # pragma: no cover - runtime fallback for frozen build
+    import pricing  # type: ignore[import-not-found]
+    import storage  # type: ignore[import-not-found]
+    from exporter import location_text as _location_text  # type: ignore[import-not-found]
+    from models import Product  # type: ignore[import-not-found]
+
+_RIGHT = Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter
+
+
+def format_location(sale: dict) -> str:
+    return _location_text(sale.get("location_type"), sale.get("local_name"))
+
+
+class RowTableModel(QAbstractTableModel):
+    """Read-only table over a list of plain tuples.
+
+    Subclasses declare ``COLUMNS`` as ``(header, key)`` pairs and implement
+    :meth:`display`, which formats a cell only when the view asks for it.
+    Columns whose key is in ``RIGHT_ALIGNED`` are right aligned.
+    """
+
+    COLUMNS: Sequence[tuple[str, str]] = ()
+    RIGHT_ALIGNED: frozenset[str] = frozenset()
+
+    def __init__(self, parent=None) -> None:
+        super().__init__(parent)
+        self._rows: list[tuple] = []
+        self._keys = [key for _, key in self.COLUMNS]
+
+    def set_rows(self, rows: Iterable[tuple]) -> None:
+        self.beginResetModel()
+        self._rows = list(rows)
+        self.endResetModel()
+
+    def row_at(self, row: int) -> tuple | None:
+        return self._rows[row] if 0 <= row < len(self._rows) else None
+
+    def update_row(self, row: int, values: tuple) -> None:
+        """Replace one row in place and repaint only that row."""
+        self._rows[row] = values
+        self.dataChanged.emit(self.index(row, 0), self.index(row, len(self.COLUMNS) - 1))
+
+    def display(self, values: tuple, key: str) -> str:
+        raise NotImplementedError
+
+    # ---- Qt model API --------------------------------------------------------
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.COLUMNS[section][0]
+        return None
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        key = self._keys[index.column()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return self.display(self._rows[index.row()], key)
+        if role == Qt.ItemDataRole.TextAlignmentRole and key in self.RIGHT_ALIGNED:
+            return _RIGHT
+        return None
+
+
+class ProductTableModel(RowTableModel):
+    """Products with prices converted to C$ and an optional retail mark-up.
+
+    Rows are stored as ``(prod_id, name, price, quantity)``.
+    """
+
+    COLUMNS = (
+        ("Id", "id"),
+        ("Name", "name"),
+        ("Price $", "usd"),
+        ("Price C$", "cad"),
+        ("Quantity", "qty"),
+        ("Subtotal $", "sub_usd"),
+        ("Subtotal C$", "sub_cad"),
+    )
+    RIGHT_ALIGNED = frozenset({"usd", "cad", "qty", "sub_usd", "sub_cad"})
+
+    def __init__(self, parent=None) -> None:
+        super().__init__(parent)
+        self._rate = 1.0
+        self._markup_pct = 0.0
+        self._factor = 1.0
+        self._columns = pricing.PriceColumns((), ())
+
+    @staticmethod
+    def row_for(product: Product) -> tuple:
+        return (product.prod_id, product.name, float(product.price), int(product.quantity))
+
+    def set_rows(self, rows: Iterable[tuple]) -> None:
+        rows = list(rows)
+        self._columns = pricing.PriceColumns((r[2] for r in rows), (r[3] for r in rows))
+        super().set_rows(rows)
+
+    def set_products(self, products: Iterable[Product], rate: float, markup_pct: float = 0.0) -> None:
+        self._rate = float(rate)
+        self._markup_pct = float(markup_pct)
+        self._factor = pricing.markup_factor(markup_pct)
+        self.set_rows(self.row_for(p) for p in products)
+
+    def update_product(self, row: int, product: Product) -> None:
+        values = self.row_for(product)
+        self._columns.set(row, values[2], values[3])
+        self.update_row(row, values)
+
+    def totals(self) -> tuple[int, int, float, float]:
+        """Return (items, total quantity, total $, total C$) of the listed rows."""
+        v = self._columns.valuation(self._rate, self._markup_pct)
+        return v.items, v.quantity, v.value_usd, v.value_cad
+
+    def display(self, values: tuple, key: str) -> str:
+        prod_id, name, price, qty = values
+        usd = price * self._factor
+        if key == "id": return prod_id
+        if key == "name": return name
+        if key == "usd": return f"{usd:.2f}"
+        if key == "cad": return f"{usd * self._rate:.2f}"
+        if key == "qty": return str(qty)
+        if key == "sub_usd": return f"{usd * qty:.2f}"
+        if key == "sub_cad": return f"{usd * self._rate * qty:.2f}"
+        return ""
+
+
+class LocalStockTableModel(ProductTableModel):
+    """Stock held by one local, priced with that local's retail mark-up."""
+
+
+class SearchResultsModel(ProductTableModel):
+    COLUMNS = (
+        ("Id", "id"),
+        ("Name", "name"),
+        ("$ Price", "usd"),
+        ("C$ Price", "cad"),
+        ("Quantity", "qty"),
+    )
+
+
+_SALE_FIELDS = (
+    "sale_id", "prod_id", "qty", "sold_on", "sold_at", "location_type", "local_id",
+    "name", "price", "description", "client", "local_name",
+    "department_name", "subdepartment_name",
+)
+_sale_values = itemgetter(*_SALE_FIELDS)
+_SALE_COLUMN = {name: idx for idx, name in enumerate(_SALE_FIELDS)}
+_SALE_QTY, _SALE_PRICE = _SALE_COLUMN["qty"], _SALE_COLUMN["price"]
+
+
+class SalesTableModel(RowTableModel):
+    """Sales history that is fetched page by page as the view scrolls."""
+
+    COLUMNS = (
+        ("Date", "sold_on"),
+        ("Id", "prod_id"),
+        ("Name", "name"),
+        ("Location", "location"),
+        ("Qty", "qty"),
+        ("$ Price", "usd"),
+        ("C$ Price", "cad"),
+    )
+    RIGHT_ALIGNED = frozenset({"qty", "usd", "cad"})
+    PAGE_SIZE = 200
+
+    def __init__(self, parent=None) -> None:
+        super().__init__(parent)
+        self._filters: dict[str, Any] = {}
+        self._cursor: tuple[str, str] | None = None
+        self._exhausted = True
+        self._rate = 1.0
+
+    def load(self, rate: float, **filters: Any) -> None:
+        """Start over with new filters; only the first page is read."""
+        self.show_first_page(rate, filters, self.first_page(**filters))
+
+    @classmethod
+    def first_page(cls, **filters: Any) -> tuple[list[dict], tuple[str, str] | None]:
+        """Read the first page for *filters*; safe to call from any thread."""
+        return storage.list_sold_products_page(cls.PAGE_SIZE, None, **filters)
+
+    def show_first_page(self, rate: float, filters: dict[str, Any], page: tuple[list[dict], tuple[str, str] | None]) -> None:
+        """Show a page read by :meth:`first_page`; later pages load on scroll."""
+        sales, self._cursor = page
+        self._filters = filters
+        self._rate = float(rate)
+        self._exhausted = self._cursor is None
+        self.set_rows(_sale_values(s) for s in sales)
+
+    def sale_at(self, row: int) -> dict | None:
+        values = self.row_at(row)
+        return dict(zip(_SALE_FIELDS, values)) if values is not None else None
+
+    def display(self, values: tuple, key: str) -> str:
+        if key == "location":
+            return _location_text(values[_SALE_COLUMN["location_type"]], values[_SALE_COLUMN["local_name"]])
+        if key == "qty": return str(int(values[_SALE_QTY]))
+        if key == "usd": return f"{float(values[_SALE_PRICE]):.2f}"
+        if key == "cad": return f"{float(values[_SALE_PRICE]) * self._rate:.2f}"
+        return str(values[_SALE_COLUMN[key]] or "")
+
+    def canFetchMore(self, parent: QModelIndex = QModelIndex()) -> bool:
+        return not parent.isValid() and not self._exhausted
+
+    def fetchMore(self, parent: QModelIndex = QModelIndex()) -> None:
+        if parent.isValid() or self._exhausted:
+            return
+        sales, self._cursor = storage.list_sold_products_page(self.PAGE_SIZE, self._cursor, **self._filters)
+        self._exhausted = self._cursor is None
+        if not sales:
+            return
+        start = len(self._rows)
+        self.beginInsertRows(QModelIndex(), start, start + len(sales) - 1)
+        self._rows.extend(_sale_values(s) for s in sales)
+        self.endInsertRows()
+
+    def sale_details(self, row: int) -> dict | None:
+        """Formatted fields for the sale details dialog."""
+        sale = self.sale_at(row)
+        if sale is None:
+            return None
+        price_usd = float(sale["price"])
+        return {
+            "sale_id": sale["sale_id"],
+            "prod_id": sale["prod_id"],
+            "name": sale["name"],
+            "description": sale.get("description") or "",
+            "qty": str(int(sale["qty"])),
+            "price_usd": f"{price_usd:.2f}",
+            "price_cad": f"{price_usd * self._rate:.2f}",
+            "sold_on": sale.get("sold_on") or "",
+            "location": format_location(sale),
+            "client": sale.get("client") or "",
+            "department": sale.get("department_name") or "",
+            "subdepartment": sale.get("subdepartment_name") or "",
+        }
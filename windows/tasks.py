@@ -0,0 +1,153 @@
+"""Run storage calls off the GUI thread.
+
+Reads go to a small pool of threads and writes to a single writer thread, so
+writes never race each other and the Qt event loop keeps painting while
+SQLite works.  Bulk reads that run for minutes, such as exports, get threads
+of their own, so they never hold up the reads behind the windows.  Every call returns a :class:`concurrent.futures.Future`; its
+callbacks are delivered back on the GUI thread through a queued signal.
+
+Calls submitted under the same *key* supersede each other: a queued call is
+cancelled when a newer one arrives, and the result of one that was already
+running is dropped, so a window only ever sees the answer to its latest
+request.  Reads are not ordered after earlier writes; chain them from the
+write's ``on_done`` when they must observe it.
+"""
+from __future__ import annotations
+
+import sys
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from PyQt6.QtCore import QCoreApplication, QObject, pyqtSignal
+
+
+class _Job:
+    __slots__ = ("key", "seq", "on_done", "on_error", "on_settled")
+
+    def __init__(self, key, seq, on_done, on_error, on_settled) -> None:
+        self.key = key
+        self.seq = seq
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_settled = on_settled
+
+
+class StorageExecutor(QObject):
+    """Dispatches storage functions to reader threads and one writer thread."""
+
+    _finished = pyqtSignal(object, object)  # (job, future), queued to the GUI thread
+
+    def __init__(self, readers: int = 2, bulk: int = 2, parent: QObject | None = None) -> None:
+        super().__init__(parent)
+        self._readers = ThreadPoolExecutor(max_workers=max(1, readers), thread_name_prefix="storage-read")
+        self._bulk = ThreadPoolExecutor(max_workers=max(1, bulk), thread_name_prefix="storage-bulk")
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="storage-write")
+        self._closing = threading.Event()
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._latest: dict[Any, tuple[int, Future | None]] = {}  # newest call per key
+        self._finished.connect(self._deliver)
+
+    def submit(
+        self,
+        call: Callable[[], Any],
+        on_done: Optional[Callable[[Any], None]] = None,
+        on_error: Optional[Callable[[BaseException], None]] = None,
+        *,
+        write: bool = False,
+        bulk: bool = False,
+        key: Any = None,
+        on_settled: Optional[Callable[[], None]] = None,
+    ) -> Future:
+        """Run ``call()`` in the background and return its future.
+
+        ``on_done(result)`` or ``on_error(exc)`` runs on the GUI thread unless
+        the call was superseded by a newer one with the same *key*;
+        ``on_settled()`` always runs once the call is finished or dropped.
+        """
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+        job = _Job(key, seq, on_done, on_error, on_settled)
+        pool = self._writer if write else self._bulk if bulk else self._readers
+        future = pool.submit(call)
+        if key is not None:
+            with self._lock:
+                previous = self._latest.get(key)
+                self._latest[key] = (seq, future)
+            if previous is not None and previous[1] is not None and not write:
+                previous[1].cancel()  # still queued: never run it
+        future.add_done_callback(lambda f: self._finished.emit(job, f))
+        return future
+
+    def read(self, call: Callable[[], Any], on_done=None, on_error=None, *, key: Any = None, on_settled=None) -> Future:
+        return self.submit(call, on_done, on_error, key=key, on_settled=on_settled)
+
+    def write(self, call: Callable[[], Any], on_done=None, on_error=None, *, key: Any = None, on_settled=None) -> Future:
+        return self.submit(call, on_done, on_error, write=True, key=key, on_settled=on_settled)
+
+    def bulk_read(self, call: Callable[[], Any], on_done=None, on_error=None, *, key: Any = None, on_settled=None) -> Future:
+        """A long read (an export, say); long-running calls should poll :meth:`closing`."""
+        return self.submit(call, on_done, on_error, bulk=True, key=key, on_settled=on_settled)
+
+    def is_current(self, key: Any, seq: int) -> bool:
+        with self._lock:
+            latest = self._latest.get(key)
+        return latest is not None and latest[0] == seq
+
+    def discard(self, key: Any) -> None:
+        """Drop whatever is pending under *key*; its callbacks will not run."""
+        with self._lock:
+            self._seq += 1
+            previous = self._latest.get(key)
+            self._latest[key] = (self._seq, None)
+        if previous is not None and previous[1] is not None:
+            previous[1].cancel()
+
+    def closing(self) -> bool:
+        """Whether :meth:`shutdown` has begun; bulk calls should stop early."""
+        return self._closing.is_set()
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Cancel queued reads and let the writer drain its queue."""
+        self._closing.set()
+        self._readers.shutdown(wait=wait, cancel_futures=True)
+        self._bulk.shutdown(wait=wait, cancel_futures=True)
+        self._writer.shutdown(wait=wait)
+
+    def _deliver(self, job: _Job, future: Future) -> None:
+        try:
+            if future.cancelled() or (job.key is not None and not self.is_current(job.key, job.seq)):
+                return
+            try:
+                result = future.result()
+            except Exception as exc:
+                if job.on_error is not None:
+                    job.on_error(exc)
+                else:
+                    sys.excepthook(type(exc), exc, exc.__traceback__)
+                return
+            if job.on_done is not None:
+                job.on_done(result)
+        finally:
+            if job.on_settled is not None:
+                job.on_settled()
+
+
+_executor: StorageExecutor | None = None
+
+
+def storage_executor() -> StorageExecutor:
+    """The application-wide executor; create it from the GUI thread.
+
+    It is shut down when the application quits, before the interpreter
+    starts tearing down the modules its threads still use.
+    """
+    global _executor
+    if _executor is None:
+        _executor = StorageExecutor()
+        app = QCoreApplication.instance()
+        if app is not None:
+            app.aboutToQuit.connect(_executor.shutdown)
+    return _executor